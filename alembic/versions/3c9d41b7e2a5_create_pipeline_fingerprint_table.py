@@ -0,0 +1,43 @@
+"""create pipeline fingerprint table
+
+Tables created:
+    - pipeline_fingerprint
+
+Revision ID: 3c9d41b7e2a5
+Revises: a3e0e80c6dfa
+Create Date: 2026-10-17 10:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d41b7e2a5'
+down_revision = 'a3e0e80c6dfa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pipeline_fingerprint",
+        sa.Column("source", sa.Text, primary_key=True,
+                  comment="Spreadsheet and worksheet the data was pulled from"),
+        sa.Column("fingerprint", sa.Text, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        schema="bjj"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pipeline_fingerprint", schema="bjj")
@@ -0,0 +1,156 @@
+"""partition practiced tables by year
+
+Tables partitioned by the year of date:
+    - moves_practiced
+    - positions_practiced
+
+Functions created:
+    - create_year_partition
+
+Revision ID: b81f5d2c94e0
+Revises: 3c9d41b7e2a5
+Create Date: 2026-10-17 15:02:37.514960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f5d2c94e0'
+down_revision = '3c9d41b7e2a5'
+branch_labels = None
+depends_on = None
+
+# Practiced table to the skill table it references
+PRACTICED_TABLES = {
+    "moves_practiced": "move",
+    "positions_practiced": "position",
+}
+
+
+def create_practiced_table(table: str, skill: str, partitioned: bool) -> None:
+    """Create a practiced table, partitioned by the year of date or not.
+
+    The primary key of a partitioned table has to include the partition key, so it
+    is (id, date) rather than id. Either way, id is drawn from the existing sequence
+    and constraints are named explicitly, since the table being replaced still holds
+    the default names.
+    """
+    partition_kwargs = {}
+    if partitioned:
+        partition_kwargs["postgresql_partition_by"] = "RANGE (date)"
+    op.create_table(
+        table,
+        sa.Column(
+            "id",
+            sa.Integer,
+            server_default=sa.text(f"nextval('bjj.{table}_id_seq'::regclass)"),
+            primary_key=True,
+            autoincrement=False
+        ),
+        sa.Column("date", sa.Date, nullable=False, primary_key=partitioned),
+        sa.Column(
+            "class_id",
+            sa.Integer,
+            sa.ForeignKey("bjj.class.id", name=f"{table}_class_id_fkey"),
+            nullable=False
+        ),
+        sa.Column(
+            f"{skill}_id",
+            sa.Integer,
+            sa.ForeignKey(f"bjj.{skill}.id", name=f"{table}_{skill}_id_fkey"),
+            nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        sa.ForeignKeyConstraint(
+            ["date", "class_id"],
+            ["bjj.class_attendance.date", "bjj.class_attendance.class_id"],
+            name=f"{table}_date_class_id_fkey"
+        ),
+        schema="bjj",
+        **partition_kwargs
+    )
+
+
+def replace_practiced_table(table: str, skill: str, partitioned: bool) -> None:
+    """Replace a practiced table with a (non-)partitioned copy of itself."""
+    op.rename_table(table, f"{table}_replaced", schema="bjj")
+    # Free up the primary key's index name for the new table
+    op.execute(
+        f"ALTER TABLE bjj.{table}_replaced"
+        f" RENAME CONSTRAINT {table}_pkey TO {table}_replaced_pkey"
+    )
+
+    create_practiced_table(table, skill, partitioned)
+    if partitioned:
+        # Every year with data, plus the current year
+        op.execute(
+            f"""
+            SELECT bjj.create_year_partition('{table}', year::INTEGER)
+            FROM (
+                SELECT EXTRACT(YEAR FROM date) AS year FROM bjj.{table}_replaced
+                UNION
+                SELECT EXTRACT(YEAR FROM CURRENT_DATE)
+            ) years
+            """
+        )
+
+    columns = f"id, date, class_id, {skill}_id, created_at, updated_at"
+    op.execute(
+        f"INSERT INTO bjj.{table} ({columns})"
+        f" SELECT {columns} FROM bjj.{table}_replaced"
+    )
+    # Keep the sequence when the old table is dropped
+    op.execute(f"ALTER SEQUENCE bjj.{table}_id_seq OWNED BY bjj.{table}.id")
+    op.drop_table(f"{table}_replaced", schema="bjj")
+
+
+def upgrade() -> None:
+    # Creates the partition of a table holding a given year, unless it already
+    # exists, and returns its name
+    op.execute(
+        """
+        CREATE FUNCTION bjj.create_year_partition(
+            parent TEXT, year INTEGER, parent_schema TEXT DEFAULT 'bjj'
+        )
+        RETURNS TEXT
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            partition TEXT := format('%s_y%s', parent, year);
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I.%I PARTITION OF %I.%I'
+                ' FOR VALUES FROM (%L) TO (%L)',
+                parent_schema,
+                partition,
+                parent_schema,
+                parent,
+                make_date(year, 1, 1),
+                make_date(year + 1, 1, 1)
+            );
+            RETURN partition;
+        END;
+        $$
+        """
+    )
+
+    for table, skill in PRACTICED_TABLES.items():
+        replace_practiced_table(table, skill, partitioned=True)
+
+
+def downgrade() -> None:
+    for table, skill in PRACTICED_TABLES.items():
+        replace_practiced_table(table, skill, partitioned=False)
+
+    op.execute("DROP FUNCTION bjj.create_year_partition(TEXT, INTEGER, TEXT)")
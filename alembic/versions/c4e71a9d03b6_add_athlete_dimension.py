@@ -0,0 +1,130 @@
+"""add athlete dimension
+
+Tables created:
+    - athlete
+
+Columns added:
+    - class_attendance.athlete_id
+    - moves_practiced.athlete_id
+    - positions_practiced.athlete_id
+
+A class is keyed by (date, class_id, athlete_id), so that worksheets of different
+athletes can hold the same class. Existing rows belong to the default athlete.
+
+The tables dbt builds the metrics marts in are dropped, along with the marts, since
+their metrics are now per athlete. The next dbt run builds them from scratch.
+
+Revision ID: c4e71a9d03b6
+Revises: b81f5d2c94e0
+Create Date: 2026-10-18 09:41:15.207318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e71a9d03b6'
+down_revision = 'b81f5d2c94e0'
+branch_labels = None
+depends_on = None
+
+# Athlete the rows loaded before athletes existed belong to
+DEFAULT_ATHLETE = "default"
+PRACTICED_TABLES = ["moves_practiced", "positions_practiced"]
+# Tables dbt builds the metrics marts in, which dbt never rebuilds from scratch on
+# its own
+METRICS_BUILD_TABLES = [
+    "class_attendance_metrics_build",
+    "move_metrics_build",
+    "position_metrics_build",
+]
+
+
+def drop_metrics_build_tables() -> None:
+    """Drop the tables the metrics marts are built in, and the marts with them."""
+    for table in METRICS_BUILD_TABLES:
+        op.execute(f"DROP TABLE IF EXISTS bjj.{table} CASCADE")
+
+
+def replace_class_key(old_columns: str, new_columns: str) -> None:
+    """Replace the primary key of class_attendance, and the practiced tables'
+    foreign keys to it, with keys on other columns."""
+    old_name = old_columns.replace(", ", "_")
+    new_name = new_columns.replace(", ", "_")
+    for table in PRACTICED_TABLES:
+        op.drop_constraint(f"{table}_{old_name}_fkey", table, schema="bjj")
+    op.drop_constraint("class_attendance_pkey", "class_attendance", schema="bjj")
+
+    # date leads the key, so its index still serves lookups by date range
+    op.create_primary_key(
+        "class_attendance_pkey",
+        "class_attendance",
+        new_columns.split(", "),
+        schema="bjj"
+    )
+    for table in PRACTICED_TABLES:
+        op.create_foreign_key(
+            f"{table}_{new_name}_fkey",
+            table,
+            "class_attendance",
+            new_columns.split(", "),
+            new_columns.split(", "),
+            source_schema="bjj",
+            referent_schema="bjj"
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "athlete",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.Text, nullable=False, unique=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()")
+        ),
+        schema="bjj"
+    )
+    op.execute(f"INSERT INTO bjj.athlete (name) VALUES ('{DEFAULT_ATHLETE}')")
+
+    for table in ["class_attendance", *PRACTICED_TABLES]:
+        op.add_column(
+            table,
+            sa.Column(
+                "athlete_id",
+                sa.Integer,
+                sa.ForeignKey("bjj.athlete.id", name=f"{table}_athlete_id_fkey")
+            ),
+            schema="bjj"
+        )
+        op.execute(
+            f"UPDATE bjj.{table} SET athlete_id ="
+            f" (SELECT id FROM bjj.athlete WHERE name = '{DEFAULT_ATHLETE}')"
+        )
+        op.alter_column(table, "athlete_id", nullable=False, schema="bjj")
+
+    replace_class_key("date, class_id", "date, class_id, athlete_id")
+    drop_metrics_build_tables()
+
+
+def downgrade() -> None:
+    # Only the default athlete's rows fit the old key
+    for table in [*PRACTICED_TABLES, "class_attendance"]:
+        op.execute(
+            f"DELETE FROM bjj.{table} WHERE athlete_id <>"
+            f" (SELECT id FROM bjj.athlete WHERE name = '{DEFAULT_ATHLETE}')"
+        )
+
+    replace_class_key("date, class_id, athlete_id", "date, class_id")
+
+    for table in ["class_attendance", *PRACTICED_TABLES]:
+        op.drop_column(table, "athlete_id", schema="bjj")
+    op.drop_table("athlete", schema="bjj")
+    drop_metrics_build_tables()
@@ -0,0 +1,58 @@
+{#
+    Select the years of a source relation that changed since the incremental model
+    being built was last built: years with rows updated since then, and years whose
+    number of rows no longer matches what the model counted for them (i.e. years
+    that lost rows). row_count_metric is the model's yearly metric that counts the
+    source rows, summed across any other dimensions of the model.
+
+    Years whose rows were all deleted have nothing to recompute, so they're removed
+    by delete_vanished_years instead. With --full-refresh every year is selected, so
+    that models which are never rebuilt from scratch (full_refresh=false) are still
+    recomputed in full.
+
+    When the `years` var limits the int models to some years (see filter_years),
+    only those years are compared, since the source relation holds no rows for the
+    others.
+
+    Models with metrics that look back across the start of a year (e.g. rolling
+    windows) can set include_next_year, so the year after each changed or deleted
+    year is selected too.
+#}
+{% macro changed_years(source_relation, row_count_metric, include_next_year=false) -%}
+    {%- if flags.FULL_REFRESH %}
+    select distinct year from {{ source_relation }}
+    {%- else %}
+    with source_years as (
+        select year, count(*) as num_rows, max(updated_at) as updated_at
+        from {{ source_relation }}
+        group by year
+    ),
+
+    built_years as (
+        select aggregation_year as year, sum(metric_value) as num_rows
+        from {{ this }}
+        where aggregation_category = 'year' and metric_name = '{{ row_count_metric }}'
+        {%- set years = var("years", []) %}
+        {%- if years %}
+            and aggregation_year in (
+                {%- for year in years %}'{{ year | int }}'{% if not loop.last %}, {% endif %}{% endfor -%}
+            )
+        {%- endif %}
+        group by aggregation_year
+    ),
+
+    changed as (
+        select year
+        from source_years
+        full join built_years using (year)
+        where source_years.updated_at > (select max(source_updated_at) from {{ this }})
+            or source_years.num_rows is distinct from built_years.num_rows
+    )
+
+    select year from changed
+    {%- if include_next_year %}
+    union
+    select (year::integer + 1)::text from changed
+    {%- endif %}
+    {%- endif %}
+{%- endmacro %}
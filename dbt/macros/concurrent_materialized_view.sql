@@ -0,0 +1,72 @@
+{#
+    Materialize a model as a materialized view that is kept up to date with REFRESH
+    MATERIALIZED VIEW CONCURRENTLY, which never blocks reads of the view.
+
+    The view is only (re)created when it doesn't exist yet or when the model's SQL
+    changed since it was created (its hash is kept in the view's comment), in which
+    case it's built under a temporary name and swapped in, and reads wait for the
+    swap. --full-refresh doesn't recreate the view, so that it can't block reads
+    either. Any table or view that used to have the model's name is replaced.
+
+    Refreshing concurrently needs a unique index on the view, which is built on the
+    columns given by the unique_key config.
+#}
+{% materialization concurrent_materialized_view, adapter="postgres" %}
+    {%- set unique_key = config.require("unique_key") -%}
+    {%- set unique_key = [unique_key] if unique_key is string else unique_key -%}
+    {%- set comment = "dbt model SQL md5: " ~ local_md5(sql) -%}
+    {%- set target_relation = this.incorporate(type="view") -%}
+    {%- set tmp_relation = this.incorporate(
+        path={"identifier": this.identifier ~ "__dbt_tmp"}, type="view"
+    ) -%}
+
+    {%- call statement("existing_relation", fetch_result=True) -%}
+        select c.relkind, obj_description(c.oid, 'pg_class')
+        from pg_class c
+        join pg_namespace n on n.oid = c.relnamespace
+        where n.nspname = '{{ this.schema }}' and c.relname = '{{ this.identifier }}'
+    {%- endcall -%}
+    {%- set existing = load_result("existing_relation").table.rows -%}
+    {%- set existing_kind = existing[0][0] if existing else none -%}
+    {%- set is_current = existing_kind == "m" and existing[0][1] == comment -%}
+    {%- set drop_kinds = {"r": "table", "p": "table", "v": "view", "m": "materialized view"} -%}
+
+    {{ run_hooks(pre_hooks, inside_transaction=False) }}
+
+    -- `BEGIN` happens here:
+    {{ run_hooks(pre_hooks, inside_transaction=True) }}
+
+    {% if is_current %}
+        {% call statement("main") -%}
+            refresh materialized view concurrently {{ target_relation }}
+        {%- endcall %}
+    {% else %}
+        {% call statement("main") -%}
+            drop materialized view if exists {{ tmp_relation }};
+
+            create materialized view {{ tmp_relation }} as (
+                {{ sql }}
+            );
+
+            create unique index {{ tmp_relation.identifier }}_unique_key
+                on {{ tmp_relation }} ({{ unique_key | join(", ") }});
+            comment on materialized view {{ tmp_relation }} is '{{ comment }}';
+
+            {% if existing_kind is not none -%}
+            drop {{ drop_kinds[existing_kind] }} {{ target_relation }};
+            {%- endif %}
+            alter materialized view {{ tmp_relation }}
+                rename to {{ this.identifier }};
+            alter index {{ this.schema }}.{{ tmp_relation.identifier }}_unique_key
+                rename to {{ this.identifier }}_unique_key;
+        {%- endcall %}
+    {% endif %}
+
+    {{ run_hooks(post_hooks, inside_transaction=True) }}
+
+    {{ adapter.commit() }}
+
+    {{ run_hooks(post_hooks, inside_transaction=False) }}
+
+    {{ return({"relations": [target_relation]}) }}
+{% endmaterialization %}
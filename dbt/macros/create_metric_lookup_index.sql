@@ -0,0 +1,28 @@
+{#
+    Create a covering index on a metrics mart for the dashboard's lookups, which
+    filter on athlete, aggregation_category, aggregation_value and metric_name. The
+    other columns the dashboard reads are included, so lookups are index-only scans.
+
+    Meant to be used as a post-hook, so the index is created along with the mart and
+    left alone when a build updates the mart in place. The index is left unnamed so
+    postgres picks a name that doesn't clash with the index on any old copy of the
+    mart that's still around when the hooks run.
+#}
+{% macro create_metric_lookup_index(include_columns=[]) -%}
+    {%- set key_columns = (
+        "athlete, aggregation_category, aggregation_value, metric_name"
+    ) -%}
+    do $$
+    begin
+        if not exists (
+            select from pg_indexes
+            where schemaname = '{{ this.schema }}'
+                and tablename = '{{ this.identifier }}'
+                and indexdef like '%({{ key_columns }})%'
+        ) then
+            create index on {{ this }} ({{ key_columns }})
+            include ({{ (include_columns + ["metric_value"]) | join(", ") }});
+        end if;
+    end
+    $$
+{%- endmacro %}
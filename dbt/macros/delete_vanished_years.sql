@@ -0,0 +1,18 @@
+{#
+    Delete the rows of an incremental metrics model for years that no longer have
+    any rows in its source table. Incremental builds only replace the years they
+    recompute, so years whose rows were all deleted would otherwise linger.
+
+    Meant to be used as a pre-hook, so it runs before the overall metrics are rolled
+    up from the years already built. Does nothing when the model is built from
+    scratch.
+#}
+{% macro delete_vanished_years(source_relation) -%}
+    {%- if is_incremental() -%}
+    delete from {{ this }}
+    where aggregation_year <> 'overall'
+        and aggregation_year not in (
+            select distinct extract(year from date)::text from {{ source_relation }}
+        )
+    {%- endif -%}
+{%- endmacro %}
@@ -0,0 +1,22 @@
+{#
+    Filter rows to the years listed in the `years` var, e.g.
+    `dbt build --vars '{years: [2023, 2024]}'`, or keep every row when it isn't set.
+
+    Years are matched as date ranges rather than by extracting the year from the
+    date, so that postgres only scans the matching year partitions of the practiced
+    tables (and can use the date index of class_attendance).
+#}
+{% macro filter_years(date_column) -%}
+    {%- set years = var("years", []) -%}
+    {%- if years -%}
+        (
+        {%- for year in years %}
+            ({{ date_column }} >= '{{ year | int }}-01-01'::date
+             and {{ date_column }} < '{{ (year | int) + 1 }}-01-01'::date)
+            {%- if not loop.last %} or{% endif %}
+        {%- endfor %}
+        )
+    {%- else -%}
+        true
+    {%- endif -%}
+{%- endmacro %}
@@ -0,0 +1,118 @@
+{#
+    Generate long-format metrics from a relation in a single scan.
+
+    Metrics are declared as a list of dicts with a name, a SQL aggregate expression,
+    and the aggregation categories (levels) to compute it at, e.g.
+        {"name": "num_classes", "expression": "count(*)", "levels": ["year", "month"]}
+    Each level is also the name of the relation's column holding the value to group
+    by, and every level is grouped within a year, so the relation needs a year
+    column (and an updated_at column). All levels are aggregated together with
+    GROUPING SETS and then unpivoted to one row per metric.
+
+    Overall metrics are rolled up from the yearly ones, so every metric computed at
+    the year level has to add up across years. When the model is built
+    incrementally, years that aren't being recomputed are taken from the model.
+
+    Returns a select with the dimensions, then metric_name, aggregation_category,
+    aggregation_value, metric_value, aggregation_year and source_updated_at.
+#}
+{% macro generate_metrics(relation, metrics, dimensions=[]) -%}
+    {%- set sub_year_levels = [] -%}
+    {%- for metric in metrics -%}
+        {%- for level in metric["levels"] -%}
+            {%- if level != "year" and level not in sub_year_levels -%}
+                {%- do sub_year_levels.append(level) -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endfor -%}
+    {%- set dims = dimensions | join(", ") ~ (", " if dimensions else "") -%}
+
+    with grouped as (
+        select
+            {{ dims }}
+            year as aggregation_year,
+            {%- if sub_year_levels %}
+            case
+                {%- for level in sub_year_levels %}
+                when grouping({{ level }}) = 0 then '{{ level }}'
+                {%- endfor %}
+                else 'year'
+            end as aggregation_category,
+            case
+                {%- for level in sub_year_levels %}
+                when grouping({{ level }}) = 0 then {{ level }}::text
+                {%- endfor %}
+                else year
+            end as aggregation_value,
+            {%- else %}
+            'year' as aggregation_category,
+            year as aggregation_value,
+            {%- endif %}
+            {%- for metric in metrics %}
+            {{ metric["expression"] }} as {{ metric["name"] }},
+            {%- endfor %}
+            max(updated_at) as source_updated_at
+        from {{ relation }}
+        group by grouping sets (
+            ({{ dims }}year)
+            {%- for level in sub_year_levels %},
+            ({{ dims }}year, {{ level }})
+            {%- endfor %}
+        )
+    ),
+
+    unpivoted as (
+        select
+            {%- for dim in dimensions %}
+            grouped.{{ dim }},
+            {%- endfor %}
+            metrics.metric_name,
+            grouped.aggregation_category,
+            grouped.aggregation_value,
+            metrics.metric_value,
+            grouped.aggregation_year,
+            grouped.source_updated_at
+        from grouped
+        cross join lateral (
+            values
+            {%- for metric in metrics %}
+                (
+                    '{{ metric["name"] }}',
+                    grouped.{{ metric["name"] }},
+                    array['{{ metric["levels"] | join("', '") }}']
+                ){{ "," if not loop.last }}
+            {%- endfor %}
+        ) as metrics (metric_name, metric_value, levels)
+        where grouped.aggregation_category = any(metrics.levels)
+    ),
+
+    all_years as (
+        select {{ dims }}metric_name, metric_value, aggregation_year, source_updated_at
+        from unpivoted
+        where aggregation_category = 'year'
+        {%- if is_incremental() %}
+        union all
+        select {{ dims }}metric_name, metric_value, aggregation_year, source_updated_at
+        from {{ this }}
+        where aggregation_category = 'year'
+            and aggregation_year not in (select aggregation_year from unpivoted)
+        {%- endif %}
+    ),
+
+    overall as (
+        select
+            {{ dims }}
+            metric_name,
+            'overall' as aggregation_category,
+            'overall' as aggregation_value,
+            sum(metric_value)::bigint as metric_value,
+            'overall' as aggregation_year,
+            max(source_updated_at) as source_updated_at
+        from all_years
+        group by {{ dims }}metric_name
+    )
+
+    select * from overall
+    union all
+    select * from unpivoted
+{%- endmacro %}
@@ -0,0 +1,105 @@
+{#
+    Generate long-format rolling-window counts of rows, e.g. the number of times each
+    move was practiced in the last 30 days.
+
+    Each window is counted at the end of every month between the first and last
+    month of each year in relation, and overall at the latest date in history. A
+    window of N days ending on a date covers that date and the N - 1 days before it.
+    Rows are counted from history, which has to cover the windows of the months in
+    relation (i.e. reach back past the start of its years), with a date column, an
+    updated_at column and the dimensions. Only windows with rows in them are kept.
+
+    Dimensions listed in partition_by (e.g. the athlete) each get their own windows:
+    the months and the latest date are those of the partition's rows. relation needs
+    the partition_by columns too.
+
+    Returns a select with the dimensions, then metric_name (<metric_name>_last_<N>_days),
+    aggregation_category (month or overall), aggregation_value, metric_value,
+    aggregation_year and source_updated_at.
+#}
+{% macro generate_rolling_metrics(
+    relation, history, metric_name, windows, dimensions=[], partition_by=[]
+) -%}
+    {%- set partitions = partition_by | join(", ") ~ (", " if partition_by else "") -%}
+
+    with window_ends as (
+        select
+            {%- for col in partition_by %}
+            years.{{ col }},
+            {%- endfor %}
+            'month' as aggregation_category,
+            to_char(month_start, 'YYYY-MM') as aggregation_value,
+            years.year as aggregation_year,
+            (month_start + interval '1 month - 1 day')::date as window_end
+        from (
+            select {{ partitions }}year, min(date) as first_date, max(date) as last_date
+            from {{ relation }}
+            group by {{ partitions }}year
+        ) years
+        cross join lateral generate_series(
+            date_trunc('month', years.first_date::timestamp),
+            date_trunc('month', years.last_date::timestamp),
+            interval '1 month'
+        ) as month_start
+        union all
+        select {{ partitions }}'overall', 'overall', 'overall', max(date)
+        from {{ history }}
+        {%- if partition_by %}
+        group by {{ partition_by | join(", ") }}
+        {%- endif %}
+        having max(date) is not null
+    ),
+
+    windowed as (
+        select
+            {%- for dim in dimensions %}
+            history.{{ dim }},
+            {%- endfor %}
+            window_ends.aggregation_category,
+            window_ends.aggregation_value,
+            window_ends.aggregation_year,
+            {%- for window in windows %}
+            count(*) filter (
+                where history.date > window_ends.window_end - {{ window }}
+            ) as last_{{ window }}_days,
+            max(history.updated_at) filter (
+                where history.date > window_ends.window_end - {{ window }}
+            ) as last_{{ window }}_days_updated_at{{ "," if not loop.last }}
+            {%- endfor %}
+        from window_ends
+        join {{ history }} as history
+            on history.date <= window_ends.window_end
+            and history.date > window_ends.window_end - {{ windows | max }}
+            {%- for col in partition_by %}
+            and history.{{ col }} = window_ends.{{ col }}
+            {%- endfor %}
+        group by
+            {% for dim in dimensions %}history.{{ dim }}, {% endfor -%}
+            window_ends.aggregation_category,
+            window_ends.aggregation_value,
+            window_ends.aggregation_year
+    )
+
+    select
+        {%- for dim in dimensions %}
+        windowed.{{ dim }},
+        {%- endfor %}
+        metrics.metric_name,
+        windowed.aggregation_category,
+        windowed.aggregation_value,
+        metrics.metric_value,
+        windowed.aggregation_year,
+        metrics.source_updated_at
+    from windowed
+    cross join lateral (
+        values
+        {%- for window in windows %}
+            (
+                '{{ metric_name }}_last_{{ window }}_days',
+                windowed.last_{{ window }}_days,
+                windowed.last_{{ window }}_days_updated_at
+            ){{ "," if not loop.last }}
+        {%- endfor %}
+    ) as metrics (metric_name, metric_value, source_updated_at)
+    where metrics.metric_value > 0
+{%- endmacro %}
@@ -1,22 +1,31 @@
 with class_attendance as (
     select * from {{ source("bjj", "class_attendance") }}
+    where {{ filter_years("date") }}
 ),
 
 class as (
     select * FROM {{ source("bjj", "class") }}
 ),
 
+athlete as (
+    select * FROM {{ source("bjj", "athlete") }}
+),
+
 joined as (
     select
         date,
         extract(year from date)::text as year,
         to_char(date, 'YYYY-MM') as month,
+        athlete_id,
+        a.name as athlete,
         class_id,
-        name as class,
+        c.name as class,
         type as class_type,
-        duration as class_duration
+        duration as class_duration,
+        ca.updated_at
     from class_attendance ca
     left join class c on ca.class_id = c.id
+    left join athlete a on ca.athlete_id = a.id
 )
 
 select * from joined
@@ -1,20 +1,30 @@
 with moves_practiced as (
     select * from {{ source("bjj", "moves_practiced") }}
+    where {{ filter_years("date") }}
 ),
 
 move as (
     select * FROM {{ source("bjj", "move") }}
 ),
 
+athlete as (
+    select * FROM {{ source("bjj", "athlete") }}
+),
+
 joined as (
     select
         date,
         extract(year from date)::text as year,
+        to_char(date, 'YYYY-MM') as month,
+        athlete_id,
+        a.name as athlete,
         class_id,
         move_id,
-        m.name AS move
+        m.name AS move,
+        mp.updated_at
     from moves_practiced mp
     left join move m on mp.move_id = m.id
+    left join athlete a on mp.athlete_id = a.id
 )
 
 select * from joined
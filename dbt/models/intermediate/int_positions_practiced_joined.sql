@@ -1,20 +1,30 @@
 with positions_practiced as (
     select * from {{ source("bjj", "positions_practiced") }}
+    where {{ filter_years("date") }}
 ),
 
 position as (
     select * FROM {{ source("bjj", "position") }}
 ),
 
+athlete as (
+    select * FROM {{ source("bjj", "athlete") }}
+),
+
 joined as (
     select
         date,
         extract(year from date)::text as year,
+        to_char(date, 'YYYY-MM') as month,
+        athlete_id,
+        a.name as athlete,
         class_id,
         position_id,
-        p.name AS position
+        p.name AS position,
+        pp.updated_at
     from positions_practiced pp
     left join position p on pp.position_id = p.id
+    left join athlete a on pp.athlete_id = a.id
 )
 
 select * from joined
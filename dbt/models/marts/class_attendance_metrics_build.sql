@@ -0,0 +1,56 @@
+{{
+    config(
+        materialized="incremental",
+        incremental_strategy="delete+insert",
+        unique_key="aggregation_year",
+        pre_hook="{{ delete_vanished_years(source('bjj', 'class_attendance')) }}",
+        full_refresh=false,
+        post_hook="analyze {{ this }}",
+    )
+}}
+
+with class_attendance as (
+    select * from {{ ref("int_class_attendance_joined") }}
+    {% if is_incremental() %}
+    where year in (
+        {{ changed_years(ref("int_class_attendance_joined"), "num_classes_attended") }}
+    )
+    {% endif %}
+),
+
+-- Overall metrics are sums of the yearly ones (months don't span years)
+final as (
+    {{
+        generate_metrics(
+            "class_attendance",
+            metrics=[
+                {
+                    "name": "num_class_minutes",
+                    "expression": "sum(class_duration)",
+                    "levels": ["year", "month"],
+                },
+                {
+                    "name": "num_classes_attended",
+                    "expression": "count(*)",
+                    "levels": ["year", "month"],
+                },
+                {
+                    "name": "num_months_trained",
+                    "expression": "count(distinct month)",
+                    "levels": ["year"],
+                },
+            ],
+            dimensions=["athlete"],
+        )
+    }}
+)
+
+select
+    athlete,
+    metric_name,
+    aggregation_category,
+    aggregation_value,
+    metric_value,
+    aggregation_year,
+    source_updated_at
+from final
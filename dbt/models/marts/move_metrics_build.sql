@@ -0,0 +1,86 @@
+{{
+    config(
+        materialized="incremental",
+        incremental_strategy="delete+insert",
+        unique_key="aggregation_year",
+        pre_hook="{{ delete_vanished_years(source('bjj', 'moves_practiced')) }}",
+        full_refresh=false,
+        post_hook="analyze {{ this }}",
+    )
+}}
+
+with moves_practiced as (
+    select * from {{ ref("int_moves_practiced_joined") }}
+    {% if is_incremental() %}
+    where year in (
+        {{
+            changed_years(
+                ref("int_moves_practiced_joined"),
+                "num_times_practiced",
+                include_next_year=true,
+            )
+        }}
+    )
+    {% endif %}
+),
+
+-- Rolling windows reach back past the years being built, so they're counted from
+-- the source rather than the intermediate model, which may be limited to some years
+move_history as (
+    select
+        practiced.date,
+        athlete.name as athlete,
+        move.name as move,
+        practiced.updated_at
+    from {{ source("bjj", "moves_practiced") }} practiced
+    left join {{ source("bjj", "move") }} move
+        on practiced.move_id = move.id
+    left join {{ source("bjj", "athlete") }} athlete
+        on practiced.athlete_id = athlete.id
+),
+
+metrics as (
+    {{
+        generate_metrics(
+            "moves_practiced",
+            metrics=[
+                {
+                    "name": "num_times_practiced",
+                    "expression": "count(*)",
+                    "levels": ["year", "month"],
+                },
+            ],
+            dimensions=["athlete", "move"],
+        )
+    }}
+),
+
+rolling_metrics as (
+    {{
+        generate_rolling_metrics(
+            "moves_practiced",
+            history="move_history",
+            metric_name="num_times_practiced",
+            windows=var("rolling_window_days"),
+            dimensions=["athlete", "move"],
+            partition_by=["athlete"],
+        )
+    }}
+),
+
+final as (
+    select * from metrics
+    union all
+    select * from rolling_metrics
+)
+
+select
+    athlete,
+    move,
+    metric_name,
+    aggregation_category,
+    aggregation_value,
+    metric_value,
+    aggregation_year,
+    source_updated_at
+from final
@@ -0,0 +1,104 @@
+-- The mart's metrics, computed straight from int_class_attendance_joined one metric
+-- and aggregation category at a time, as the mart did before generate_metrics.
+-- Returns the rows that are in only one of the two, so the test fails unless their
+-- metrics are identical row for row.
+with class_attendance as (
+    select * from {{ ref("int_class_attendance_joined") }}
+),
+
+num_class_min_by_year as (
+    select
+        athlete,
+        'num_class_minutes' as metric_name,
+        'year' as aggregation_category,
+        year as aggregation_value,
+        sum(class_duration) as metric_value
+    from class_attendance
+    group by athlete, year
+),
+
+num_classes_by_year as (
+    select
+        athlete,
+        'num_classes_attended' as metric_name,
+        'year' as aggregation_category,
+        year as aggregation_value,
+        count(*) as metric_value
+    from class_attendance
+    group by athlete, year
+),
+
+num_months_trained_by_year as (
+    select
+        athlete,
+        'num_months_trained' as metric_name,
+        'year' as aggregation_category,
+        year as aggregation_value,
+        count(distinct month) as metric_value
+    from class_attendance
+    group by athlete, year
+),
+
+num_class_min_by_month as (
+    select
+        athlete,
+        'num_class_minutes' as metric_name,
+        'month' as aggregation_category,
+        month as aggregation_value,
+        sum(class_duration) as metric_value
+    from class_attendance
+    group by athlete, month
+),
+
+num_classes_by_month as (
+    select
+        athlete,
+        'num_classes_attended' as metric_name,
+        'month' as aggregation_category,
+        month as aggregation_value,
+        count(*) as metric_value
+    from class_attendance
+    group by athlete, month
+),
+
+overall as (
+    select
+        athlete,
+        'num_class_minutes' as metric_name,
+        'overall' as aggregation_category,
+        'overall' as aggregation_value,
+        sum(class_duration) as metric_value
+    from class_attendance
+    group by athlete
+    union all
+    select athlete, 'num_classes_attended', 'overall', 'overall', count(*)
+    from class_attendance
+    group by athlete
+    union all
+    select athlete, 'num_months_trained', 'overall', 'overall', count(distinct month)
+    from class_attendance
+    group by athlete
+),
+
+reference as (
+    select * from overall
+    union all
+    select * from num_class_min_by_year
+    union all
+    select * from num_classes_by_year
+    union all
+    select * from num_months_trained_by_year
+    union all
+    select * from num_class_min_by_month
+    union all
+    select * from num_classes_by_month
+),
+
+mart as (
+    select athlete, metric_name, aggregation_category, aggregation_value, metric_value
+    from {{ ref("class_attendance_metrics") }}
+)
+
+(select 'mart' as only_in, * from mart except all select 'mart', * from reference)
+union all
+(select 'reference', * from reference except all select 'reference', * from mart)
@@ -0,0 +1,137 @@
+-- The mart's metrics, computed straight from int_positions_practiced_joined without the
+-- generate_metrics and generate_rolling_metrics macros, as the mart did before them.
+-- Rolling windows are counted with a correlated subquery per window instead.
+-- Returns the rows that are in only one of the two, so the test fails unless their
+-- metrics are identical row for row.
+with positions_practiced as (
+    select * from {{ ref("int_positions_practiced_joined") }}
+),
+
+times_practiced_by_year as (
+    select
+        athlete,
+        position,
+        'num_times_practiced' as metric_name,
+        'year' as aggregation_category,
+        year as aggregation_value,
+        count(*) as metric_value
+    from positions_practiced
+    group by athlete, position, year
+),
+
+times_practiced_by_month as (
+    select
+        athlete,
+        position,
+        'num_times_practiced' as metric_name,
+        'month' as aggregation_category,
+        month as aggregation_value,
+        count(*) as metric_value
+    from positions_practiced
+    group by athlete, position, month
+),
+
+times_practiced_overall as (
+    select
+        athlete,
+        position,
+        'num_times_practiced' as metric_name,
+        'overall' as aggregation_category,
+        'overall' as aggregation_value,
+        count(*) as metric_value
+    from positions_practiced
+    group by athlete, position
+),
+
+-- Every month between the first and last month of each year of each athlete, and
+-- each athlete's latest date
+window_ends as (
+    select
+        athletes.athlete,
+        'month' as aggregation_category,
+        to_char(month_start, 'YYYY-MM') as aggregation_value,
+        (month_start + interval '1 month' - interval '1 day')::date as window_end
+    from (select distinct athlete from positions_practiced) athletes
+    cross join lateral generate_series(
+        (
+            select date_trunc('month', min(date)::timestamp) from positions_practiced p
+            where p.athlete = athletes.athlete
+        ),
+        (
+            select date_trunc('month', max(date)::timestamp) from positions_practiced p
+            where p.athlete = athletes.athlete
+        ),
+        interval '1 month'
+    ) as month_start
+    where exists (
+        select from positions_practiced p
+        where p.athlete = athletes.athlete
+            and year = extract(year from month_start)::text
+            and month <= to_char(month_start, 'YYYY-MM')
+    )
+        and exists (
+            select from positions_practiced p
+            where p.athlete = athletes.athlete
+                and year = extract(year from month_start)::text
+                and month >= to_char(month_start, 'YYYY-MM')
+        )
+    union all
+    select athlete, 'overall', 'overall', max(date)
+    from positions_practiced
+    group by athlete
+),
+
+windows as (
+    select
+        window_days,
+        'num_times_practiced_last_' || window_days || '_days' as metric_name
+    from unnest(array{{ var("rolling_window_days") }}) as window_days
+),
+
+rolling as (
+    select * from (
+        select
+            skills.athlete,
+            skills.position,
+            windows.metric_name,
+            window_ends.aggregation_category,
+            window_ends.aggregation_value,
+            (
+                select count(*)
+                from positions_practiced p
+                where p.athlete = skills.athlete
+                    and p.position = skills.position
+                    and p.date between window_ends.window_end - windows.window_days + 1
+                        and window_ends.window_end
+            ) as metric_value
+        from (select distinct athlete, position from positions_practiced) skills
+        join window_ends on window_ends.athlete = skills.athlete
+        cross join windows
+    ) counted
+    where metric_value > 0
+),
+
+reference as (
+    select * from times_practiced_overall
+    union all
+    select * from times_practiced_by_year
+    union all
+    select * from times_practiced_by_month
+    union all
+    select * from rolling
+),
+
+mart as (
+    select
+        athlete,
+        position,
+        metric_name,
+        aggregation_category,
+        aggregation_value,
+        metric_value
+    from {{ ref("position_metrics") }}
+)
+
+(select 'mart' as only_in, * from mart except all select 'mart', * from reference)
+union all
+(select 'reference', * from reference except all select 'reference', * from mart)
@@ -18,16 +18,88 @@ elif [[ "${TIER}" != "dev" && "${TIER}" != "prod" ]]; then
     exit 1
 fi
 
+# CHANGE_MANIFEST is optionally passed in the environment, as the path of a file on a
+# volume shared by the data-pipeline and dbt operations. The data pipeline adds the
+# tables it changed to it, and dbt only builds the models downstream of them.
+PIPELINE_ARGS=(-v)
+if [[ -n "${CHANGE_MANIFEST}" ]]; then
+    PIPELINE_ARGS+=(--change-manifest "${CHANGE_MANIFEST}")
+    # dbt claims the manifest by renaming it to this path while it builds the models
+    CLAIMED_MANIFEST="${CHANGE_MANIFEST}.processing"
+fi
+
+# Merge the changes of the claimed manifest back into the change manifest, for the
+# next dbt run to build
+restore_claimed_manifest() {
+    poetry run python -m bjj_journey.change_manifest "${CLAIMED_MANIFEST}" --merge-into "${CHANGE_MANIFEST}"
+    rm -f "${CLAIMED_MANIFEST}"
+}
+
 # OPERATION should be passed in the environment
 if [[ "${OPERATION}" == "data-pipeline" ]]; then
-    echo "Running python data pipeline."
-    poetry run python -m bjj_journey.data_pipeline -v
+    # The metrics marts are rebuilt in process, without a dbt run, if BUILD_METRICS
+    # is set to true
+    if [[ "${BUILD_METRICS}" == "true" ]]; then
+        echo "Running python data pipeline and building the metrics marts."
+        poetry run python -m bjj_journey.data_pipeline "${PIPELINE_ARGS[@]}" --build-metrics
+    else
+        echo "Running python data pipeline."
+        poetry run python -m bjj_journey.data_pipeline "${PIPELINE_ARGS[@]}"
+    fi
 elif [[ "${OPERATION}" == "migrations" ]]; then
     echo "Running migrations via alembic"
     poetry run alembic upgrade head
 elif [[ "${OPERATION}" == "dbt" ]]; then
-    echo "Running dbt"
-    poetry run dbt run --project-dir dbt --target "${TIER}"
+    # Models are built incrementally unless DBT_FULL_REFRESH is set to true. With a
+    # change manifest, only the models downstream of the changed tables are built,
+    # for the changed years, and nothing is when no table changed.
+    #
+    # The manifest is claimed by renaming it before it's read, so that changes the
+    # data pipeline records while dbt runs go to a new manifest instead of being
+    # removed along with it. The claimed manifest is removed once the models are
+    # built, and merged back into the manifest if dbt fails. One left behind by an
+    # interrupted run is merged back before claiming the manifest.
+    DBT_ARGS=(--project-dir dbt --target "${TIER}")
+    if [[ -n "${CHANGE_MANIFEST}" ]]; then
+        if [[ -f "${CLAIMED_MANIFEST}" ]]; then
+            echo "Restoring the changes of an interrupted dbt run."
+            restore_claimed_manifest
+        fi
+        if [[ -f "${CHANGE_MANIFEST}" ]]; then
+            mv "${CHANGE_MANIFEST}" "${CLAIMED_MANIFEST}"
+        fi
+    fi
+
+    if [[ "${DBT_FULL_REFRESH}" == "true" ]]; then
+        echo "Running dbt with a full refresh"
+        DBT_ARGS+=(--full-refresh)
+    elif [[ -n "${CHANGE_MANIFEST}" ]]; then
+        DBT_SELECT=$(poetry run python -m bjj_journey.change_manifest "${CLAIMED_MANIFEST}")
+        if [[ -z "${DBT_SELECT}" ]]; then
+            echo "No tables changed since the last dbt run. Skipping dbt."
+            rm -f "${CLAIMED_MANIFEST}"
+            exit 0
+        fi
+        DBT_VARS=$(poetry run python -m bjj_journey.change_manifest --dbt-vars "${CLAIMED_MANIFEST}")
+        echo "Running dbt for ${DBT_SELECT} with vars ${DBT_VARS}"
+        # DBT_SELECT is deliberately unquoted, to pass each selector separately
+        # shellcheck disable=SC2206
+        DBT_ARGS+=(--select ${DBT_SELECT} --vars "${DBT_VARS}")
+    else
+        echo "Running dbt"
+    fi
+
+    if poetry run dbt run "${DBT_ARGS[@]}"; then
+        if [[ -n "${CHANGE_MANIFEST}" ]]; then
+            rm -f "${CLAIMED_MANIFEST}"
+        fi
+    else
+        if [[ -n "${CHANGE_MANIFEST}" ]]; then
+            echo "dbt failed. Restoring its changes to the change manifest."
+            restore_claimed_manifest
+        fi
+        exit 1
+    fi
 else
     echo "${OPERATION} is not a valid operation."
     exit 1
@@ -0,0 +1,124 @@
+"""Benchmark connection checkout latency of the bjj database engine.
+
+Compares three ways of getting a connection and running a trivial query:
+
+* fresh_engine: a new engine with pool_pre_ping on every call, which is how
+  create_database_engine behaved before engines were shared
+* shared_pre_ping: the shared engine with pool_pre_ping enabled
+* shared: the shared engine with the configured pool options
+
+Requires a database connection configured the same way as the data pipeline (i.e.
+via secrets.<tier>.env).
+
+Usage:
+    poetry run python scripts/benchmark_engine_checkout.py -v
+    poetry run python scripts/benchmark_engine_checkout.py --num-checkouts 1000
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from typing import Callable, List
+
+from sqlalchemy import Engine, create_engine, text
+
+from bjj_journey.database_utils import (
+    POOL_PRE_PING_ENV_VAR,
+    create_database_engine,
+    dispose_database_engines,
+    get_database_url,
+)
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_NUM_CHECKOUTS = 200
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark connection checkout latency of the database engine"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "-n",
+        "--num-checkouts",
+        type=int,
+        default=DEFAULT_NUM_CHECKOUTS,
+        help=f"Number of checkouts per benchmark. Defaults to {DEFAULT_NUM_CHECKOUTS}",
+    )
+
+    return parser.parse_args()
+
+
+def time_checkouts(get_engine: Callable[[], Engine], num_checkouts: int) -> List[float]:
+    """Return the time taken (in seconds) to get an engine, check out a connection
+    and run SELECT 1, for each checkout."""
+    timings = []
+    for _ in range(num_checkouts):
+        start_time = time.perf_counter()
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def get_fresh_engine() -> Engine:
+    """Return a new engine, as create_database_engine did before engines were
+    shared."""
+    return create_engine(get_database_url(), pool_pre_ping=True)
+
+
+def create_pre_ping_engine() -> None:
+    """Create the shared engine with pool_pre_ping enabled for this benchmark, so
+    later calls with the same role return it."""
+    pre_ping = os.environ.get(POOL_PRE_PING_ENV_VAR)
+    os.environ[POOL_PRE_PING_ENV_VAR] = "true"
+    create_database_engine(role="benchmark_pre_ping")
+    if pre_ping is None:
+        del os.environ[POOL_PRE_PING_ENV_VAR]
+    else:
+        os.environ[POOL_PRE_PING_ENV_VAR] = pre_ping
+
+
+def main() -> None:
+    """Time connection checkouts for each way of getting an engine."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    create_pre_ping_engine()
+    benchmarks = {
+        "fresh_engine": get_fresh_engine,
+        "shared_pre_ping": lambda: create_database_engine(role="benchmark_pre_ping"),
+        "shared": lambda: create_database_engine(role="benchmark"),
+    }
+    for name, get_engine in benchmarks.items():
+        LOGGER.info("Timing %s checkouts for %s", args.num_checkouts, name)
+        timings = time_checkouts(get_engine, args.num_checkouts)
+        quantiles = statistics.quantiles(timings, n=100)
+        print(
+            f"{name:<16} median {statistics.median(timings) * 1000:8.3f}ms"
+            f"  p95 {quantiles[94] * 1000:8.3f}ms"
+            f"  total {sum(timings):8.3f}s"
+        )
+
+    dispose_database_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""Benchmark BJJDataPipeline against synthetic attendance worksheets.
+
+Generates a synthetic "BJJ Total Attendance" worksheet from the class, position and
+move catalogs seeded by the alembic populate migrations, serves it through a fake
+gspread client, and runs the pipeline against a scratch database for each requested
+configuration. Per-stage wall time, rows, throughput and the process's RSS before and
+after the stage, and the process's peak RSS so far, are taken from the
+pipeline's run report, saved as JSON in the results directory, and compared with the
+most recent earlier result for the same configuration.
+
+The benchmark rewrites the bjj tables and the pipeline's fingerprints, so it only
+runs against the scratch database given with --database, on the server configured
+for the dev tier, and refuses to run against the tier's own database. The scratch
+database needs the migrations applied first, e.g.:
+
+    createdb bjj_benchmark
+    BJJ_DB_DATABASE=bjj_benchmark poetry run alembic upgrade head
+
+Usage:
+    poetry run python scripts/benchmark_pipeline.py -v --database bjj_benchmark
+    poetry run python scripts/benchmark_pipeline.py --database bjj_benchmark \
+        --years 20 --classes-per-week 10
+"""
+import argparse
+import ast
+from datetime import datetime
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from bjj_journey.data_pipeline import BJJDataPipeline
+from bjj_journey.data_pipeline.config import LOAD_MODES, PipelineConfig
+from bjj_journey.data_pipeline.run import PipelineRun
+from bjj_journey.database_utils import (
+    BJJ_SCHEMA_NAME,
+    DATABASE_ENV_VAR,
+    LOADER_METHODS,
+    create_database_engine,
+    get_database_name,
+)
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+CATALOG_MIGRATIONS = {
+    "class": "a3e0e80c6dfa_populate_class_table.py",
+    "position": "654c8008ac42_populate_position_table.py",
+    "move": "16abe0f4d3ed_populate_move_table.py",
+}
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+DEFAULT_RESULTS_DIR = Path("benchmark_results")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the BJJ data pipeline on synthetic worksheets"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "--database",
+        required=True,
+        help=(
+            "Scratch database to run the pipeline against, whose bjj tables are"
+            " overwritten. Must differ from the tier's database"
+        ),
+    )
+    parser.add_argument(
+        "--years", type=int, default=5, help="Years of attendance to generate"
+    )
+    parser.add_argument(
+        "--classes-per-week",
+        type=int,
+        default=5,
+        help="Classes attended per week, capped at the number of classes seeded",
+    )
+    parser.add_argument(
+        "--positions",
+        type=int,
+        default=None,
+        help="Number of distinct positions to draw from. Defaults to all seeded",
+    )
+    parser.add_argument(
+        "--moves",
+        type=int,
+        default=None,
+        help="Number of distinct moves to draw from. Defaults to all seeded",
+    )
+    parser.add_argument(
+        "--load-modes",
+        nargs="+",
+        choices=LOAD_MODES,
+        default=LOAD_MODES,
+        help="Load modes to benchmark. Defaults to all of them",
+    )
+    parser.add_argument(
+        "--loaders",
+        nargs="+",
+        choices=LOADER_METHODS,
+        default=LOADER_METHODS,
+        help="Loader methods to benchmark. Defaults to all of them",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Stream the worksheet in chunks of this many rows",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Run the pipeline with concurrent stage execution",
+    )
+    parser.add_argument(
+        "--results-dir",
+        type=Path,
+        default=DEFAULT_RESULTS_DIR,
+        help=f"Directory to store results in. Defaults to {DEFAULT_RESULTS_DIR}",
+    )
+
+    return parser.parse_args()
+
+
+def load_catalog(table: str) -> List[str]:
+    """Return the names seeded into a dimension table by its populate migration.
+
+    The migration is parsed rather than imported, since its rows only exist as
+    literals inside upgrade().
+    """
+    tree = ast.parse((MIGRATIONS_DIR / CATALOG_MIGRATIONS[table]).read_text())
+    return [
+        ast.literal_eval(node)["name"]
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Dict)
+        and any(
+            isinstance(key, ast.Constant) and key.value == "name" for key in node.keys
+        )
+    ]
+
+
+def create_synthetic_worksheet(
+    years: int,
+    classes_per_week: int,
+    num_positions: Optional[int],
+    num_moves: Optional[int],
+) -> List[List[Any]]:
+    """Create a synthetic attendance worksheet as a header row followed by rows.
+
+    Each week, a random set of distinct classes is attended on the weekday in the
+    class' name, so every (date, class) pair is unique.
+    """
+    rng = np.random.default_rng(seed=0)
+    classes = load_catalog("class")
+    positions = load_catalog("position")[:num_positions]
+    moves = load_catalog("move")[:num_moves]
+    classes_per_week = min(classes_per_week, len(classes))
+    class_weekdays = [WEEKDAYS.index(name.split()[0]) for name in classes]
+
+    header = ["Date", "Class", "Notes"]
+    header += [f"Position {i}" for i in range(1, 4)]
+    header += [f"Move {i}" for i in range(1, 5)]
+
+    rows: List[List[Any]] = [header]
+    first_day = pd.Timestamp(datetime.now().year - years, 1, 1)
+    first_monday = first_day + pd.Timedelta(days=(7 - first_day.weekday()) % 7)
+    for week in range(years * 52):
+        week_start = first_monday + pd.Timedelta(weeks=week)
+        for class_idx in rng.choice(len(classes), classes_per_week, replace=False):
+            date = week_start + pd.Timedelta(days=class_weekdays[class_idx])
+            num_class_positions = rng.integers(1, 4)
+            num_class_moves = rng.integers(0, 5)
+            class_positions = list(rng.choice(positions, num_class_positions))
+            class_moves = list(rng.choice(moves, num_class_moves))
+            rows.append(
+                [date.strftime("%Y-%m-%d"), classes[class_idx], ""]
+                + class_positions
+                + [""] * (3 - num_class_positions)
+                + class_moves
+                + [""] * (4 - num_class_moves)
+            )
+
+    return rows
+
+
+class FakeWorksheet:
+    """Serve a worksheet held in memory through the gspread Worksheet methods the
+    pipeline uses."""
+
+    def __init__(self, values: List[List[Any]]):
+        self._values = values
+        self.row_count = len(values)
+
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        """Return every row after the header as a dict keyed by the header."""
+        header = self._values[0]
+        return [dict(zip(header, row)) for row in self._values[1:]]
+
+    def row_values(self, row: int) -> List[Any]:
+        """Return the values of a row (one-based)."""
+        return self._values[row - 1]
+
+    def get_values(self, range_name: str) -> List[List[Any]]:
+        """Return the rows in an A1 range such as A2:K1001."""
+        match = re.fullmatch(r"[A-Z]+(\d+):[A-Z]+(\d+)", range_name)
+        assert match, f"Unsupported range: {range_name}"
+        return self._values[int(match.group(1)) - 1 : int(match.group(2))]
+
+
+class FakeSpreadsheet:
+    """A spreadsheet holding a single in-memory worksheet."""
+
+    def __init__(self, worksheet: FakeWorksheet):
+        self.id = "synthetic"
+        # Changes every run so the pipeline never skips the benchmark
+        self.lastUpdateTime = datetime.now().isoformat()
+        self._worksheet = worksheet
+
+    def worksheet(self, worksheet_name: str) -> FakeWorksheet:
+        """Return the worksheet, whatever its name."""
+        LOGGER.debug("Serving synthetic worksheet for %s", worksheet_name)
+        return self._worksheet
+
+
+class FakeClient:
+    """A gspread client that serves a single in-memory spreadsheet."""
+
+    def __init__(self, values: List[List[Any]]):
+        self._spreadsheet = FakeSpreadsheet(FakeWorksheet(values))
+
+    def open(self, spreadsheet_name: str) -> FakeSpreadsheet:
+        """Return the spreadsheet, whatever its name."""
+        LOGGER.debug("Serving synthetic spreadsheet for %s", spreadsheet_name)
+        return self._spreadsheet
+
+
+def summarize_stages(report: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Return per-stage metrics from a run report, keyed by stage[:table]."""
+    stages = {}
+    for stage in report["stages"]:
+        key = f"{stage['name']}:{stage['table']}" if stage["table"] else stage["name"]
+        wall_time = stage["wall_time_seconds"]
+        stages[key] = {
+            "wall_time_seconds": wall_time,
+            "rows": stage["rows"],
+            "rows_per_second": stage["rows"] / wall_time if wall_time else 0.0,
+            "rss_before_bytes": stage["rss_before_bytes"],
+            "rss_after_bytes": stage["rss_after_bytes"],
+        }
+    return stages
+
+
+def find_previous_result(
+    results_dir: Path, config: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Return the most recent stored result with the same configuration."""
+    for path in sorted(results_dir.glob("*.json"), reverse=True):
+        result = json.loads(path.read_text())
+        if result["config"] == config:
+            return result
+    return None
+
+
+def print_result(
+    result: Dict[str, Any], previous: Optional[Dict[str, Any]] = None
+) -> None:
+    """Print per-stage metrics, with the change in wall time since a previous run."""
+    print(f"\n{json.dumps(result['config'])}")
+    print(
+        f"total: {result['duration_seconds']:.2f}s,"
+        f" {result['process_peak_rss_bytes'] / 2**20:,.0f} MiB peak RSS so far"
+    )
+    for key, stage in result["stages"].items():
+        change = ""
+        if previous and key in previous["stages"]:
+            before = previous["stages"][key]["wall_time_seconds"]
+            if before:
+                change = f" ({(stage['wall_time_seconds'] - before) / before:+.0%})"
+        rss = ""
+        # The current RSS isn't available on every platform
+        if stage["rss_after_bytes"] is not None:
+            rss_change = stage["rss_after_bytes"] - stage["rss_before_bytes"]
+            rss = (
+                f" {stage['rss_after_bytes'] / 2**20:>8,.0f} MiB RSS"
+                f" ({rss_change / 2**20:+,.0f} MiB)"
+            )
+        print(
+            f"  {key:<32} {stage['wall_time_seconds']:8.3f}s{change:<8}"
+            f" {stage['rows']:>10,} rows {stage['rows_per_second']:>12,.0f} rows/s"
+            f"{rss}"
+        )
+
+
+def empty_loaded_tables() -> None:
+    """Empty the tables the pipeline loads into.
+
+    The full load mode only rewrites years whose data changed, so this makes it load
+    every year of the worksheet rather than skip all of them.
+    """
+    tables = ", ".join(
+        f"{BJJ_SCHEMA_NAME}.{table}" for table in PipelineRun.TABLES_TO_UPDATE
+    )
+    with create_database_engine().begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables}"))
+
+
+def main() -> None:
+    """Run the pipeline on a synthetic worksheet for each configuration."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    if os.environ.get("TIER", "dev") != "dev":
+        raise ValueError("The pipeline benchmark rewrites bjj tables; only run on dev")
+    if not args.database or args.database == get_database_name():
+        raise ValueError(
+            "The pipeline benchmark rewrites bjj tables; give a scratch database with"
+            f" --database other than the tier's database. Got {args.database!r}"
+        )
+    # Point every engine the pipeline creates at the scratch database
+    os.environ[DATABASE_ENV_VAR] = args.database
+
+    values = create_synthetic_worksheet(
+        args.years, args.classes_per_week, args.positions, args.moves
+    )
+    LOGGER.info("Generated a synthetic worksheet with %s rows", len(values) - 1)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    for load_mode, loader in itertools.product(args.load_modes, args.loaders):
+        config = {
+            "years": args.years,
+            "classes_per_week": args.classes_per_week,
+            "positions": args.positions,
+            "moves": args.moves,
+            "load_mode": load_mode,
+            "loader": loader,
+            "chunk_size": args.chunk_size,
+            "concurrent": args.concurrent,
+        }
+        previous = find_previous_result(args.results_dir, config)
+
+        if load_mode == "full":
+            empty_loaded_tables()
+        pipeline = BJJDataPipeline(
+            "machine",
+            config=PipelineConfig(
+                load_mode=load_mode,
+                loader=loader,
+                chunk_size=args.chunk_size,
+                concurrent=args.concurrent,
+            ),
+            gspread_client=FakeClient(values),
+        )
+        report = pipeline.run(force=True).to_dict()
+
+        result = {
+            "config": config,
+            "worksheet_rows": len(values) - 1,
+            "duration_seconds": report["duration_seconds"],
+            "process_peak_rss_bytes": report["process_peak_rss_bytes"],
+            "stages": summarize_stages(report),
+        }
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        (args.results_dir / f"{timestamp}.json").write_text(
+            json.dumps(result, indent=2)
+        )
+        print_result(result, previous)
+
+
+if __name__ == "__main__":
+    main()
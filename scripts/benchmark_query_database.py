@@ -0,0 +1,144 @@
+"""Benchmark the row-based and columnar fetch modes of database_utils.query_database.
+
+Fills scratch copies of the moves_practiced and positions_practiced tables with
+synthetic rows, selects every row back with each fetch mode, and reports how long
+each select took and the peak memory allocated while it ran. Requires a database
+connection configured the same way as the data pipeline (i.e. via
+secrets.<tier>.env).
+
+Usage:
+    poetry run python scripts/benchmark_query_database.py -v
+    poetry run python scripts/benchmark_query_database.py --num-rows 100000 1000000
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+
+from sqlalchemy import MetaData, Table, select, text
+
+from bjj_journey.database_utils import create_database_engine, query_database
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+BENCHMARK_SCHEMA = "bjj_benchmark"
+# Practiced table to the name of its skill ID column
+BENCHMARK_TABLES = {
+    "moves_practiced": "move_id",
+    "positions_practiced": "position_id",
+}
+DEFAULT_NUM_ROWS = [1_000_000]
+FETCH_MODES = {"rows": False, "columnar": True}
+# Mirrors bjj.<table> without the foreign keys
+CREATE_BENCHMARK_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {schema}.{table} (
+    id SERIAL PRIMARY KEY,
+    date DATE NOT NULL,
+    class_id INTEGER NOT NULL,
+    {id_col} INTEGER NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+)
+"""
+FILL_BENCHMARK_TABLE_SQL = """
+INSERT INTO {schema}.{table} (date, class_id, {id_col})
+SELECT
+    DATE '2018-01-01' + (random() * 365 * 5)::INTEGER,
+    1 + (random() * 30)::INTEGER,
+    1 + (random() * 100)::INTEGER
+FROM generate_series(1, :num_rows)
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fetch modes of query_database"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "-n",
+        "--num-rows",
+        nargs="+",
+        type=int,
+        default=DEFAULT_NUM_ROWS,
+        help="Number of rows to select per benchmark run. Defaults to 1M",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Time and measure each fetch mode for each table at each number of rows."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    engine = create_database_engine()
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {BENCHMARK_SCHEMA}"))
+        for table, id_col in BENCHMARK_TABLES.items():
+            conn.execute(
+                text(
+                    CREATE_BENCHMARK_TABLE_SQL.format(
+                        schema=BENCHMARK_SCHEMA, table=table, id_col=id_col
+                    )
+                )
+            )
+
+    metadata = MetaData(schema=BENCHMARK_SCHEMA)
+    try:
+        for table, id_col in BENCHMARK_TABLES.items():
+            table_obj = Table(table, metadata, autoload_with=engine)
+            stmt = select(table_obj)
+
+            for num_rows in args.num_rows:
+                LOGGER.info("Filling %s with %s rows", table, num_rows)
+                with engine.begin() as conn:
+                    conn.execute(text(f"TRUNCATE {BENCHMARK_SCHEMA}.{table}"))
+                    conn.execute(
+                        text(
+                            FILL_BENCHMARK_TABLE_SQL.format(
+                                schema=BENCHMARK_SCHEMA, table=table, id_col=id_col
+                            )
+                        ),
+                        {"num_rows": num_rows},
+                    )
+
+                for mode, columnar in FETCH_MODES.items():
+                    # Timed separately from the memory measurement, since tracing
+                    # allocations slows everything down
+                    start_time = time.perf_counter()
+                    query_database(stmt, con=engine, columnar=columnar)
+                    duration = time.perf_counter() - start_time
+
+                    tracemalloc.start()
+                    query_database(stmt, con=engine, columnar=columnar)
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    print(
+                        f"{table:>19} | {mode:>8} | {num_rows:>9,} rows |"
+                        f" {duration:8.2f}s | {num_rows / duration:>12,.0f} rows/s |"
+                        f" {peak_memory / 2**20:>8,.0f} MiB peak"
+                    )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {BENCHMARK_SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
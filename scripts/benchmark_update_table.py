@@ -0,0 +1,128 @@
+"""Benchmark the loader methods of database_utils.update_table.
+
+Loads synthetic moves_practiced rows into a scratch copy of the table with each
+loader method and reports how long each load took. Requires a database connection
+configured the same way as the data pipeline (i.e. via secrets.<tier>.env).
+
+Usage:
+    poetry run python scripts/benchmark_update_table.py -v
+    poetry run python scripts/benchmark_update_table.py --num-rows 10000 100000
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from bjj_journey.database_utils import (
+    LOADER_METHODS,
+    create_database_engine,
+    update_table,
+)
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+BENCHMARK_SCHEMA = "bjj_benchmark"
+BENCHMARK_TABLE = "moves_practiced"
+DEFAULT_NUM_ROWS = [10_000, 100_000, 1_000_000]
+# Mirrors bjj.moves_practiced without the foreign keys
+CREATE_BENCHMARK_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {BENCHMARK_SCHEMA}.{BENCHMARK_TABLE} (
+    id SERIAL PRIMARY KEY,
+    date DATE NOT NULL,
+    class_id INTEGER NOT NULL,
+    move_id INTEGER NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+)
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the loader methods of update_table"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "-n",
+        "--num-rows",
+        nargs="+",
+        type=int,
+        default=DEFAULT_NUM_ROWS,
+        help="Number of rows to load per benchmark run. Defaults to 10k, 100k and 1M",
+    )
+
+    return parser.parse_args()
+
+
+def create_synthetic_data(num_rows: int) -> pd.DataFrame:
+    """Create synthetic data shaped like the data inserted into moves_practiced."""
+    rng = np.random.default_rng(seed=0)
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(
+        rng.integers(0, 365 * 5, size=num_rows), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "date": dates,
+            "class_id": rng.integers(1, 30, size=num_rows),
+            "move_id": rng.integers(1, 100, size=num_rows),
+        }
+    )
+
+
+def main() -> None:
+    """Time each loader method at each number of rows."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    engine = create_database_engine()
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {BENCHMARK_SCHEMA}"))
+        conn.execute(text(CREATE_BENCHMARK_TABLE_SQL))
+
+    try:
+        for num_rows in args.num_rows:
+            data = create_synthetic_data(num_rows)
+            for method in LOADER_METHODS:
+                with engine.begin() as conn:
+                    conn.execute(text(f"TRUNCATE {BENCHMARK_SCHEMA}.{BENCHMARK_TABLE}"))
+
+                start_time = time.perf_counter()
+                with engine.begin() as conn:
+                    update_table(
+                        data,
+                        table=BENCHMARK_TABLE,
+                        con=conn,
+                        schema=BENCHMARK_SCHEMA,
+                        method=method,
+                    )
+                duration = time.perf_counter() - start_time
+
+                print(
+                    f"{method:>8} | {num_rows:>9,} rows | {duration:8.2f}s |"
+                    f" {num_rows / duration:>12,.0f} rows/s"
+                )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {BENCHMARK_SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
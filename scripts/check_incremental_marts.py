@@ -0,0 +1,144 @@
+"""Check that incremental builds of the dbt marts match full rebuilds.
+
+Builds the marts incrementally, sets the results aside in a scratch schema, rebuilds
+the marts with --full-refresh (which recomputes every year of their build tables in
+place), and compares the two row for row. Exits with an error if any mart differs.
+Either way, the marts are left fully rebuilt.
+
+Requires a database connection configured the same way as the data pipeline (i.e.
+via secrets.<tier>.env) with data loaded, and the marts built at least once before
+the data last changed, so that the incremental build has something to update.
+
+Usage:
+    poetry run python scripts/check_incremental_marts.py -v --target dev
+"""
+import argparse
+import logging
+from pathlib import Path
+import subprocess
+import sys
+from typing import List, Optional
+
+from sqlalchemy import Engine, text
+
+from bjj_journey.database_utils import (
+    BJJ_SCHEMA_NAME,
+    CLASS_ATTD_METRICS_TABLE,
+    MOVE_METRICS_TABLE,
+    POSITION_METRICS_TABLE,
+    create_database_engine,
+)
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+DBT_PROJECT_DIR = Path(__file__).resolve().parents[1] / "dbt"
+MART_TABLES = [CLASS_ATTD_METRICS_TABLE, MOVE_METRICS_TABLE, POSITION_METRICS_TABLE]
+CHECK_SCHEMA = "bjj_incremental_check"
+# Rows in one table but not the other, counting duplicates
+COUNT_DIFFERENCES_SQL = """
+SELECT count(*) FROM (
+    (SELECT * FROM {left} EXCEPT ALL SELECT * FROM {right})
+    UNION ALL
+    (SELECT * FROM {right} EXCEPT ALL SELECT * FROM {left})
+) differences
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Check that incremental builds of the marts match full rebuilds"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "--target", default="dev", help="dbt target to build. Defaults to dev"
+    )
+    parser.add_argument(
+        "--profiles-dir",
+        type=Path,
+        default=None,
+        help="Directory holding the dbt profiles.yml. Defaults to dbt's default",
+    )
+
+    return parser.parse_args()
+
+
+def run_dbt(target: str, profiles_dir: Optional[Path], *args: str) -> None:
+    """Build the marts with dbt, passing along any extra arguments."""
+    command: List[str] = ["dbt", "run", "--project-dir", str(DBT_PROJECT_DIR)]
+    command += ["--target", target, "--select", "marts", *args]
+    if profiles_dir is not None:
+        command += ["--profiles-dir", str(profiles_dir)]
+
+    LOGGER.info("Running: %s", " ".join(command))
+    subprocess.run(command, check=True)
+
+
+def count_differences(table: str, engine: Engine) -> int:
+    """Count the rows that differ between a mart and its incremental copy."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                COUNT_DIFFERENCES_SQL.format(
+                    left=f"{BJJ_SCHEMA_NAME}.{table}", right=f"{CHECK_SCHEMA}.{table}"
+                )
+            )
+        ).scalar_one()
+
+
+def main() -> None:
+    """Build the marts incrementally and from scratch, and compare the results."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    engine = create_database_engine()
+    run_dbt(args.target, args.profiles_dir)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {CHECK_SCHEMA}"))
+        for table in MART_TABLES:
+            conn.execute(
+                text(
+                    f"CREATE TABLE {CHECK_SCHEMA}.{table} AS"
+                    f" SELECT * FROM {BJJ_SCHEMA_NAME}.{table}"
+                )
+            )
+
+    failures = []
+    try:
+        run_dbt(args.target, args.profiles_dir, "--full-refresh")
+        for table in MART_TABLES:
+            num_differences = count_differences(table, engine)
+            if num_differences:
+                failures.append(table)
+                print(f"FAIL {table}: {num_differences} rows differ")
+            else:
+                print(f"ok   {table}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {CHECK_SCHEMA} CASCADE"))
+
+    if failures:
+        sys.exit(
+            f"{len(failures)} of {len(MART_TABLES)} marts differ between incremental"
+            " and full builds"
+        )
+
+
+if __name__ == "__main__":
+    main()
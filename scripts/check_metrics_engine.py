@@ -0,0 +1,160 @@
+"""Check that the in-process metrics engine builds the same marts as dbt.
+
+Builds the marts with dbt, computes them with the metrics engine the data pipeline
+runs with --build-metrics, loads the engine's results into a scratch schema, and
+compares the two row for row. Exits with an error if any mart differs. The marts
+are left as dbt built them.
+
+Requires a database connection configured the same way as the data pipeline (i.e.
+via secrets.<tier>.env) with data loaded.
+
+Usage:
+    poetry run python scripts/check_metrics_engine.py -v --target dev
+"""
+import argparse
+import logging
+from pathlib import Path
+import subprocess
+import sys
+from typing import List, Optional
+
+from sqlalchemy import Engine, text
+
+from bjj_journey.data_pipeline.metrics import METRICS_TABLES, compute_metrics_tables
+from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
+    BJJ_SCHEMA_NAME,
+    CLASS_ATTD_TABLE,
+    CLASS_TABLE,
+    MOVE_TABLE,
+    MOVES_PRACTICED_TABLE,
+    POSITION_TABLE,
+    POSITIONS_PRACTICED_TABLE,
+    copy_data_into_table,
+    create_database_engine,
+    get_metadata,
+)
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+DBT_PROJECT_DIR = Path(__file__).resolve().parents[1] / "dbt"
+SOURCE_TABLES = [
+    ATHLETE_TABLE,
+    CLASS_TABLE,
+    CLASS_ATTD_TABLE,
+    MOVE_TABLE,
+    MOVES_PRACTICED_TABLE,
+    POSITION_TABLE,
+    POSITIONS_PRACTICED_TABLE,
+]
+CHECK_SCHEMA = "bjj_metrics_engine_check"
+# Rows in one table but not the other, counting duplicates
+COUNT_DIFFERENCES_SQL = """
+SELECT count(*) FROM (
+    (SELECT * FROM {left} EXCEPT ALL SELECT * FROM {right})
+    UNION ALL
+    (SELECT * FROM {right} EXCEPT ALL SELECT * FROM {left})
+) differences
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Check that the metrics engine builds the same marts as dbt"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "--target", default="dev", help="dbt target to build. Defaults to dev"
+    )
+    parser.add_argument(
+        "--profiles-dir",
+        type=Path,
+        default=None,
+        help="Directory holding the dbt profiles.yml. Defaults to dbt's default",
+    )
+
+    return parser.parse_args()
+
+
+def run_dbt(target: str, profiles_dir: Optional[Path]) -> None:
+    """Build the marts with dbt."""
+    command: List[str] = ["dbt", "run", "--project-dir", str(DBT_PROJECT_DIR)]
+    command += ["--target", target, "--select", "marts"]
+    if profiles_dir is not None:
+        command += ["--profiles-dir", str(profiles_dir)]
+
+    LOGGER.info("Running: %s", " ".join(command))
+    subprocess.run(command, check=True)
+
+
+def count_differences(table: str, engine: Engine) -> int:
+    """Count the rows that differ between a mart and the engine's version of it."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                COUNT_DIFFERENCES_SQL.format(
+                    left=f"{BJJ_SCHEMA_NAME}.{table}", right=f"{CHECK_SCHEMA}.{table}"
+                )
+            )
+        ).scalar_one()
+
+
+def main() -> None:
+    """Build the marts with dbt and the metrics engine, and compare the results."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    engine = create_database_engine()
+    run_dbt(args.target, args.profiles_dir)
+    metadata = get_metadata(engine, tables=SOURCE_TABLES + METRICS_TABLES)
+
+    with engine.begin() as conn:
+        metrics_tables = compute_metrics_tables(metadata, con=conn)
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {CHECK_SCHEMA}"))
+        for table, data in metrics_tables.items():
+            conn.execute(
+                text(
+                    f"CREATE TABLE {CHECK_SCHEMA}.{table}"
+                    f" (LIKE {BJJ_SCHEMA_NAME}.{table})"
+                )
+            )
+            copy_data_into_table(data, table, con=conn, schema=CHECK_SCHEMA)
+
+    failures = []
+    try:
+        for table in METRICS_TABLES:
+            num_differences = count_differences(table, engine)
+            if num_differences:
+                failures.append(table)
+                print(f"FAIL {table}: {num_differences} rows differ")
+            else:
+                print(f"ok   {table}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {CHECK_SCHEMA} CASCADE"))
+
+    if failures:
+        sys.exit(
+            f"{len(failures)} of {len(METRICS_TABLES)} marts differ between the"
+            " metrics engine and dbt"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Check that the dashboard's metric lookups use the indexes on the metrics marts.
+
+Runs EXPLAIN on each BJJDataFetcher query that reads from the metrics marts and fails
+if any plan has a sequential scan on a mart. Sequential scans are disabled while
+planning, so a small seeded database can't hide a missing index: the planner only
+falls back to one when no index can serve the query.
+
+Requires a database connection configured the same way as the data pipeline (i.e.
+via secrets.<tier>.env), with data loaded (e.g. by make benchmark_pipeline) and the
+marts built by dbt (make dbt_run).
+
+Usage:
+    poetry run python scripts/check_query_plans.py -v
+    poetry run python scripts/check_query_plans.py --dashboard-views Overall 2023
+    poetry run python scripts/check_query_plans.py --athlete Sam
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import Connection, Executable, text
+
+from bjj_journey.data_pipeline.sources import DEFAULT_ATHLETE
+from bjj_journey.database_utils import (
+    BJJ_SCHEMA_NAME,
+    CLASS_ATTD_METRICS_TABLE,
+    MOVE_METRICS_TABLE,
+    POSITION_METRICS_TABLE,
+    create_database_engine,
+    get_metadata,
+)
+from bjj_journey.streamlit_app.data import BJJDataFetcher
+from bjj_journey.utils import load_dotenv_file, set_up_logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+INDEXED_TABLES = [CLASS_ATTD_METRICS_TABLE, MOVE_METRICS_TABLE, POSITION_METRICS_TABLE]
+DEFAULT_DASHBOARD_VIEWS = ["Overall", "2023"]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Check that dashboard queries don't sequentially scan the marts"
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help=(
+            "Increase level of feedback output. Use -vv for even more detail. "
+            "Log level defaults to 'WARNING'"
+        ),
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+    parser.add_argument(
+        "--dashboard-views",
+        nargs="+",
+        default=DEFAULT_DASHBOARD_VIEWS,
+        help=(
+            "Dashboard views to check queries for. Defaults to"
+            f" {DEFAULT_DASHBOARD_VIEWS}"
+        ),
+    )
+
+    parser.add_argument(
+        "--athlete",
+        default=DEFAULT_ATHLETE,
+        help=f"Athlete to check queries for. Defaults to {DEFAULT_ATHLETE}",
+    )
+
+    return parser.parse_args()
+
+
+def iter_plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield a node of an EXPLAIN (FORMAT JSON) plan and every node below it."""
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def explain(stmt: Executable, conn: Connection) -> Dict[str, Any]:
+    """Return the plan of a query, planned with sequential scans disabled."""
+    compiled = stmt.compile(
+        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+    )
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar_one()
+    # psycopg2 parses json columns, but not every driver does
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]["Plan"]
+
+
+def find_seq_scans(plan: Dict[str, Any], tables: List[str]) -> List[str]:
+    """Return the tables among the given ones that a plan scans sequentially."""
+    return [
+        node["Relation Name"]
+        for node in iter_plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables
+    ]
+
+
+def main() -> None:
+    """Explain each dashboard query and exit with an error on sequential scans."""
+    args = parse_args()
+    set_up_logging(args.verbosity)
+    load_dotenv_file()
+
+    engine = create_database_engine()
+    metadata = get_metadata(engine, tables=INDEXED_TABLES)
+    queries: Dict[str, Executable] = {
+        f"metric_bundle[{view}]": BJJDataFetcher.build_metric_bundle_query(
+            metadata, view, args.athlete
+        )
+        for view in args.dashboard_views
+    }
+    queries["num_classes_per_month"] = BJJDataFetcher.build_num_classes_per_month_query(
+        metadata, args.athlete
+    )
+    for view in args.dashboard_views:
+        for skill_type in BJJDataFetcher.SKILL_METRICS_TABLES:
+            queries[f"{skill_type}_rolling_per_month[{view}]"] = (
+                BJJDataFetcher.build_skill_metric_per_month_query(
+                    metadata,
+                    view,
+                    args.athlete,
+                    skill_type,
+                    BJJDataFetcher.get_rolling_metric_name(30),
+                )
+            )
+
+    failures = []
+    for name, stmt in queries.items():
+        with engine.begin() as conn:
+            plan = explain(stmt, conn)
+        seq_scans = find_seq_scans(plan, INDEXED_TABLES)
+        LOGGER.debug("Plan for %s: %s", name, json.dumps(plan, indent=2))
+
+        if seq_scans:
+            failures.append(name)
+            tables = ", ".join(f"{BJJ_SCHEMA_NAME}.{table}" for table in seq_scans)
+            print(f"FAIL {name}: sequential scan on {tables}")
+        else:
+            print(f"ok   {name}")
+
+    if failures:
+        sys.exit(f"{len(failures)} of {len(queries)} queries scan a mart sequentially")
+
+
+if __name__ == "__main__":
+    main()
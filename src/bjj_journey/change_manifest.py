@@ -0,0 +1,204 @@
+"""bjj_journey.change_manifest - Track the bjj tables changed by the data pipeline.
+
+A data pipeline run records which bjj tables it changed, and over which dates, in a
+change manifest that the dbt run afterwards reads to build only the models downstream
+of those tables, limited to the years of the changed dates.
+
+Changes accumulate in the manifest across pipeline runs until a dbt build clears it,
+so a failed or skipped dbt run doesn't lose them. Run as a module to print the dbt
+node selection for a manifest, which is empty when nothing changed, or the dbt vars
+limiting the build to the changed years, or to add its changes to another manifest:
+
+    poetry run python -m bjj_journey.change_manifest <manifest>
+    poetry run python -m bjj_journey.change_manifest --dbt-vars <manifest>
+    poetry run python -m bjj_journey.change_manifest --merge-into <target> <manifest>
+"""
+import argparse
+from dataclasses import dataclass, field
+from datetime import date
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+from bjj_journey.database_utils import BJJ_SCHEMA_NAME
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of the dbt source the bjj tables are declared under
+DBT_SOURCE_NAME = BJJ_SCHEMA_NAME
+
+
+@dataclass
+class ChangeManifest:
+    """The bjj tables changed since the marts were last built, and over which dates.
+
+    Attributes:
+        tables: the bjj tables that had rows inserted, updated or deleted.
+        min_date: the earliest date of a changed row.
+        max_date: the latest date of a changed row.
+        all_dates: whether rows of any date may have changed (e.g. tables were
+            swapped out wholesale), in which case the date range is left unset.
+    """
+
+    tables: Set[str] = field(default_factory=set)
+    min_date: Optional[date] = None
+    max_date: Optional[date] = None
+    all_dates: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        """Return whether no table changed."""
+        return not self.tables
+
+    def record(self, table: str, dates: Optional[pd.Series] = None) -> None:
+        """Record that rows of a table changed.
+
+        Args:
+            table: the bjj table that changed.
+            dates: the dates of the changed rows. Defaults to any date.
+        """
+        if dates is None:
+            self.tables.add(table)
+            self.all_dates = True
+            self.min_date = self.max_date = None
+            return
+
+        dates = pd.to_datetime(dates).dropna()
+        if dates.empty:
+            return
+
+        self.tables.add(table)
+        if not self.all_dates:
+            first, last = dates.min().date(), dates.max().date()
+            self.min_date = (
+                first if self.min_date is None else min(self.min_date, first)
+            )
+            self.max_date = last if self.max_date is None else max(self.max_date, last)
+
+    def merge(self, other: "ChangeManifest") -> None:
+        """Fold the changes of another manifest into this one."""
+        for table in other.tables:
+            self.record(
+                table,
+                (
+                    None
+                    if other.all_dates
+                    else pd.Series([other.min_date, other.max_date])
+                ),
+            )
+
+    def get_dbt_selector(self) -> str:
+        """Return the dbt node selection for the models downstream of the changed
+        tables, or an empty string if no table changed."""
+        return " ".join(
+            f"source:{DBT_SOURCE_NAME}.{table}+" for table in sorted(self.tables)
+        )
+
+    def get_dbt_vars(self) -> Dict[str, List[int]]:
+        """Return the dbt vars limiting the int models to the changed years, or no
+        vars if rows of any date may have changed.
+
+        The year after the last changed one is included too, since the rolling
+        metrics of its first days look back into the changed years.
+        """
+        if self.is_empty or self.all_dates:
+            return {}
+        assert self.min_date is not None and self.max_date is not None
+        return {"years": list(range(self.min_date.year, self.max_date.year + 2))}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the manifest as a JSON-serializable dict."""
+        return {
+            "tables": sorted(self.tables),
+            "min_date": self.min_date.isoformat() if self.min_date else None,
+            "max_date": self.max_date.isoformat() if self.max_date else None,
+            "all_dates": self.all_dates,
+            "dbt_select": self.get_dbt_selector(),
+            "dbt_vars": self.get_dbt_vars(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChangeManifest":
+        """Build a manifest from the dict to_dict returns."""
+        return cls(
+            tables=set(data["tables"]),
+            min_date=date.fromisoformat(data["min_date"]) if data["min_date"] else None,
+            max_date=date.fromisoformat(data["max_date"]) if data["max_date"] else None,
+            all_dates=data["all_dates"],
+        )
+
+    @classmethod
+    def read(cls, path: Path) -> "ChangeManifest":
+        """Read a manifest from a JSON file, which is empty if the file is missing."""
+        if not path.exists():
+            return cls()
+        return cls.from_dict(json.loads(path.read_text()))
+
+    def write(self, path: Path) -> None:
+        """Add the changes to the manifest at the given path, creating it if needed.
+
+        The file is written to a temporary path and renamed into place so that a
+        dbt run never reads a partially written manifest.
+        """
+        manifest = self.read(path)
+        manifest.merge(self)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(manifest.to_dict(), indent=2))
+        os.replace(tmp_path, path)
+        LOGGER.info(
+            "Wrote change manifest to %s: %s", path, manifest.get_dbt_selector()
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "Print the dbt node selection for the changes in a change manifest, which"
+            " is empty if nothing changed"
+        )
+    )
+    parser.add_argument("manifest", type=Path, help="Path to the change manifest")
+    parser.add_argument(
+        "--dbt-vars",
+        action="store_true",
+        help=(
+            "Print the dbt vars limiting the build to the changed years instead, as"
+            " a value for dbt's --vars option"
+        ),
+    )
+    parser.add_argument(
+        "--merge-into",
+        type=Path,
+        metavar="TARGET",
+        help=(
+            "Add the changes to the change manifest at TARGET, creating it if needed,"
+            " instead of printing anything"
+        ),
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print the dbt node selection or vars for a change manifest, or merge it into
+    another one."""
+    args = parse_args()
+    manifest = ChangeManifest.read(args.manifest)
+    if args.merge_into:
+        if not manifest.is_empty:
+            manifest.write(args.merge_into)
+    elif args.dbt_vars:
+        print(json.dumps(manifest.get_dbt_vars()))
+    else:
+        print(manifest.get_dbt_selector())
+
+
+if __name__ == "__main__":
+    main()
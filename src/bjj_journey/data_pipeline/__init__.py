@@ -2,32 +2,64 @@
 
 """
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 import logging
 import os
+from pathlib import Path
 import re
 import time
+from typing import Iterator, List, Optional, Union
 
 import google.auth
 import gspread
 import pandas as pd
 
 from dotenv import load_dotenv
-from sqlalchemy import Connection, select
-
-from bjj_journey.data_pipeline.checks import check_ids, validate_table
+from sqlalchemy import select
+
+from bjj_journey.data_pipeline.athletes import add_athletes
+from bjj_journey.data_pipeline.checks import check_unique_classes, validate_table
+from bjj_journey.data_pipeline.config import (
+    DEFAULT_FETCH_WORKERS,
+    LOAD_MODES,
+    PipelineConfig,
+)
+from bjj_journey.data_pipeline.dimension_cache import DimensionCache
+from bjj_journey.data_pipeline.fingerprint import (
+    get_spreadsheet_fingerprint,
+    get_stored_fingerprint,
+    get_worksheet_source,
+    store_fingerprint,
+)
+from bjj_journey.data_pipeline.metrics import (
+    METRICS_BUILD_TABLES,
+    compute_metrics_tables,
+    write_metrics_table,
+)
+from bjj_journey.data_pipeline.normalize import lookup_ids
+from bjj_journey.data_pipeline.partitions import rewrite_years
+from bjj_journey.data_pipeline.report import RunReport
+from bjj_journey.data_pipeline.run import PipelineRun
+from bjj_journey.data_pipeline.sources import (
+    WorksheetReader,
+    WorksheetSource,
+    load_manifest,
+)
+from bjj_journey.data_pipeline.swap import swap_tables
+from bjj_journey.data_pipeline.sync import sync_tables
 from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
     BJJ_SCHEMA_NAME,
-    CLASS_ATTD_TABLE,
-    MOVES_PRACTICED_TABLE,
+    CLASS_TABLE,
+    DEFAULT_LOADER_METHOD,
+    LOADER_METHODS,
+    MOVE_TABLE,
+    PIPELINE_FINGERPRINT_TABLE,
     POSITION_TABLE,
-    POSITIONS_PRACTICED_TABLE,
     create_database_engine,
-    delete_data_from_table,
     get_metadata,
     query_database,
-    reset_sequence,
-    update_table,
 )
 
 from bjj_journey.utils import load_dotenv_file, set_up_logging
@@ -42,6 +74,8 @@ class BJJDataPipeline:
     BJJ_SPREADSHEET_NAME = "BJJ Dashboard"
     BJJ_WORKSHEET_NAME = "BJJ Total Attendance"
     WORKSHEET_COLS_TO_KEEP = [
+        "athlete",
+        "athlete_id",
         "date",
         "class",
         "class_id",
@@ -54,37 +88,48 @@ class BJJDataPipeline:
         "move3",
         "move4",
     ]
-    CLASS_ATTENDANCE_TABLE_COLS = ["date", "class_id", "notes"]
-    WORKSHEET_COLS_FOR_POSITION_TABLE = [
-        "date",
-        "class_id",
-        "position1",
-        "position2",
-        "position3",
-    ]
-    POSITION_TABLE_COLS = ["date", "class_id", "position_id"]
-    WORKSHEET_COLS_FOR_MOVE_TABLE = [
-        "date",
-        "class_id",
-        "move1",
-        "move2",
-        "move3",
-        "move4",
+    # Columns kept that are added by normalization rather than pulled from the
+    # worksheet
+    NORMALIZED_COLS = ["athlete", "athlete_id", "class_id"]
+    # Tables the pipeline reads from or writes to
+    TABLES = [
+        ATHLETE_TABLE,
+        CLASS_TABLE,
+        POSITION_TABLE,
+        MOVE_TABLE,
+        *PipelineRun.TABLES_TO_UPDATE,
+        PIPELINE_FINGERPRINT_TABLE,
     ]
-    MOVE_TABLE_COLS = ["date", "class_id", "move_id"]
-    # Order matters here - class_attendance should be last
-    TABLES_TO_UPDATE = [
-        POSITIONS_PRACTICED_TABLE,
-        MOVES_PRACTICED_TABLE,
-        CLASS_ATTD_TABLE,
-    ]
-    SEQUENCES_TO_RESET = ["positions_practiced_id_seq", "moves_practiced_id_seq"]
 
-    def __init__(self, user_type: str):
+    def __init__(
+        self,
+        user_type: str,
+        config: Optional[PipelineConfig] = None,
+        gspread_client: Optional[gspread.Client] = None,
+        sources: Optional[List[WorksheetSource]] = None,
+    ):
         self.__validate_user_type(user_type)
-        self._gspread_client = self.__get_gspread_client(user_type)
-        self._db_engine = create_database_engine()
-        self._metadata = get_metadata(self._db_engine)
+        self._config = config or PipelineConfig()
+        # A client can be passed in directly, e.g. a fake client for benchmarks
+        self._reader = WorksheetReader(
+            gspread_client or self.__get_gspread_client(user_type)
+        )
+        self._sources = sources or [
+            WorksheetSource(self.BJJ_SPREADSHEET_NAME, self.BJJ_WORKSHEET_NAME)
+        ]
+        self._db_engine = create_database_engine(role="pipeline")
+        self._metadata = get_metadata(
+            self._db_engine,
+            tables=self.TABLES
+            + (METRICS_BUILD_TABLES if self._config.build_metrics else []),
+        )
+        self._dimension_cache = DimensionCache(
+            self._db_engine, load_table_ids=self._get_table_ids
+        )
+        # Replaced by a fresh run each time the pipeline is run
+        self._current_run = PipelineRun(
+            self._metadata, self._dimension_cache, config=self._config
+        )
 
     @staticmethod
     def __validate_user_type(user_type: str) -> None:
@@ -126,21 +171,98 @@ class BJJDataPipeline:
             a dataframe containing the data from the specified worksheet in the
                 specified spreadsheet.
         """
-        LOGGER.info("Opening the following Google Spreadsheet: %s", spreadsheet_name)
-        spreadsheet = self._gspread_client.open(spreadsheet_name)
-
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        data = pd.DataFrame(worksheet.get_all_records())
+        worksheet = self._reader.open_worksheet(spreadsheet_name, worksheet_name)
+        with self._current_run.report.stage("fetch") as stage:
+            self._reader.wait()
+            data = pd.DataFrame(worksheet.get_all_records())
+            stage.rows = data.shape[0]
         LOGGER.info("Loaded data from the following worksheet: %s", worksheet_name)
 
         return data
 
+    def iter_data_from_spreadsheet(
+        self, spreadsheet_name: str, worksheet_name: str, chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Lazily load data from a worksheet within a Google spreadsheet as pandas
+        DataFrames of at most chunk_size rows each.
+
+        Each chunk is fetched with its own ranged request, so only one chunk of the
+        worksheet is held in memory at a time. Values are numericised the same way
+        Worksheet.get_all_records does.
+
+        Args:
+            spreadsheet_name: the name of the spreadsheet to load data from.
+            worksheet_name: the name of the worksheet (within the spreadsheet)
+                to load data from.
+            chunk_size: the maximum number of worksheet rows per chunk.
+
+        Yields:
+            dataframes containing consecutive rows from the specified worksheet in
+                the specified spreadsheet.
+        """
+        worksheet = self._reader.open_worksheet(spreadsheet_name, worksheet_name)
+        self._reader.wait()
+        header = worksheet.row_values(1)
+        last_col = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, len(header)))
+
+        # Row 1 is the header, so data starts on row 2
+        for start_row in range(2, worksheet.row_count + 1, chunk_size):
+            end_row = start_row + chunk_size - 1
+            with self._current_run.report.stage("fetch") as stage:
+                self._reader.wait()
+                values = worksheet.get_values(f"A{start_row}:{last_col}{end_row}")
+
+                # The API trims trailing empty cells, so pad rows back out to the
+                # header
+                records = [
+                    gspread.utils.numericise_all(row + [""] * (len(header) - len(row)))
+                    for row in values
+                ]
+                stage.rows = len(records)
+
+            if not records:
+                break
+
+            LOGGER.info(
+                "Loaded rows %s to %s from the following worksheet: %s",
+                start_row,
+                start_row + len(values) - 1,
+                worksheet_name,
+            )
+            yield pd.DataFrame(records, columns=header)
+
+            if len(values) < chunk_size:
+                break
+
+    def _load_and_normalize_source(self, source: WorksheetSource) -> pd.DataFrame:
+        """Load data from a worksheet source and normalize it."""
+        data = self.load_data_from_spreadsheet(source.spreadsheet, source.worksheet)
+        return self._normalize_data(data, athlete=source.athlete)
+
+    def _load_and_normalize_sources(self) -> pd.DataFrame:
+        """Load and normalize data from every worksheet source.
+
+        Worksheets are fetched and normalized concurrently on a bounded pool (all
+        requests share the Sheets API rate limiter) and then combined, so the load
+        takes about as long as the slowest worksheet.
+        """
+        num_workers = min(self._config.fetch_workers, len(self._sources))
+        with ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="bjj_fetch"
+        ) as pool:
+            frames = list(pool.map(self._load_and_normalize_source, self._sources))
+
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        check_unique_classes(data)
+        return data
+
     def _get_table_ids(self, table: str) -> pd.DataFrame:
         """Get the ID and name columns from a given table
 
         Args:
             table: the name of the table to get data for. Allowed values include
-                class, position, and move.
+                athlete, class, position, and move.
 
         Returns:
             a pandas DataFrame containing the id and name column of the given table
@@ -162,39 +284,44 @@ class BJJDataPipeline:
     def _merge_in_table_ids(self, data: pd.DataFrame, table: str) -> pd.DataFrame:
         """Merge IDs into a given dataframe.
 
+        IDs are looked up by name in the dimension cache, so this usually doesn't
+        need to query the database.
+
         Args:
             data: a pandas DataFrame containing BJJ data. The data should have a column
                 with the same name as the given table. This column will be used for the
-                merge.
+                lookup. The ID column is added to the data in place.
             table: the table whose IDs will get merged into the given dataframe.
 
         Returns:
-            a pandas DataFrame with IDs from the given table merged in
+            the given pandas DataFrame with IDs from the given table merged in
         """
         validate_table(table)
 
-        table_ids = self._get_table_ids(table)
-        table_ids = table_ids.rename(columns={"id": f"{table}_id"})
-        data = data.merge(table_ids, left_on=table, right_on="name", how="left")
-
-        check_ids(data, name_col=table, id_col=f"{table}_id")
+        with self._current_run.report.stage("id_merge", table=table) as stage:
+            table_ids = self._current_run.get_dimension_ids(table)
+            data[f"{table}_id"] = lookup_ids(
+                data[table].to_numpy(), table_ids, name_col=table
+            )
+            stage.rows = data.shape[0]
 
         LOGGER.info("Merged in IDs from %s", f"{BJJ_SCHEMA_NAME}.{table}")
 
         return data
 
-    def _normalize_data(self, data: pd.DataFrame) -> pd.DataFrame:
+    def _normalize_data(self, data: pd.DataFrame, athlete: str) -> pd.DataFrame:
         """Normalize data pulled from the BJJ spreadsheet.
 
         Normalization includes:
             - adjusting the column names
             - changing empty strings to NA values
-            - adding in class IDs
+            - adding in the athlete and class IDs
             - keeping necessary columns only
 
         Args:
             data: a pandas DataFrame containing data loaded from a worksheet
                 within a Google spreadsheet.
+            athlete: the name of the athlete whose classes the worksheet holds.
 
         Returns:
             a pandas DataFrame that has been cleaned up in a way that is generally
@@ -209,141 +336,192 @@ class BJJDataPipeline:
             """
             return re.sub(r"\W+", "", col.lower())
 
-        data = data.rename(mapper=adjust_col_names, axis="columns")
-
-        # Change empty strings to None
-        data = data.replace("", None)
-
-        # Add in class IDs
+        with self._current_run.report.stage("normalize") as stage:
+            data = data.rename(mapper=adjust_col_names, axis="columns")
+
+            # Keep necessary columns. Selecting these up front means only the columns
+            # that are kept get copied by the steps below. The rest are added later.
+            data = data[
+                [
+                    col
+                    for col in self.WORKSHEET_COLS_TO_KEEP
+                    if col not in self.NORMALIZED_COLS
+                ]
+            ]
+
+            # Change empty strings to None
+            data = data.replace("", None)
+            data["athlete"] = athlete
+            stage.rows = data.shape[0]
+
+        # Add in athlete and class IDs
+        data = self._merge_in_table_ids(data, table="athlete")
         data = self._merge_in_table_ids(data, table="class")
 
-        # Keep necessary columns
-        data = data[self.WORKSHEET_COLS_TO_KEEP]
-
-        return data
-
-    def _prep_data_for_positions_practiced_table(
-        self, data: pd.DataFrame
-    ) -> pd.DataFrame:
-        """Prep data for insertion into bjj.positions_practiced"""
-        # Reshape worksheet data from long to wide (each position gets its own row)
-        data = data[self.WORKSHEET_COLS_FOR_POSITION_TABLE]
-        data = pd.melt(
-            data,
-            id_vars=["date", "class_id"],
-            value_vars=["position1", "position2", "position3"],
-            value_name="position",
-        )
-        data = data.drop(columns=["variable"])
-
-        # Remove records missing a position
-        data = data[~data["position"].isna()]
-
-        # Add in position IDs
-        data = self._merge_in_table_ids(data, table=POSITION_TABLE)
-
-        # Keep necessary columns
-        data = data[self.POSITION_TABLE_COLS]
-
-        return data
-
-    def _prep_data_for_moves_practiced_table(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Prep data for insertion into bjj.moves_practiced"""
-        # Reshape worksheet data from long to wide (each move gets its own row)
-        data = data[self.WORKSHEET_COLS_FOR_MOVE_TABLE]
-        data = pd.melt(
-            data,
-            id_vars=["date", "class_id"],
-            value_vars=["move1", "move2", "move3", "move4"],
-            value_name="move",
-        )
-        data = data.drop(columns=["variable"])
-
-        # Remove records missing a move
-        data = data[~data["move"].isna()]
-
-        # Add in move IDs
-        data = self._merge_in_table_ids(data, table="move")
-
-        # Keep necessary columns
-        data = data[self.MOVE_TABLE_COLS]
-
-        return data
-
-    def _update_class_attendance_table(
-        self, data: pd.DataFrame, conn: Connection
-    ) -> None:
-        """Update the bjj.class_attendance table.
+        return data[self.WORKSHEET_COLS_TO_KEEP]
 
-        Update methods have a conn parameter so that they can be run as part of a
-        transaction.
+    def _build_metrics_tables(self) -> None:
         """
-        data = data[self.CLASS_ATTENDANCE_TABLE_COLS]
-        update_table(data, table=CLASS_ATTD_TABLE, con=conn)
+        Rebuild the metrics marts in process from the bjj tables, in place of a dbt
+        run.
 
-    def _update_positions_practiced_table(
-        self, data: pd.DataFrame, conn: Connection
-    ) -> None:
-        """Update the bjj.positions_practiced table.
-
-        Update methods have a conn parameter so that they can be run as part of a
-        transaction.
+        The marts are computed from the tables as they stand after the load, which
+        is read back in one query per table, and written in a single transaction so
+        the dashboard never sees a partial rebuild.
         """
-        data = self._prep_data_for_positions_practiced_table(data)
-        update_table(data, table=POSITIONS_PRACTICED_TABLE, con=conn)
-
-    def _update_moves_practiced_table(
-        self, data: pd.DataFrame, conn: Connection
-    ) -> None:
-        """Update the bjj.moves_practiced table.
-
-        Update methods have a conn parameter so that they can be run as part of a
-        transaction.
-        """
-        data = self._prep_data_for_moves_practiced_table(data)
-        update_table(data, table=MOVES_PRACTICED_TABLE, con=conn)
-
-    def _update_bjj_tables(self, data: pd.DataFrame) -> None:
+        with self._db_engine.begin() as conn:
+            with self._current_run.report.stage("compute_metrics") as stage:
+                metrics_tables = compute_metrics_tables(self._metadata, con=conn)
+                stage.rows = sum(data.shape[0] for data in metrics_tables.values())
+
+            for table, data in metrics_tables.items():
+                with self._current_run.report.stage(
+                    "write_metrics", table=table
+                ) as stage:
+                    stage.rows = write_metrics_table(
+                        data,
+                        table=table,
+                        con=conn,
+                        method=self._config.loader,
+                    )
+
+        LOGGER.info("Rebuilt the metrics marts: %s", ", ".join(metrics_tables))
+
+    def _is_worksheet_unchanged(self, source: str, fingerprint: str) -> bool:
         """
-        Update bjj tables by deleting data from these tables and then inserting
-        fresh data pulled from the BJJ spreadsheet.
+        Check whether a worksheet's fingerprint matches the one stored by the last
+        successful run.
         """
+        stored_fingerprint = get_stored_fingerprint(
+            source, metadata=self._metadata, con=self._db_engine
+        )
+        LOGGER.info(
+            "Current fingerprint for %s: %s (last ingested: %s)",
+            source,
+            fingerprint,
+            stored_fingerprint,
+        )
+        return fingerprint == stored_fingerprint
+
+    def _write_run_report(self, status: str) -> None:
+        """Finish the run report and write it out, if a report directory was given."""
+        report = self._current_run.report
+        report.finish(status)
+        if self._config.report_dir is not None:
+            report.write(self._config.report_dir)
+
+    def _load_data(self, data: Union[pd.DataFrame, Iterator[pd.DataFrame]]) -> None:
+        """Load normalized data into the bjj tables in a single transaction, the way
+        the load mode says to."""
         with self._db_engine.begin() as conn:
-            # Because of foreign key constraints, delete data from positions_practiced
-            # and moves_practiced before deleting data from class_attendance.
-            for table in self.TABLES_TO_UPDATE:
-                delete_data_from_table(table, metadata=self._metadata, con=conn)
+            if self._config.load_mode == "swap":
+                swap_tables(data, run=self._current_run, con=conn)
+                return
+
+            # Diffing and comparing years need the whole sheet, so chunks are
+            # combined after they've been normalized
+            if not isinstance(data, pd.DataFrame):
+                data = pd.concat(data, ignore_index=True)
+            if self._config.load_mode == "delta":
+                sync_tables(data, run=self._current_run, con=conn)
+            else:
+                rewrite_years(data, run=self._current_run, con=conn)
+
+    def run(self, force: bool = False) -> RunReport:
+        """Run the BJJ data pipeline
 
-            # After deleting, we want to reset sequence
-            for sequence in self.SEQUENCES_TO_RESET:
-                reset_sequence(sequence, con=conn)
+        Args:
+            force: run the pipeline even if the worksheet hasn't changed since the
+                last successful run.
 
-            self._update_class_attendance_table(data, conn=conn)
-            self._update_moves_practiced_table(data, conn=conn)
-            self._update_positions_practiced_table(data, conn=conn)
+        Returns:
+            the report of the run.
+        """
+        self._current_run = PipelineRun(
+            self._metadata, self._dimension_cache, config=self._config
+        )
+        with self._current_run:
+            self._run(force)
+        return self._current_run.report
 
-    def run(self) -> None:
-        """Run the BJJ data pipeline"""
+    def _run(self, force: bool) -> None:
+        """Run the BJJ data pipeline, with the worker pool up if running
+        concurrently."""
         # Mark the start of the run for measuring execution duration
         LOGGER.info("Begin BJJ data pipeline")
         start_time = time.perf_counter()
 
-        # Pull data from google spreadsheet
-        bjj_data = self.load_data_from_spreadsheet(
-            self.BJJ_SPREADSHEET_NAME, self.BJJ_WORKSHEET_NAME
+        # Skip the run if no worksheet has changed since it was last ingested
+        with self._current_run.report.stage("fingerprint_check"):
+            fingerprints = {
+                get_worksheet_source(
+                    source.spreadsheet, source.worksheet
+                ): get_spreadsheet_fingerprint(
+                    self._reader.open_spreadsheet(source.spreadsheet)
+                )
+                for source in self._sources
+            }
+            is_unchanged = not force and all(
+                self._is_worksheet_unchanged(source, fingerprint)
+                for source, fingerprint in fingerprints.items()
+            )
+        if is_unchanged:
+            LOGGER.info("All worksheets are unchanged since the last run, skipping")
+            self._write_run_report(status="skipped")
+            return
+
+        # Add any athlete new to the run first, so that the dimension IDs include it
+        add_athletes(
+            sorted({source.athlete for source in self._sources}),
+            metadata=self._metadata,
+            con=self._db_engine,
         )
 
-        # Get data ready for insert in a general way
-        bjj_data = self._normalize_data(bjj_data)
+        # Load dimension IDs (on the worker pool, if running concurrently) while the
+        # spreadsheet is fetched. Normalization waits for them.
+        self._current_run.preload_dimension_ids()
+
+        bjj_data: Union[pd.DataFrame, Iterator[pd.DataFrame]]
+        if self._config.chunk_size:
+            # Pull, normalize and insert data from google spreadsheets chunk by chunk,
+            # one worksheet after another
+            bjj_data = (
+                self._normalize_data(chunk, athlete=source.athlete)
+                for source in self._sources
+                for chunk in self.iter_data_from_spreadsheet(
+                    source.spreadsheet,
+                    source.worksheet,
+                    chunk_size=self._config.chunk_size,
+                )
+            )
+        else:
+            # Pull data from google spreadsheets and get it ready for insert in a
+            # general way
+            bjj_data = self._load_and_normalize_sources()
 
         # Update tables
-        self._update_bjj_tables(bjj_data)
+        self._load_data(bjj_data)
+
+        if self._config.build_metrics:
+            self._build_metrics_tables()
+
+        # Tell the dbt run which tables changed, so it only builds what's downstream
+        changes = self._current_run.changes
+        if self._config.change_manifest is not None and not changes.is_empty:
+            changes.write(self._config.change_manifest)
+
+        # Remember what was ingested so the next run can skip unchanged data
+        for source, fingerprint in fingerprints.items():
+            store_fingerprint(
+                source, fingerprint, metadata=self._metadata, con=self._db_engine
+            )
 
         # Measure execution duration
         LOGGER.info("BJJ data pipeline has finished running")
         end_time = time.perf_counter()
         duration = end_time - start_time
         LOGGER.info("Elapsed time: %s", timedelta(seconds=duration))
+        self._write_run_report(status="succeeded")
 
 
 def parse_args() -> argparse.Namespace:
@@ -363,6 +541,106 @@ def parse_args() -> argparse.Namespace:
         default=0,
         dest="verbosity",
     )
+    parser.add_argument(
+        "-m",
+        "--load-mode",
+        choices=LOAD_MODES,
+        default="full",
+        help=(
+            "How to load data into the bjj tables. 'full' deletes and reinserts"
+            " every year whose data changed, 'delta' only applies rows that changed,"
+            " 'swap' loads staging tables and swaps them in. Defaults to 'full'"
+        ),
+    )
+
+    parser.add_argument(
+        "-l",
+        "--loader",
+        choices=LOADER_METHODS,
+        default=DEFAULT_LOADER_METHOD,
+        help=(
+            "How to insert data into the bjj tables. 'copy' streams data via COPY,"
+            f" 'to_sql' uses INSERT statements. Defaults to '{DEFAULT_LOADER_METHOD}'"
+        ),
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=None,
+        help=(
+            "Stream the worksheet in chunks of this many rows instead of loading it"
+            " all at once, capping peak memory. Defaults to loading it all at once"
+        ),
+    )
+
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Run the pipeline even if the worksheet is unchanged since the last run",
+    )
+
+    parser.add_argument(
+        "--build-metrics",
+        action="store_true",
+        help=(
+            "Rebuild the metrics marts in process after loading the data, instead of"
+            " leaving them to a dbt run. The marts must have been built by dbt once"
+        ),
+    )
+
+    parser.add_argument(
+        "--change-manifest",
+        type=Path,
+        default=None,
+        help=(
+            "JSON file to add the bjj tables changed by the run, and the dates they"
+            " changed over, to. A dbt run can then build only the models downstream"
+            " of them. Defaults to not writing a manifest"
+        ),
+    )
+
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help=(
+            "Overlap independent pipeline stages (e.g. fetching the spreadsheet and"
+            " loading dimension IDs) on a worker pool"
+        ),
+    )
+
+    parser.add_argument(
+        "-r",
+        "--report-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Directory to write a JSON run report and a Prometheus text-format file"
+            " with per-stage metrics to. Defaults to not writing a report"
+        ),
+    )
+
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help=(
+            "JSON file listing the spreadsheets and worksheets to pull data from,"
+            " and the athletes they belong to. Defaults to the BJJ Total Attendance"
+            " worksheet"
+        ),
+    )
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=DEFAULT_FETCH_WORKERS,
+        help=(
+            "Number of worksheets to fetch at once. Defaults to"
+            f" {DEFAULT_FETCH_WORKERS}"
+        ),
+    )
 
     return parser.parse_args()
 
@@ -375,7 +653,20 @@ def main() -> None:
     load_dotenv_file()
 
     # Initialize pipeline
-    bjj_pipeline = BJJDataPipeline(os.environ.get("USER_TYPE", "human"))
+    bjj_pipeline = BJJDataPipeline(
+        os.environ.get("USER_TYPE", "human"),
+        config=PipelineConfig(
+            load_mode=args.load_mode,
+            loader=args.loader,
+            chunk_size=args.chunk_size,
+            concurrent=args.concurrent,
+            fetch_workers=args.fetch_workers,
+            report_dir=args.report_dir,
+            build_metrics=args.build_metrics,
+            change_manifest=args.change_manifest,
+        ),
+        sources=load_manifest(args.manifest) if args.manifest else None,
+    )
 
     # Run pipeline
-    bjj_pipeline.run()
+    bjj_pipeline.run(force=args.force)
@@ -0,0 +1,34 @@
+"""bjj_journey.data_pipeline.athletes
+
+Register the athletes whose worksheets the data pipeline pulls data from.
+"""
+import logging
+from typing import List, Union
+
+from sqlalchemy import Connection, Engine, MetaData
+from sqlalchemy.dialects.postgresql import insert
+
+from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
+    BJJ_SCHEMA_NAME,
+    resolve_sql_execution,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def add_athletes(
+    names: List[str], metadata: MetaData, con: Union[Connection, Engine]
+) -> int:
+    """Insert the given athletes into the athlete table, where they don't exist yet.
+
+    Returns:
+        the number of athletes added.
+    """
+    table = metadata.tables[f"{BJJ_SCHEMA_NAME}.{ATHLETE_TABLE}"]
+    stmt = insert(table).values([{"name": name} for name in names])
+    stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.name])
+    result = resolve_sql_execution(stmt, con)
+    LOGGER.info("Added %s new athletes", result.rowcount)
+    return result.rowcount
@@ -2,24 +2,42 @@
 
 Data quality checks and validations.
 """
+import numpy as np
 import pandas as pd
 
 
-def check_ids(data: pd.DataFrame, name_col: str, id_col: str) -> None:
-    """Check that all records are associated with an ID"""
-    records_missing_id = set(data[data[id_col].isna()][name_col])
-    assert (
-        not records_missing_id
-    ), f"The following records are missing a {name_col} id: {records_missing_id}"
-
-
 def validate_table(table: str) -> None:
     """
-    Validate that the passed-in table is one of the following: class, move, position
+    Validate that the passed-in table is one of the following: athlete, class, move,
+    position
     """
-    allowed_tables = {"class", "move", "position"}
+    allowed_tables = {"athlete", "class", "move", "position"}
     if table not in allowed_tables:
         raise ValueError(
             f"The table argument must be one of the following values: {allowed_tables}."
             f" Got {table} instead."
         )
+
+
+def check_indexer(names: np.ndarray, indexer: np.ndarray, name_col: str) -> None:
+    """Check that every name was found by an Index.get_indexer lookup"""
+    records_missing_id = set(names[indexer == -1])
+    assert (
+        not records_missing_id
+    ), f"The following records are missing a {name_col} id: {records_missing_id}"
+
+
+def check_unique_classes(data: pd.DataFrame) -> None:
+    """
+    Check that no athlete's class (athlete_id, date and class_id) appears in more
+    than one record
+    """
+    duplicated = data[
+        data.duplicated(subset=["athlete_id", "date", "class_id"], keep=False)
+    ]
+    duplicated_classes = set(
+        zip(duplicated["athlete"], duplicated["date"], duplicated["class"])
+    )
+    assert (
+        not duplicated_classes
+    ), f"The following classes appear more than once: {duplicated_classes}"
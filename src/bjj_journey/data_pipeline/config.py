@@ -0,0 +1,62 @@
+"""bjj_journey.data_pipeline.config
+
+Options controlling how a data pipeline run loads data and what it writes out.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from bjj_journey.database_utils import DEFAULT_LOADER_METHOD, validate_loader_method
+
+
+# full: delete and reinsert every year whose data changed; delta: only apply rows
+# that changed; swap: load staging tables and swap them in for the live tables
+LOAD_MODES = ["full", "delta", "swap"]
+# Number of worksheets fetched at once when pulling from multiple worksheets
+DEFAULT_FETCH_WORKERS = 4
+
+
+# One attribute per command line option, so they aren't worth splitting up
+@dataclass
+class PipelineConfig:  # pylint: disable=too-many-instance-attributes
+    """Options for a data pipeline run.
+
+    Attributes:
+        load_mode: how data is loaded into the bjj tables, one of LOAD_MODES.
+        loader: how rows are inserted, one of the database_utils loader methods.
+        chunk_size: stream worksheets in chunks of this many rows instead of
+            loading them all at once.
+        concurrent: overlap independent stages of the run on a worker pool.
+        fetch_workers: number of worksheets fetched at once.
+        report_dir: directory to write the run report to, if any.
+        build_metrics: rebuild the metrics marts in process after the load.
+        change_manifest: path of the change manifest to add the changed tables
+            to, if any.
+    """
+
+    load_mode: str = "full"
+    loader: str = DEFAULT_LOADER_METHOD
+    chunk_size: Optional[int] = None
+    concurrent: bool = False
+    fetch_workers: int = DEFAULT_FETCH_WORKERS
+    report_dir: Optional[Path] = None
+    build_metrics: bool = False
+    change_manifest: Optional[Path] = None
+
+    def __post_init__(self) -> None:
+        if self.load_mode not in LOAD_MODES:
+            raise ValueError(
+                "The load mode must be one of the following values:"
+                f" {LOAD_MODES}. Got {self.load_mode} instead."
+            )
+        validate_loader_method(self.loader)
+        if self.chunk_size is not None and self.chunk_size < 1:
+            raise ValueError(
+                "The chunk size must be a positive integer. Got"
+                f" {self.chunk_size} instead."
+            )
+        if self.fetch_workers < 1:
+            raise ValueError(
+                "The number of fetch workers must be a positive integer. Got"
+                f" {self.fetch_workers} instead."
+            )
@@ -0,0 +1,137 @@
+"""bjj_journey.data_pipeline.dimension_cache
+
+Cache the name to ID mappings of the athlete, class, position and move tables.
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+from sqlalchemy import Engine, text
+
+from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
+    BJJ_SCHEMA_NAME,
+    CLASS_TABLE,
+    MOVE_TABLE,
+    POSITION_TABLE,
+    get_database_url,
+)
+from bjj_journey.utils import get_cache_dir
+
+
+LOGGER = logging.getLogger(__name__)
+
+DIMENSION_TABLES = [ATHLETE_TABLE, CLASS_TABLE, POSITION_TABLE, MOVE_TABLE]
+DIMENSION_CACHE_FILE = "dimension_ids.json"
+
+# One round trip that changes whenever a migration runs or a dimension table's name
+# to ID mapping changes. The mapping is hashed rather than versioned by updated_at,
+# which nothing bumps when a row is updated in place (e.g. a renamed move).
+DIMENSION_VERSION_QUERY = text(
+    "SELECT (SELECT string_agg(version_num, ',') FROM alembic_version)"
+    + "".join(
+        ", (SELECT coalesce(md5(string_agg(id || '=' || name, ',' ORDER BY id)), '')"
+        f" FROM {BJJ_SCHEMA_NAME}.{table})"
+        for table in DIMENSION_TABLES
+    )
+)
+
+
+class DimensionCache:
+    """Name to ID lookups for the athlete, class, position and move tables.
+
+    The mappings are kept in memory and on disk, tagged with a version built from
+    the alembic revision and a hash of the IDs and names of each dimension table.
+    The version is checked once per cache instance; as long as it matches what's on
+    disk, no dimension table is queried. Lookups are safe to make from multiple
+    threads.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        load_table_ids: Callable[[str], pd.DataFrame],
+        cache_path: Optional[Path] = None,
+    ):
+        """
+        Args:
+            engine: the engine connected to the bjj database.
+            load_table_ids: a function returning the id and name columns of a given
+                dimension table, used when the cache is stale.
+            cache_path: where to store the cache on disk. Defaults to a file in
+                the bjj_journey cache directory. If there's no cache directory, the
+                mappings are only kept in memory.
+        """
+        self._engine = engine
+        self._load_table_ids = load_table_ids
+        if cache_path is None:
+            cache_dir = get_cache_dir()
+            cache_path = cache_dir / DIMENSION_CACHE_FILE if cache_dir else None
+        self._cache_path = cache_path
+        self._ids: Optional[Dict[str, Dict[str, int]]] = None
+        self._lock = threading.Lock()
+
+    def _get_version(self) -> str:
+        """Return the current version of the dimension tables."""
+        with self._engine.connect() as conn:
+            row = conn.execute(DIMENSION_VERSION_QUERY).one()
+        return "|".join([get_database_url(redacted=True), *map(str, row)])
+
+    def _read_cache_file(self, version: str) -> Optional[Dict[str, Dict[str, int]]]:
+        """Return the cached mappings on disk if they match the given version."""
+        if self._cache_path is None:
+            return None
+
+        try:
+            cached = json.loads(self._cache_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if cached.get("version") != version:
+            return None
+        return cached["ids"]
+
+    def _write_cache_file(self, version: str, ids: Dict[str, Dict[str, int]]) -> None:
+        """Write the given mappings to disk, tagged with the given version."""
+        if self._cache_path is None:
+            return
+
+        try:
+            self._cache_path.write_text(json.dumps({"version": version, "ids": ids}))
+        except OSError:
+            LOGGER.warning("Could not write dimension cache to %s", self._cache_path)
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        """Load the mappings from disk, or from the database if the disk is stale."""
+        version = self._get_version()
+
+        ids = self._read_cache_file(version)
+        if ids is not None:
+            LOGGER.info("Using cached dimension IDs from %s", self._cache_path)
+            return ids
+
+        LOGGER.info("Dimension cache is stale, reloading dimension IDs")
+        ids = {}
+        for table in DIMENSION_TABLES:
+            table_ids = self._load_table_ids(table)
+            ids[table] = {
+                name: int(id_) for name, id_ in zip(table_ids["name"], table_ids["id"])
+            }
+
+        self._write_cache_file(version, ids)
+        return ids
+
+    def preload(self) -> None:
+        """Load the mappings ahead of the first lookup, if they aren't loaded yet."""
+        with self._lock:
+            if self._ids is None:
+                self._ids = self._load()
+
+    def get_ids(self, table: str) -> Dict[str, int]:
+        """Return a mapping of name to ID for the given dimension table."""
+        self.preload()
+        assert self._ids is not None  # make mypy happy
+        return self._ids[table]
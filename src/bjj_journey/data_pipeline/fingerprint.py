@@ -0,0 +1,72 @@
+"""bjj_journey.data_pipeline.fingerprint
+
+Track fingerprints of previously ingested worksheets so unchanged worksheets can be
+skipped.
+"""
+import logging
+from typing import Optional, Union
+
+import gspread
+import pandas as pd
+from sqlalchemy import Connection, Engine, MetaData, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from bjj_journey.database_utils import (
+    BJJ_SCHEMA_NAME,
+    PIPELINE_FINGERPRINT_TABLE,
+    query_database,
+    resolve_sql_execution,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_worksheet_source(spreadsheet_name: str, worksheet_name: str) -> str:
+    """Return the key a worksheet's fingerprint is stored under."""
+    return f"{spreadsheet_name}/{worksheet_name}"
+
+
+def get_spreadsheet_fingerprint(spreadsheet: gspread.Spreadsheet) -> str:
+    """Return a fingerprint of the current content of a spreadsheet.
+
+    The fingerprint is built from the spreadsheet's ID and its last modified time,
+    which gspread already has on hand after opening a spreadsheet by name, so
+    computing it doesn't require fetching any cell values.
+    """
+    return f"{spreadsheet.id}@{spreadsheet.lastUpdateTime}"
+
+
+def get_stored_fingerprint(
+    source: str, metadata: MetaData, con: Union[Connection, Engine]
+) -> Optional[str]:
+    """Return the fingerprint stored for a given source, if there is one."""
+    table = metadata.tables[f"{BJJ_SCHEMA_NAME}.{PIPELINE_FINGERPRINT_TABLE}"]
+    stmt = select(table.c.fingerprint).where(table.c.source == source)
+
+    data = query_database(stmt, con=con)
+    assert isinstance(data, pd.DataFrame)  # make mypy happy
+
+    if data.empty:
+        return None
+    return data["fingerprint"].iloc[0]
+
+
+def store_fingerprint(
+    source: str,
+    fingerprint: str,
+    metadata: MetaData,
+    con: Union[Connection, Engine],
+) -> None:
+    """Insert or update the fingerprint stored for a given source."""
+    table = metadata.tables[f"{BJJ_SCHEMA_NAME}.{PIPELINE_FINGERPRINT_TABLE}"]
+    stmt = insert(table).values(source=source, fingerprint=fingerprint)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.source],
+        set_={
+            "fingerprint": stmt.excluded.fingerprint,
+            "updated_at": func.now(),  # pylint: disable=not-callable
+        },
+    )
+    resolve_sql_execution(stmt, con)
+    LOGGER.info("Stored fingerprint %s for %s", fingerprint, source)
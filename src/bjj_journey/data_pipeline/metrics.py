@@ -0,0 +1,414 @@
+"""bjj_journey.data_pipeline.metrics
+
+Compute the metrics marts (class_attendance_metrics, move_metrics and position_metrics)
+in process with pandas, as an alternative to building them with dbt. The marts come
+out the same as the dbt models build them.
+"""
+from dataclasses import dataclass
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Connection, MetaData, Select, select, text
+
+from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
+    BJJ_SCHEMA_NAME,
+    CLASS_ATTD_METRICS_TABLE,
+    CLASS_ATTD_TABLE,
+    CLASS_TABLE,
+    DEFAULT_LOADER_METHOD,
+    MOVE_METRICS_TABLE,
+    MOVE_TABLE,
+    MOVES_PRACTICED_TABLE,
+    POSITION_METRICS_TABLE,
+    POSITION_TABLE,
+    POSITIONS_PRACTICED_TABLE,
+    query_database,
+    update_table,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+METRICS_COLS = [
+    "metric_name",
+    "aggregation_category",
+    "aggregation_value",
+    "metric_value",
+    "aggregation_year",
+    "source_updated_at",
+]
+# Aggregation categories below overall, from coarsest to finest
+AGGREGATION_LEVELS = ["year", "month"]
+
+
+@dataclass(frozen=True)
+class Metric:
+    """A metric computed for a mart.
+
+    Attributes:
+        name: the metric's name, i.e. its metric_name in the mart.
+        column: the column of the source data that is aggregated.
+        aggfunc: the pandas aggregation applied to the column, e.g. "sum".
+        levels: the aggregation categories to compute the metric at. Metrics
+            computed by year are also rolled up to an overall metric by summing
+            the years, so they have to add up across years.
+    """
+
+    name: str
+    column: str
+    aggfunc: str
+    levels: Tuple[str, ...] = ("year",)
+
+
+CLASS_ATTENDANCE_METRICS = [
+    Metric("num_class_minutes", "class_duration", "sum", levels=("year", "month")),
+    Metric("num_classes_attended", "date", "size", levels=("year", "month")),
+    Metric("num_months_trained", "month", "nunique"),
+]
+PRACTICED_METRICS = [
+    Metric("num_times_practiced", "date", "size", levels=("year", "month"))
+]
+# Rolling windows, in days, the practiced metrics are also counted over, matching the
+# rolling_window_days dbt var
+ROLLING_WINDOW_DAYS = (30, 90, 365)
+# Every mart's metrics are computed separately for each athlete
+ATHLETE_DIMENSION = "athlete"
+# Skill metrics marts and the practiced tables they're computed from, by skill
+SKILL_METRICS_TABLES = {
+    MOVE_TABLE: (MOVE_METRICS_TABLE, MOVES_PRACTICED_TABLE),
+    POSITION_TABLE: (POSITION_METRICS_TABLE, POSITIONS_PRACTICED_TABLE),
+}
+METRICS_TABLES = [CLASS_ATTD_METRICS_TABLE, MOVE_METRICS_TABLE, POSITION_METRICS_TABLE]
+# The marts are materialized views over the tables they're built in, which are named
+# after the marts with this suffix
+BUILD_SUFFIX = "_build"
+
+
+def get_build_table(table: str) -> str:
+    """Return the name of the table a metrics mart is built in."""
+    return f"{table}{BUILD_SUFFIX}"
+
+
+METRICS_BUILD_TABLES = [get_build_table(table) for table in METRICS_TABLES]
+
+
+def select_class_attendance(
+    metadata: MetaData, schema: str = BJJ_SCHEMA_NAME
+) -> Select:
+    """Return a query for the class attendance data that its metrics are computed
+    from, mirroring the int_class_attendance_joined dbt model."""
+    class_attendance = metadata.tables[f"{schema}.{CLASS_ATTD_TABLE}"]
+    class_ = metadata.tables[f"{schema}.{CLASS_TABLE}"]
+    athlete = metadata.tables[f"{schema}.{ATHLETE_TABLE}"]
+    return select(
+        class_attendance.c.date,
+        athlete.c.name.label(ATHLETE_DIMENSION),
+        class_.c.duration.label("class_duration"),
+        class_attendance.c.updated_at,
+    ).select_from(
+        class_attendance.outerjoin(
+            class_, class_attendance.c.class_id == class_.c.id
+        ).outerjoin(athlete, class_attendance.c.athlete_id == athlete.c.id)
+    )
+
+
+def select_practiced(
+    skill: str, metadata: MetaData, schema: str = BJJ_SCHEMA_NAME
+) -> Select:
+    """Return a query for the practiced data of a skill (position or move) that its
+    metrics are computed from, mirroring the int_<skill>s_practiced_joined dbt
+    models."""
+    practiced = metadata.tables[f"{schema}.{SKILL_METRICS_TABLES[skill][1]}"]
+    skill_table = metadata.tables[f"{schema}.{skill}"]
+    athlete = metadata.tables[f"{schema}.{ATHLETE_TABLE}"]
+    return select(
+        practiced.c.date,
+        athlete.c.name.label(ATHLETE_DIMENSION),
+        skill_table.c.name.label(skill),
+        practiced.c.updated_at,
+    ).select_from(
+        practiced.outerjoin(
+            skill_table, practiced.c[f"{skill}_id"] == skill_table.c.id
+        ).outerjoin(athlete, practiced.c.athlete_id == athlete.c.id)
+    )
+
+
+def compute_metrics(
+    data: pd.DataFrame, metrics: List[Metric], dimensions: Sequence[str] = ()
+) -> pd.DataFrame:
+    """Compute long-format metrics from source data.
+
+    Args:
+        data: the source data, with a date column, an updated_at column, and the
+            columns the metrics and dimensions need. year and month columns are
+            derived from the dates.
+        metrics: the metrics to compute.
+        dimensions: columns the metrics are computed for each value of (e.g. the
+            move), which are kept as the first columns of the result.
+
+    Returns:
+        a pandas DataFrame with the dimensions, metric_name, aggregation_category,
+            aggregation_value, metric_value, aggregation_year and
+            source_updated_at columns, with one row per metric and aggregation.
+    """
+    dates = pd.to_datetime(data["date"])
+    data = data.assign(year=dates.dt.year.astype(str), month=dates.dt.strftime("%Y-%m"))
+
+    frames = []
+    for level in AGGREGATION_LEVELS:
+        level_metrics = [metric for metric in metrics if level in metric.levels]
+        if not level_metrics:
+            continue
+
+        keys = [*dimensions, "year"] + ([level] if level != "year" else [])
+        groups = data.groupby(keys, dropna=False, sort=False)
+        grouped = groups.agg(source_updated_at=pd.NamedAgg("updated_at", "max"))
+        for metric in level_metrics:
+            grouped[metric.name] = groups[metric.column].agg(metric.aggfunc)
+        grouped = grouped.reset_index()
+        long = grouped.melt(
+            id_vars=[*keys, "source_updated_at"],
+            value_vars=[metric.name for metric in level_metrics],
+            var_name="metric_name",
+            value_name="metric_value",
+        )
+        frames.append(
+            long.assign(
+                aggregation_category=level,
+                aggregation_value=long[level],
+                aggregation_year=long["year"],
+            )
+        )
+
+    by_year = frames[0]
+    overall = (
+        by_year.groupby([*dimensions, "metric_name"], dropna=False, sort=False)
+        .agg(
+            metric_value=("metric_value", "sum"),
+            source_updated_at=("source_updated_at", "max"),
+        )
+        .reset_index()
+        .assign(
+            aggregation_category="overall",
+            aggregation_value="overall",
+            aggregation_year="overall",
+        )
+    )
+
+    metrics_data = pd.concat([overall, *frames], ignore_index=True)
+    metrics_data["metric_value"] = metrics_data["metric_value"].astype("Int64")
+    return metrics_data[[*dimensions, *METRICS_COLS]]
+
+
+def _get_month_ends(
+    data: pd.DataFrame, months: pd.Series, partition_by: Sequence[str] = ()
+) -> pd.DataFrame:
+    """Return the month ends rolling windows are counted at, i.e. the end of every
+    month between the first and last month of each year of each partition of the
+    data, with the partition columns and the aggregation columns of each."""
+    month_ranges = (
+        data[list(partition_by)]
+        .assign(year=months.dt.year, month=months)
+        .groupby([*partition_by, "year"], dropna=False, sort=False)["month"]
+        .agg(["min", "max"])
+        .reset_index()
+    )
+    month_ends = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    **dict(zip(partition_by, partition)),
+                    "month": pd.period_range(first, last, freq="M"),
+                }
+            )
+            for *partition, _, first, last in month_ranges.itertuples(index=False)
+        ]
+        or [
+            pd.DataFrame(
+                {
+                    **{col: data[col].iloc[:0] for col in partition_by},
+                    "month": pd.PeriodIndex([], freq="M"),
+                }
+            )
+        ],
+        ignore_index=True,
+    )
+    return month_ends.assign(
+        window_end=month_ends["month"].dt.to_timestamp(how="end").dt.normalize(),
+        aggregation_category="month",
+        aggregation_value=month_ends["month"].dt.strftime("%Y-%m"),
+        aggregation_year=month_ends["month"].dt.year.astype(str),
+    ).drop(columns="month")
+
+
+def _pair_with_window_ends(
+    data: pd.DataFrame, dates: pd.Series, longest: int
+) -> pd.DataFrame:
+    """Repeat each row of data once for each month end of the windows it can fall
+    in, i.e. the ends of its month and of the months after it, up to the longest
+    window, in a window_end column."""
+    num_offsets = longest // 28 + 2
+    months = dates.dt.to_period("M").to_numpy()
+    return data.iloc[np.repeat(np.arange(len(data)), num_offsets)].assign(
+        date=np.repeat(dates.to_numpy(), num_offsets),
+        window_end=(
+            (
+                pd.PeriodIndex(np.repeat(months, num_offsets), freq="M")
+                + np.tile(np.arange(num_offsets), len(data))
+            )
+            .to_timestamp(how="end")
+            .normalize()
+        ),
+    )
+
+
+def compute_rolling_metrics(
+    data: pd.DataFrame,
+    metric_name: str,
+    windows: Sequence[int] = ROLLING_WINDOW_DAYS,
+    dimensions: Sequence[str] = (),
+    partition_by: Sequence[str] = (),
+) -> pd.DataFrame:
+    """Compute long-format rolling-window counts of rows, mirroring the
+    generate_rolling_metrics dbt macro.
+
+    Each window is counted at the end of every month between the first and last
+    month of each year in the data, and overall at the latest date. A window of N
+    days ending on a date covers that date and the N - 1 days before it. Only
+    windows with rows in them are kept. When the data is partitioned (e.g. by
+    athlete), the months and latest date are those of each partition.
+
+    Args:
+        data: the source data, with a date column, an updated_at column and the
+            dimensions.
+        metric_name: the prefix of the metric names, which are
+            <metric_name>_last_<N>_days.
+        windows: the lengths of the windows, in days.
+        dimensions: columns the metrics are computed for each value of (e.g. the
+            move), which are kept as the first columns of the result.
+        partition_by: dimensions whose values each have their own windows.
+
+    Returns:
+        a pandas DataFrame with the same columns as compute_metrics returns.
+    """
+    dates = pd.to_datetime(data["date"])
+    by_month = _pair_with_window_ends(data, dates, longest=max(windows)).merge(
+        _get_month_ends(data, dates.dt.to_period("M"), partition_by=partition_by),
+        on=["window_end", *partition_by],
+    )
+    overall = data.assign(
+        date=dates,
+        window_end=(
+            dates.groupby(
+                [data[col] for col in partition_by], dropna=False, sort=False
+            ).transform("max")
+            if partition_by
+            else dates.max()
+        ),
+        aggregation_category="overall",
+        aggregation_value="overall",
+        aggregation_year="overall",
+    )
+    windowed = pd.concat([by_month, overall], ignore_index=True)
+    windowed = windowed[
+        windowed["date"] > windowed["window_end"] - pd.Timedelta(days=max(windows))
+    ]
+
+    keys = [
+        *dimensions,
+        "aggregation_category",
+        "aggregation_value",
+        "aggregation_year",
+    ]
+    frames = []
+    for window in windows:
+        in_window = windowed[
+            windowed["date"] > windowed["window_end"] - pd.Timedelta(days=window)
+        ]
+        frames.append(
+            in_window.groupby(keys, dropna=False, sort=False)
+            .agg(
+                metric_value=("date", "size"),
+                source_updated_at=("updated_at", "max"),
+            )
+            .reset_index()
+            .assign(metric_name=f"{metric_name}_last_{window}_days")
+        )
+
+    metrics_data = pd.concat(frames, ignore_index=True)
+    metrics_data["metric_value"] = metrics_data["metric_value"].astype("Int64")
+    return metrics_data[[*dimensions, *METRICS_COLS]]
+
+
+def compute_metrics_tables(
+    metadata: MetaData, con: Connection, schema: str = BJJ_SCHEMA_NAME
+) -> Dict[str, pd.DataFrame]:
+    """Compute the metrics marts from the bjj tables as currently stored.
+
+    Returns:
+        a mapping of mart table name to its data.
+    """
+    class_attendance = query_database(
+        select_class_attendance(metadata, schema=schema), con=con, columnar=True
+    )
+    assert isinstance(class_attendance, pd.DataFrame)  # make mypy happy
+    metrics_tables = {
+        CLASS_ATTD_METRICS_TABLE: compute_metrics(
+            class_attendance, CLASS_ATTENDANCE_METRICS, dimensions=[ATHLETE_DIMENSION]
+        )
+    }
+
+    for skill, (table, _) in SKILL_METRICS_TABLES.items():
+        practiced = query_database(
+            select_practiced(skill, metadata, schema=schema), con=con, columnar=True
+        )
+        assert isinstance(practiced, pd.DataFrame)  # make mypy happy
+        dimensions = [ATHLETE_DIMENSION, skill]
+        metrics_tables[table] = pd.concat(
+            [
+                compute_metrics(practiced, PRACTICED_METRICS, dimensions=dimensions),
+                compute_rolling_metrics(
+                    practiced,
+                    "num_times_practiced",
+                    dimensions=dimensions,
+                    partition_by=[ATHLETE_DIMENSION],
+                ),
+            ],
+            ignore_index=True,
+        )
+
+    return metrics_tables
+
+
+def write_metrics_table(
+    data: pd.DataFrame,
+    table: str,
+    con: Connection,
+    schema: str = BJJ_SCHEMA_NAME,
+    method: str = DEFAULT_LOADER_METHOD,
+) -> int:
+    """Replace the contents of a metrics mart with the given data.
+
+    The rows of the table the mart is built in are replaced, and the mart's
+    materialized view is refreshed concurrently, so reads of the mart never wait on
+    the write. The mart has to have been built by dbt at least once, since its table
+    and view are left in place. Both are analyzed, like dbt does after building them.
+
+    Returns:
+        the number of rows written.
+    """
+    build_table = get_build_table(table)
+    result = con.execute(text(f"DELETE FROM {schema}.{build_table}"))
+    LOGGER.info(
+        "Deleted %s rows from table %s.%s", result.rowcount, schema, build_table
+    )
+    num_rows = update_table(
+        data, table=build_table, con=con, schema=schema, method=method
+    )
+    con.execute(text(f"ANALYZE {schema}.{build_table}"))
+    con.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {schema}.{table}"))
+    con.execute(text(f"ANALYZE {schema}.{table}"))
+    return num_rows
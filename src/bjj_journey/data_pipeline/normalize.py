@@ -0,0 +1,87 @@
+"""bjj_journey.data_pipeline.normalize
+
+Vectorized reshaping and ID lookups for data pulled from the BJJ spreadsheet.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from bjj_journey.data_pipeline.checks import check_indexer
+
+
+def lookup_ids(
+    names: np.ndarray, table_ids: Dict[str, int], name_col: str
+) -> np.ndarray:
+    """Look up the ID of each name and check that every name has an ID.
+
+    Names are resolved with a single Index.get_indexer call (a hash lookup), and
+    names without an ID are reported from the same indexer result.
+
+    Args:
+        names: an array of names to look up.
+        table_ids: a mapping of name to ID for the relevant table.
+        name_col: the name of the column the names came from, used when reporting
+            names without an ID.
+
+    Returns:
+        an array of IDs, aligned with the given names.
+    """
+    index = pd.Index(list(table_ids))
+    ids = np.fromiter(table_ids.values(), dtype=np.int64, count=len(table_ids))
+
+    indexer = index.get_indexer(names)
+    check_indexer(names, indexer, name_col=name_col)
+
+    return ids[indexer]
+
+
+def melt_skills(
+    data: pd.DataFrame,
+    skill_cols: Dict[str, List[str]],
+    table_ids: Dict[str, Dict[str, int]],
+) -> Dict[str, pd.DataFrame]:
+    """Reshape skill columns from wide to long and look up their IDs in one pass.
+
+    All skill columns are pulled out of the data as a single array and missing
+    skills are found with a single mask, so no intermediate DataFrames are built
+    per skill type.
+
+    Args:
+        data: a pandas DataFrame with date, class_id and athlete_id columns plus the
+            given skill columns.
+        skill_cols: a mapping of skill type (e.g. position) to the worksheet
+            columns holding skills of that type (e.g. position1, position2).
+        table_ids: a mapping of skill type to that skill table's name to ID mapping.
+
+    Returns:
+        a mapping of skill type to a pandas DataFrame with the columns date,
+            class_id, athlete_id and <skill type>_id, one row per skill practiced.
+    """
+    all_cols = [col for cols in skill_cols.values() for col in cols]
+    values = data[all_cols].to_numpy(dtype=object)
+    present = pd.notna(values)
+    # Columns identifying the athlete's class, which are repeated for each skill
+    # practiced
+    class_keys = {
+        col: data[col].to_numpy() for col in ["date", "class_id", "athlete_id"]
+    }
+
+    melted = {}
+    start = 0
+    for skill, cols in skill_cols.items():
+        block = slice(start, start + len(cols))
+        start += len(cols)
+
+        # Walk the block column by column so rows come out in pd.melt order
+        col_idx, row_idx = np.nonzero(present[:, block].T)
+        names = values[:, block][row_idx, col_idx]
+
+        melted[skill] = pd.DataFrame(
+            {
+                **{col: keys[row_idx] for col, keys in class_keys.items()},
+                f"{skill}_id": lookup_ids(names, table_ids[skill], name_col=skill),
+            }
+        )
+
+    return melted
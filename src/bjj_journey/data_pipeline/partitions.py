@@ -0,0 +1,258 @@
+"""bjj_journey.data_pipeline.partitions
+
+Year partitions of the practiced tables, which are partitioned by date so that a run
+only has to rewrite the years whose data changed, and the full load mode that rewrites
+them.
+"""
+from datetime import date
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Dict, List, Set
+
+import pandas as pd
+from sqlalchemy import Connection, MetaData, and_, delete, or_, text
+
+from bjj_journey.database_utils import BJJ_SCHEMA_NAME, restart_sequence_after_max_id
+
+if TYPE_CHECKING:
+    from bjj_journey.data_pipeline.run import PipelineRun
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Function created by the partitioning migration, which creates the partition of a
+# table holding a given year unless it already exists and returns its name
+CREATE_YEAR_PARTITION_QUERY = text(
+    "SELECT bjj.create_year_partition(:table, :year, :schema)"
+)
+# Hash of the rows stored for each year of a table, as get_year_hashes computes it
+# for a dataframe. Rows are hashed in sorted order (by byte, like Python sorts
+# strings), so the hash doesn't depend on the order they are stored in.
+STORED_YEAR_HASHES_QUERY = """
+SELECT
+    extract(year FROM date)::INTEGER AS year,
+    md5(string_agg(row_text, E'\\n' ORDER BY row_text COLLATE "C")) AS year_hash
+FROM (SELECT date, concat_ws(',', {columns}) AS row_text FROM {schema}.{table}) rows
+GROUP BY 1
+"""
+
+
+def get_years(data: pd.DataFrame, date_col: str = "date") -> List[int]:
+    """Return the distinct years of the dates in a dataframe, in ascending order."""
+    years = pd.to_datetime(data[date_col]).dt.year.dropna().unique()
+    return sorted(int(year) for year in years)
+
+
+def _quote_nullable(values: pd.Series) -> pd.Series:
+    """Quote values as text the way Postgres's quote_nullable function does."""
+    text_values = values.astype("string")
+    quoted = (
+        "'"
+        + text_values.str.replace("\\", "\\\\", regex=False).str.replace(
+            "'", "''", regex=False
+        )
+        + "'"
+    )
+    # Strings with backslashes are quoted as escape strings
+    quoted = quoted.mask(
+        text_values.str.contains("\\", regex=False).fillna(False), "E" + quoted
+    )
+    return quoted.fillna("NULL")
+
+
+def get_year_hashes(data: pd.DataFrame) -> Dict[int, str]:
+    """Return a hash of the rows of each year in a dataframe, which matches the hash
+    get_stored_year_hashes returns for a table holding the same rows."""
+    dates = pd.to_datetime(data["date"])
+    quoted = [
+        _quote_nullable(dates.dt.strftime("%Y-%m-%d") if col == "date" else data[col])
+        for col in data.columns
+    ]
+    row_text = quoted[0].str.cat(quoted[1:], sep=",")
+    year_hashes = row_text.groupby(dates.dt.year).agg(
+        lambda rows: hashlib.md5("\n".join(sorted(rows)).encode()).hexdigest()
+    )
+    return dict(zip(year_hashes.index.astype(int).tolist(), year_hashes.tolist()))
+
+
+def get_stored_year_hashes(
+    table: str, columns: List[str], con: Connection, schema: str = BJJ_SCHEMA_NAME
+) -> Dict[int, str]:
+    """Return a hash of the given columns of the rows stored for each year of a
+    table. Years without rows are left out."""
+    columns_sql = ", ".join(
+        (
+            "quote_nullable(to_char(date, 'YYYY-MM-DD'))"
+            if col == "date"
+            else f"quote_nullable({col}::TEXT)"
+        )
+        for col in columns
+    )
+    stmt = text(
+        STORED_YEAR_HASHES_QUERY.format(columns=columns_sql, schema=schema, table=table)
+    )
+    return dict(con.execute(stmt).tuples().all())
+
+
+def create_year_partitions(
+    table: str, years: List[int], con: Connection, schema: str = BJJ_SCHEMA_NAME
+) -> List[str]:
+    """Create the partitions of a table for the given years, where they don't exist.
+
+    Returns:
+        the names of the partitions for the given years.
+    """
+    partitions = [
+        con.execute(
+            CREATE_YEAR_PARTITION_QUERY,
+            {"table": table, "year": year, "schema": schema},
+        ).scalar_one()
+        for year in years
+    ]
+    LOGGER.debug("Ensured partitions exist: %s", ", ".join(partitions))
+    return partitions
+
+
+def truncate_year_partitions(
+    table: str, years: List[int], con: Connection, schema: str = BJJ_SCHEMA_NAME
+) -> None:
+    """Empty the partitions of a table for the given years.
+
+    Truncating a partition doesn't touch the rest of the table, and is much cheaper
+    than deleting its rows. Missing partitions are created (empty) along the way.
+    """
+    if not years:
+        return
+
+    partitions = create_year_partitions(table, years, con=con, schema=schema)
+    con.execute(
+        text(f"TRUNCATE {', '.join(f'{schema}.{part}' for part in partitions)}")
+    )
+    LOGGER.info("Truncated partitions: %s", ", ".join(partitions))
+
+
+def delete_years(
+    table: str,
+    years: List[int],
+    metadata: MetaData,
+    con: Connection,
+    schema: str = BJJ_SCHEMA_NAME,
+) -> int:
+    """Delete the rows of an unpartitioned table dated in any of the given years.
+
+    Years are matched as date ranges rather than by extracting the year, so that the
+    index on the date column can be used.
+
+    Returns:
+        the number of rows deleted.
+    """
+    if not years:
+        return 0
+
+    table_obj = metadata.tables[f"{schema}.{table}"]
+    date_column = table_obj.c.date
+    stmt = delete(table_obj).where(
+        or_(
+            *[
+                and_(
+                    date_column >= date(year, 1, 1),
+                    date_column < date(year + 1, 1, 1),
+                )
+                for year in years
+            ]
+        )
+    )
+    result = con.execute(stmt)
+    LOGGER.info(
+        "Deleted %s rows from table %s for years %s",
+        result.rowcount,
+        f"{schema}.{table}",
+        years,
+    )
+    return result.rowcount
+
+
+def _delete_years_from_tables(
+    years: List[int], run: "PipelineRun", con: Connection
+) -> None:
+    """Delete the data for the given years from the bjj tables.
+
+    Partitioned tables have the partitions for those years truncated, other tables
+    have the rows dated in those years deleted.
+    """
+    # Because of foreign key constraints, delete data from positions_practiced and
+    # moves_practiced before deleting data from class_attendance.
+    for table in run.TABLES_TO_UPDATE:
+        with run.report.stage("delete", table=table) as stage:
+            if table in run.PARTITIONED_TABLES:
+                truncate_year_partitions(table, years, con=con)
+            else:
+                stage.rows = delete_years(table, years, metadata=run.metadata, con=con)
+        run.changes.record(
+            table, pd.Series([date(min(years), 1, 1), date(max(years), 12, 31)])
+        )
+
+
+def get_changed_years(data: Dict[str, pd.DataFrame], con: Connection) -> List[int]:
+    """Return the years whose rows in the data differ from the rows stored for them
+    in any of the bjj tables, by comparing a hash of each year's rows.
+
+    Years in the data that aren't stored yet, and stored years missing from the data,
+    count as changed.
+
+    Args:
+        data: a mapping of table name to the data for that table.
+        con: a SQLAlchemy connection to the database.
+    """
+    changed_years: Set[int] = set()
+    for table, table_data in data.items():
+        new_hashes = get_year_hashes(table_data)
+        stored_hashes = get_stored_year_hashes(table, list(table_data.columns), con=con)
+        changed_years.update(
+            year
+            for year in new_hashes.keys() | stored_hashes.keys()
+            if new_hashes.get(year) != stored_hashes.get(year)
+        )
+    return sorted(changed_years)
+
+
+def rewrite_years(data: pd.DataFrame, run: "PipelineRun", con: Connection) -> None:
+    """Update the bjj tables by rewriting the years whose data changed.
+
+    The rows of each year in the data are compared with the rows stored for it, and
+    only years that differ in any table are rewritten: their partitions of the
+    practiced tables are truncated, their class_attendance rows deleted and the ID
+    sequences restarted after the highest ID left, and then their data is inserted.
+    Stored years missing from the data are deleted, so the tables hold exactly the
+    data afterwards. Unchanged years aren't touched, or recorded in the change
+    manifest.
+    """
+    run.create_partitions(get_years(data), con=con)
+    new_data = run.prep_tables(data)
+
+    with run.report.stage("compare_years") as stage:
+        changed_years = get_changed_years(new_data, con=con)
+        stage.rows = len(changed_years)
+    if not changed_years:
+        LOGGER.info("No years changed, so none were rewritten")
+        return
+
+    _delete_years_from_tables(changed_years, run=run, con=con)
+
+    # Hand out the IDs past the highest one left again, which starts them over when
+    # every year was deleted
+    with run.report.stage("reset_sequence"):
+        for table, sequence in run.SEQUENCES_TO_RESET.items():
+            restart_sequence_after_max_id(sequence, table=table, con=con)
+
+    # Because of foreign key constraints, insert into class_attendance before
+    # inserting into the other tables
+    for table in reversed(run.TABLES_TO_UPDATE):
+        table_data = new_data[table]
+        run.insert_table(
+            table_data[pd.to_datetime(table_data["date"]).dt.year.isin(changed_years)],
+            table=table,
+            con=con,
+        )
+
+    LOGGER.info("Rewrote the following years: %s", changed_years)
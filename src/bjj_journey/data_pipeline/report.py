@@ -0,0 +1,216 @@
+"""bjj_journey.data_pipeline.report
+
+Per-stage metrics for a data pipeline run, written out as a JSON run report and as
+a Prometheus text-format file for the node exporter's textfile collector.
+"""
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import resource
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+LOGGER = logging.getLogger(__name__)
+
+RUN_REPORT_FILE = "bjj_pipeline_run_report.json"
+PROMETHEUS_FILE = "bjj_pipeline.prom"
+METRIC_PREFIX = "bjj_pipeline"
+# Holds the process's memory usage in pages; the second field is the resident set
+STATM_PATH = Path("/proc/self/statm")
+
+
+def get_process_peak_rss() -> int:
+    """Return the peak resident set size of this process so far, in bytes.
+
+    This is a high-water mark over the life of the process, not the peak of any
+    one stage: it never goes down, so every stage after the most memory hungry one
+    reports the same value.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_current_rss() -> Optional[int]:
+    """Return the current resident set size of this process, in bytes.
+
+    Read from /proc/self/statm, so this is None where there's no /proc (e.g. macOS).
+    """
+    try:
+        resident_pages = int(STATM_PATH.read_text(encoding="ascii").split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class StageMetrics:
+    """Metrics for one stage of a pipeline run.
+
+    A stage can run more than once per run (e.g. once per chunk), in which case wall
+    time and rows are summed across calls. rss_before_bytes is the process's current
+    RSS at the start of the stage's first call and rss_after_bytes at the end of its
+    last call, so the difference is how much memory the stage left allocated (stages
+    running on other threads at the same time count towards it too). They are None
+    where the current RSS can't be read.
+    """
+
+    name: str
+    table: str = ""
+    calls: int = 0
+    wall_time_seconds: float = 0.0
+    rows: int = 0
+    rss_before_bytes: Optional[int] = None
+    rss_after_bytes: Optional[int] = None
+
+    def add(self, other: "StageMetrics") -> None:
+        """Fold the metrics of a later call of this stage into this one."""
+        if not self.calls:
+            self.rss_before_bytes = other.rss_before_bytes
+        self.calls += other.calls
+        self.wall_time_seconds += other.wall_time_seconds
+        self.rows += other.rows
+        self.rss_after_bytes = other.rss_after_bytes
+
+
+class RunReport:
+    """Collect per-stage metrics over a pipeline run."""
+
+    def __init__(self, **attributes: Any):
+        self.attributes = attributes
+        self.status = "running"
+        self._started_at = time.time()
+        self._start_time = time.perf_counter()
+        self._duration: Optional[float] = None
+        self._stages: Dict[Tuple[str, str], StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, table: str = "") -> Iterator[StageMetrics]:
+        """Time a stage of the run.
+
+        The yielded StageMetrics is for this call only; set its rows attribute to
+        record how many rows the stage handled. Stages can be timed from multiple
+        threads at once.
+        """
+        metrics = StageMetrics(
+            name=name, table=table, calls=1, rss_before_bytes=get_current_rss()
+        )
+        start_time = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_time_seconds = time.perf_counter() - start_time
+            metrics.rss_after_bytes = get_current_rss()
+            LOGGER.debug(
+                "Stage %s%s took %.3fs for %s rows",
+                name,
+                f" ({table})" if table else "",
+                metrics.wall_time_seconds,
+                metrics.rows,
+            )
+
+            with self._lock:
+                key = (name, table)
+                if key not in self._stages:
+                    self._stages[key] = StageMetrics(name=name, table=table)
+                self._stages[key].add(metrics)
+
+    def finish(self, status: str) -> None:
+        """Mark the run as finished with the given status."""
+        self.status = status
+        self._duration = time.perf_counter() - self._start_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the run report as a JSON-serializable dict."""
+        return {
+            "status": self.status,
+            "started_at": self._started_at,
+            "duration_seconds": self._duration,
+            "process_peak_rss_bytes": get_process_peak_rss(),
+            **self.attributes,
+            "stages": [asdict(stage) for stage in self._stages.values()],
+        }
+
+    def to_prometheus(self) -> str:
+        """Return the run report in the Prometheus text exposition format."""
+        lines = []
+
+        def add_metric(name: str, help_text: str, samples: Dict[str, float]) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples.items():
+                lines.append(f"{METRIC_PREFIX}_{name}{labels} {value}")
+
+        def stage_labels(stage: StageMetrics) -> str:
+            return f'{{stage="{stage.name}",table="{stage.table}"}}'
+
+        stages = list(self._stages.values())
+        add_metric(
+            "last_run_timestamp_seconds",
+            "Unix time the last pipeline run started.",
+            {f'{{status="{self.status}"}}': self._started_at},
+        )
+        add_metric(
+            "run_duration_seconds",
+            "Wall time of the last pipeline run.",
+            {"": self._duration or 0.0},
+        )
+        add_metric(
+            "stage_duration_seconds",
+            "Wall time spent in each stage of the last pipeline run.",
+            {stage_labels(stage): stage.wall_time_seconds for stage in stages},
+        )
+        add_metric(
+            "stage_rows",
+            "Rows handled by each stage of the last pipeline run.",
+            {stage_labels(stage): stage.rows for stage in stages},
+        )
+        add_metric(
+            "stage_rss_before_bytes",
+            "Resident memory of the process at the start of each stage.",
+            {
+                stage_labels(stage): stage.rss_before_bytes
+                for stage in stages
+                if stage.rss_before_bytes is not None
+            },
+        )
+        add_metric(
+            "stage_rss_after_bytes",
+            "Resident memory of the process at the end of each stage.",
+            {
+                stage_labels(stage): stage.rss_after_bytes
+                for stage in stages
+                if stage.rss_after_bytes is not None
+            },
+        )
+        add_metric(
+            "process_peak_rss_bytes",
+            "Peak resident memory of the process over the last pipeline run.",
+            {"": get_process_peak_rss()},
+        )
+        return "\n".join(lines) + "\n"
+
+    def write(self, report_dir: Path) -> None:
+        """Write the JSON run report and the Prometheus file to the given directory.
+
+        Files are written to a temporary path and renamed into place so that the
+        node exporter never reads a partially written file.
+        """
+        report_dir.mkdir(parents=True, exist_ok=True)
+        outputs = {
+            RUN_REPORT_FILE: json.dumps(self.to_dict(), indent=2),
+            PROMETHEUS_FILE: self.to_prometheus(),
+        }
+        for file_name, content in outputs.items():
+            path = report_dir / file_name
+            tmp_path = path.with_name(f".{file_name}.tmp")
+            tmp_path.write_text(content)
+            os.replace(tmp_path, path)
+            LOGGER.info("Wrote run report to %s", path)
@@ -0,0 +1,239 @@
+"""bjj_journey.data_pipeline.run
+
+The state of a single data pipeline run, through which the load modes write to the
+bjj tables.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy import Connection, MetaData
+
+from bjj_journey.change_manifest import ChangeManifest
+from bjj_journey.data_pipeline.config import PipelineConfig
+from bjj_journey.data_pipeline.dimension_cache import DimensionCache
+from bjj_journey.data_pipeline.normalize import melt_skills
+from bjj_journey.data_pipeline.partitions import create_year_partitions, get_years
+from bjj_journey.data_pipeline.report import RunReport
+from bjj_journey.data_pipeline.swap import get_staging_table
+from bjj_journey.database_utils import (
+    CLASS_ATTD_TABLE,
+    MOVE_TABLE,
+    MOVES_PRACTICED_TABLE,
+    POSITION_TABLE,
+    POSITIONS_PRACTICED_TABLE,
+    update_table,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PipelineRun:
+    """A single run of the data pipeline.
+
+    Holds the run report, the change manifest of the run and, for concurrent runs,
+    the worker pool that stages are run on. Writes to the bjj tables go through the
+    run, so that each is timed in the report and recorded in the manifest. Use as a
+    context manager, which starts the worker pool and shuts it down afterwards.
+    """
+
+    # Worksheet columns holding the skills practiced, by skill type
+    WORKSHEET_SKILL_COLS = {
+        POSITION_TABLE: ["position1", "position2", "position3"],
+        MOVE_TABLE: ["move1", "move2", "move3", "move4"],
+    }
+    CLASS_ATTENDANCE_TABLE_COLS = ["date", "class_id", "athlete_id", "notes"]
+    PRACTICED_TABLES = {
+        POSITION_TABLE: POSITIONS_PRACTICED_TABLE,
+        MOVE_TABLE: MOVES_PRACTICED_TABLE,
+    }
+    # Order matters here - class_attendance should be last
+    TABLES_TO_UPDATE = [
+        POSITIONS_PRACTICED_TABLE,
+        MOVES_PRACTICED_TABLE,
+        CLASS_ATTD_TABLE,
+    ]
+    # Tables partitioned by the year of date
+    PARTITIONED_TABLES = [POSITIONS_PRACTICED_TABLE, MOVES_PRACTICED_TABLE]
+    # Sequences of the tables' id columns, by table
+    SEQUENCES_TO_RESET = {
+        POSITIONS_PRACTICED_TABLE: "positions_practiced_id_seq",
+        MOVES_PRACTICED_TABLE: "moves_practiced_id_seq",
+    }
+    # Number of worker threads used when stages are run concurrently
+    CONCURRENT_MAX_WORKERS = 4
+
+    def __init__(
+        self,
+        metadata: MetaData,
+        dimension_cache: DimensionCache,
+        config: PipelineConfig,
+    ):
+        self.metadata = metadata
+        self.report = RunReport(
+            load_mode=config.load_mode,
+            loader=config.loader,
+            chunk_size=config.chunk_size,
+            concurrent=config.concurrent,
+        )
+        self.changes = ChangeManifest()
+        self._config = config
+        self._dimension_cache = dimension_cache
+        # The worker pool only exists while a concurrent run is in progress
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dimension_ids_loaded: Optional[Future] = None
+
+    def __enter__(self) -> "PipelineRun":
+        if self._config.concurrent:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.CONCURRENT_MAX_WORKERS,
+                thread_name_prefix="bjj_pipeline",
+            )
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run a pipeline stage on the worker pool if the pipeline is running
+        concurrently, otherwise run it right away.
+
+        Either way, the stage's result is retrieved by calling .result() on the
+        returned future.
+        """
+        if self._executor is not None:
+            return self._executor.submit(func, *args, **kwargs)
+
+        future: Future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+
+    def preload_dimension_ids(self) -> None:
+        """Start loading the dimension IDs (on the worker pool, if running
+        concurrently), ahead of the first lookup."""
+        self._dimension_ids_loaded = self.submit(self._dimension_cache.preload)
+
+    def get_dimension_ids(self, table: str) -> Dict[str, int]:
+        """Return a mapping of name to ID for the given dimension table.
+
+        Waits for the dimension IDs to be preloaded first, so that any error loading
+        them is raised here.
+        """
+        if self._dimension_ids_loaded is not None:
+            self._dimension_ids_loaded.result()
+        return self._dimension_cache.get_ids(table)
+
+    def _prep_data_for_practiced_table(
+        self, data: pd.DataFrame, skill: str
+    ) -> pd.DataFrame:
+        """
+        Prep data for insertion into the practiced table of a single skill type,
+        either position or move.
+        """
+        with self.report.stage("prep", table=self.PRACTICED_TABLES[skill]) as stage:
+            melted = melt_skills(
+                data,
+                skill_cols={skill: self.WORKSHEET_SKILL_COLS[skill]},
+                table_ids={skill: self.get_dimension_ids(skill)},
+            )
+            stage.rows = melted[skill].shape[0]
+
+        return melted[skill][["date", "class_id", "athlete_id", f"{skill}_id"]]
+
+    def prep_practiced_tables(self, data: pd.DataFrame) -> Dict[str, Future]:
+        """
+        Prep data for insertion into bjj.positions_practiced and bjj.moves_practiced.
+
+        Each table is prepped (and timed) separately. When running concurrently, each
+        is prepped on its own worker so the caller can carry on (e.g. writing
+        class_attendance) in the meantime.
+
+        Returns:
+            a mapping of table name to a future holding the data to insert into that
+                table.
+        """
+        return {
+            table: self.submit(self._prep_data_for_practiced_table, data, skill=skill)
+            for skill, table in self.PRACTICED_TABLES.items()
+        }
+
+    def prep_tables(self, data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Prep data for insertion into each of the bjj tables.
+
+        Returns:
+            a mapping of table name to the data to insert into that table.
+        """
+        practiced_data = self.prep_practiced_tables(data)
+        return {
+            CLASS_ATTD_TABLE: data[self.CLASS_ATTENDANCE_TABLE_COLS],
+            **{table: prepped.result() for table, prepped in practiced_data.items()},
+        }
+
+    def create_partitions(
+        self, years: List[int], con: Connection, staging: bool = False
+    ) -> None:
+        """Create the partitions of the partitioned tables (or of their staging
+        tables) for the given years, where they don't exist yet."""
+        with self.report.stage("create_partitions"):
+            for table in self.PARTITIONED_TABLES:
+                create_year_partitions(
+                    get_staging_table(table) if staging else table, years, con=con
+                )
+
+    def insert_table(
+        self, data: pd.DataFrame, table: str, con: Connection, staging: bool = False
+    ) -> int:
+        """Insert data into a bjj table (or its staging table) and record it as an
+        insert stage.
+
+        The partitions of partitioned tables for the years of the data have to have
+        been created first (see create_partitions).
+
+        Returns:
+            the number of rows inserted.
+        """
+        target_table = get_staging_table(table) if staging else table
+        with self.report.stage("insert", table=table) as stage:
+            stage.rows = update_table(
+                data, table=target_table, con=con, method=self._config.loader
+            )
+        if stage.rows and not staging:
+            self.changes.record(table, data["date"])
+        return stage.rows
+
+    def insert_data(
+        self,
+        data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+        con: Connection,
+        staging: bool = False,
+    ) -> None:
+        """Insert normalized data into the bjj tables (or their staging tables).
+
+        The data can either be a single DataFrame or an iterable of DataFrame chunks,
+        which are inserted one at a time as they are produced, with the partitions
+        for each chunk's years created along the way.
+        """
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+
+        for chunk in chunks:
+            # All writes go through con on this thread, so they stay in a single
+            # transaction even when the prep runs on the worker pool
+            practiced_data = self.prep_practiced_tables(chunk)
+            self.create_partitions(get_years(chunk), con=con, staging=staging)
+            self.insert_table(
+                chunk[self.CLASS_ATTENDANCE_TABLE_COLS],
+                table=CLASS_ATTD_TABLE,
+                con=con,
+                staging=staging,
+            )
+            for table in [MOVES_PRACTICED_TABLE, POSITIONS_PRACTICED_TABLE]:
+                self.insert_table(
+                    practiced_data[table].result(),
+                    table=table,
+                    con=con,
+                    staging=staging,
+                )
@@ -0,0 +1,117 @@
+"""bjj_journey.data_pipeline.sources
+
+Worksheets the data pipeline pulls data from, and a reader that opens them within
+the Sheets API rate limit.
+"""
+from collections import deque
+import json
+import logging
+from pathlib import Path
+import threading
+import time
+from typing import Deque, List, NamedTuple
+
+import gspread
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Google Sheets API read quota per user
+SHEETS_READ_REQUESTS_PER_MINUTE = 60
+# Athlete a worksheet belongs to unless it says otherwise, which the rows loaded
+# before athletes existed belong to as well
+DEFAULT_ATHLETE = "default"
+MANIFEST_KEYS = {"spreadsheet", "worksheet"}
+OPTIONAL_MANIFEST_KEYS = {"athlete"}
+
+
+class WorksheetSource(NamedTuple):
+    """A worksheet within a Google spreadsheet that data is pulled from, and the
+    athlete whose classes it holds."""
+
+    spreadsheet: str
+    worksheet: str
+    athlete: str = DEFAULT_ATHLETE
+
+    def __str__(self) -> str:
+        return f"{self.spreadsheet}/{self.worksheet}"
+
+
+def load_manifest(path: Path) -> List[WorksheetSource]:
+    """Load the worksheets to pull data from out of a JSON manifest file.
+
+    The manifest is a list of objects with spreadsheet and worksheet keys, and
+    optionally the athlete whose classes the worksheet holds, e.g.
+    [{"spreadsheet": "BJJ Dashboard", "worksheet": "BJJ Total Attendance",
+      "athlete": "Sam"}]
+    Worksheets without an athlete belong to the default athlete. Worksheets of
+    different athletes can hold the same classes.
+    """
+    entries = json.loads(path.read_text())
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(
+            f"The manifest must be a non-empty list of worksheets. Got {entries}"
+            " instead."
+        )
+
+    sources = []
+    for entry in entries:
+        if not MANIFEST_KEYS <= set(entry) <= MANIFEST_KEYS | OPTIONAL_MANIFEST_KEYS:
+            raise ValueError(
+                "Each manifest entry must have the keys spreadsheet and worksheet,"
+                f" and optionally athlete. Got {entry} instead."
+            )
+        sources.append(WorksheetSource(**entry))
+
+    LOGGER.info("Loaded %s worksheets from manifest %s", len(sources), path)
+    return sources
+
+
+class WorksheetReader:
+    """Open spreadsheets and worksheets through a gspread client, within the Sheets
+    API rate limit.
+
+    Callers block so that at most max_calls requests start within any period, and
+    call wait before each request they make on an opened worksheet. Safe to share
+    between threads.
+    """
+
+    def __init__(
+        self,
+        client: gspread.Client,
+        max_calls: int = SHEETS_READ_REQUESTS_PER_MINUTE,
+        period: float = 60,
+    ):
+        self._client = client
+        self._max_calls = max_calls
+        self._period = period
+        self._calls: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Wait until another call can be made without exceeding the rate limit."""
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= self._period:
+                self._calls.popleft()
+
+            if len(self._calls) >= self._max_calls:
+                delay = self._period - (now - self._calls.popleft())
+                LOGGER.debug("Rate limit reached, waiting %.2fs", delay)
+                time.sleep(delay)
+
+            self._calls.append(time.monotonic())
+
+    def open_spreadsheet(self, spreadsheet_name: str) -> gspread.Spreadsheet:
+        """Open a Google spreadsheet by name."""
+        LOGGER.info("Opening the following Google Spreadsheet: %s", spreadsheet_name)
+        self.wait()
+        return self._client.open(spreadsheet_name)
+
+    def open_worksheet(
+        self, spreadsheet_name: str, worksheet_name: str
+    ) -> gspread.Worksheet:
+        """Open a worksheet within a Google spreadsheet."""
+        spreadsheet = self.open_spreadsheet(spreadsheet_name)
+        self.wait()
+        return spreadsheet.worksheet(worksheet_name)
@@ -0,0 +1,326 @@
+"""bjj_journey.data_pipeline.swap
+
+Load bjj tables through staging tables that are swapped in for the live tables by
+renaming them, so readers are only locked out for the duration of the swap (the swap
+load mode).
+"""
+import logging
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Union
+
+import pandas as pd
+from sqlalchemy import Connection, MetaData, text
+
+from bjj_journey.database_utils import BJJ_SCHEMA_NAME, reset_sequence
+
+if TYPE_CHECKING:
+    from bjj_journey.data_pipeline.run import PipelineRun
+
+
+LOGGER = logging.getLogger(__name__)
+
+STAGING_SUFFIX = "_staging"
+OLD_SUFFIX = "_old"
+# How long the swap waits for readers of the live tables to finish before giving up,
+# so that it never queues up new readers behind it for long
+SWAP_LOCK_TIMEOUT = "10s"
+
+# Indexes of a table that don't back a constraint (those are rebuilt with the
+# constraint)
+INDEXES_QUERY = text("""
+    SELECT indexname, indexdef
+    FROM pg_indexes
+    WHERE schemaname = :schema
+      AND tablename = :table
+      AND indexname NOT IN (
+          SELECT conname
+          FROM pg_constraint
+          WHERE conrelid = format('%I.%I', :schema, :table)::regclass
+      )
+    """)
+# Privileges granted on a table to roles other than its owner
+GRANTS_QUERY = text("""
+    SELECT grantee, privilege_type
+    FROM information_schema.table_privileges
+    WHERE table_schema = :schema
+      AND table_name = :table
+      AND grantee <> (
+          SELECT tableowner
+          FROM pg_tables
+          WHERE schemaname = :schema AND tablename = :table
+      )
+    """)
+# Partition key of a table, which is NULL unless the table is partitioned
+PARTITION_KEY_QUERY = text(
+    "SELECT pg_get_partkeydef(format('%I.%I', :schema, :table)::regclass)"
+)
+# Partitions of a table
+PARTITIONS_QUERY = text("""
+    SELECT child.relname AS partition
+    FROM pg_inherits inh
+    JOIN pg_class child ON child.oid = inh.inhrelid
+    WHERE inh.inhparent = format('%I.%I', :schema, :table)::regclass
+    """)
+# Sequences owned by the columns of a table (e.g. for SERIAL columns)
+OWNED_SEQUENCES_QUERY = text("""
+    SELECT seq.relname AS sequence, col.attname AS column
+    FROM pg_depend dep
+    JOIN pg_class seq ON seq.oid = dep.objid AND seq.relkind = 'S'
+    JOIN pg_attribute col
+      ON col.attrelid = dep.refobjid AND col.attnum = dep.refobjsubid
+    WHERE dep.refobjid = format('%I.%I', :schema, :table)::regclass
+      AND dep.deptype = 'a'
+    """)
+
+
+def get_staging_table(table: str) -> str:
+    """Return the name of the staging table for a given table."""
+    return f"{table}{STAGING_SUFFIX}"
+
+
+def create_staging_tables(
+    tables: List[str], con: Connection, schema: str = BJJ_SCHEMA_NAME
+) -> None:
+    """Create an empty staging table for each of the given tables.
+
+    Staging tables have the same columns, NOT NULL constraints and defaults as the
+    live tables, but no keys or indexes, so that loading them is as cheap as
+    possible. Staging tables of partitioned tables are partitioned the same way,
+    but their partitions are left for the loader to create. Staging tables left
+    over from a failed run are dropped first.
+    """
+    for table in tables:
+        staging_table = get_staging_table(table)
+        partition_key = con.execute(
+            PARTITION_KEY_QUERY, {"schema": schema, "table": table}
+        ).scalar_one()
+        partition_by = f" PARTITION BY {partition_key}" if partition_key else ""
+        con.execute(text(f"DROP TABLE IF EXISTS {schema}.{staging_table} CASCADE"))
+        con.execute(
+            text(
+                f"CREATE TABLE {schema}.{staging_table}"
+                f" (LIKE {schema}.{table} INCLUDING DEFAULTS){partition_by}"
+            )
+        )
+        LOGGER.info("Created staging table: %s", staging_table)
+
+
+def _get_indexes(table: str, con: Connection, schema: str) -> Dict[str, str]:
+    """Return the definitions of a table's indexes that don't back a constraint."""
+    rows = con.execute(INDEXES_QUERY, {"schema": schema, "table": table})
+    return {row.indexname: row.indexdef for row in rows}
+
+
+def _rename_partitions(
+    table: str, old_prefix: str, con: Connection, schema: str
+) -> None:
+    """Rename the partitions of a table and their indexes that are named after
+    old_prefix to be named after the table instead."""
+    partitions = con.execute(PARTITIONS_QUERY, {"schema": schema, "table": table})
+    for partition in partitions.scalars().all():
+        if not partition.startswith(old_prefix):
+            continue
+
+        new_partition = f"{table}{partition[len(old_prefix):]}"
+        con.execute(
+            text(f'ALTER TABLE {schema}."{partition}" RENAME TO "{new_partition}"')
+        )
+        rows = con.execute(
+            text(
+                "SELECT indexname FROM pg_indexes"
+                " WHERE schemaname = :schema AND tablename = :table"
+            ),
+            {"schema": schema, "table": new_partition},
+        )
+        for index in rows.scalars().all():
+            if index.startswith(partition):
+                con.execute(
+                    text(
+                        f'ALTER INDEX {schema}."{index}" RENAME TO'
+                        f' "{new_partition}{index[len(partition):]}"'
+                    )
+                )
+
+
+def _add_foreign_keys(
+    table: str, tables: List[str], metadata: MetaData, con: Connection, schema: str
+) -> None:
+    """Give the staging table of a table the foreign keys of the live table.
+
+    Foreign keys that reference another of the given tables reference its staging
+    table instead.
+    """
+    staging_table = get_staging_table(table)
+    for foreign_key in metadata.tables[f"{schema}.{table}"].foreign_key_constraints:
+        referred_table = foreign_key.referred_table
+        referred_name = referred_table.name
+        if referred_table.schema == schema and referred_name in tables:
+            referred_name = get_staging_table(referred_name)
+        columns = ", ".join(f'"{col}"' for col in foreign_key.column_keys)
+        referred_columns = ", ".join(
+            f'"{element.column.name}"' for element in foreign_key.elements
+        )
+        con.execute(
+            text(
+                f"ALTER TABLE {schema}.{staging_table}"
+                f' ADD CONSTRAINT "{foreign_key.name}" FOREIGN KEY ({columns})'
+                f" REFERENCES {referred_table.schema}.{referred_name}"
+                f" ({referred_columns})"
+            )
+        )
+
+
+def build_staging_tables(
+    tables: List[str],
+    metadata: MetaData,
+    con: Connection,
+    schema: str = BJJ_SCHEMA_NAME,
+) -> None:
+    """Give each loaded staging table the keys, indexes and grants of its live table.
+
+    Primary keys and indexes get temporary names, which swap_staging_tables renames
+    back once the live tables are gone. Foreign keys that reference another of the
+    given tables reference its staging table instead, so they carry over the swap.
+    Keys and indexes of partitioned staging tables cascade to their partitions.
+    Staging tables are analyzed so that the planner has statistics from the start.
+    """
+    # Primary keys first, so that foreign keys between staging tables can be added
+    for table in tables:
+        primary_key = metadata.tables[f"{schema}.{table}"].primary_key
+        columns = ", ".join(f'"{col.name}"' for col in primary_key.columns)
+        con.execute(
+            text(
+                f"ALTER TABLE {schema}.{get_staging_table(table)}"
+                f' ADD CONSTRAINT "{primary_key.name}{STAGING_SUFFIX}"'
+                f" PRIMARY KEY ({columns})"
+            )
+        )
+
+    for table in tables:
+        staging_table = get_staging_table(table)
+        _add_foreign_keys(table, tables, metadata=metadata, con=con, schema=schema)
+
+        for index, definition in _get_indexes(table, con, schema).items():
+            definition = re.sub(
+                rf"INDEX {re.escape(index)} ON (ONLY )?{schema}\.{table} ",
+                f"INDEX {index}{STAGING_SUFFIX} ON {schema}.{staging_table} ",
+                definition,
+                count=1,
+            )
+            con.execute(text(definition))
+
+        for row in con.execute(GRANTS_QUERY, {"schema": schema, "table": table}):
+            # PUBLIC is a keyword rather than a role, so it mustn't be quoted
+            grantee = "PUBLIC" if row.grantee == "PUBLIC" else f'"{row.grantee}"'
+            con.execute(
+                text(
+                    f"GRANT {row.privilege_type} ON {schema}.{staging_table}"
+                    f" TO {grantee}"
+                )
+            )
+
+        con.execute(text(f"ANALYZE {schema}.{staging_table}"))
+        LOGGER.info("Built staging table: %s", staging_table)
+
+
+def swap_staging_tables(
+    tables: List[str],
+    metadata: MetaData,
+    con: Connection,
+    schema: str = BJJ_SCHEMA_NAME,
+) -> None:
+    """Replace the given live tables with their staging tables.
+
+    Live tables are renamed out of the way, staging tables are renamed into place,
+    and the old tables are dropped, all of which only touches the catalog. Should
+    be run at the end of the transaction that loaded the staging tables, since the
+    exclusive locks it takes on the live tables are held until commit. Tables are
+    dropped in the given order, so tables referencing others should come first.
+    Partitions of staging tables are renamed along with them, e.g.
+    moves_practiced_staging_y2023 becomes moves_practiced_y2023.
+    """
+    # Fail rather than block readers for long while waiting on a long-running query
+    con.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+
+    indexes = {table: _get_indexes(table, con, schema) for table in tables}
+    owned_sequences = {
+        table: con.execute(
+            OWNED_SEQUENCES_QUERY, {"schema": schema, "table": table}
+        ).all()
+        for table in tables
+    }
+
+    for table in tables:
+        con.execute(text(f"ALTER TABLE {schema}.{table} RENAME TO {table}{OLD_SUFFIX}"))
+        con.execute(
+            text(f"ALTER TABLE {schema}.{get_staging_table(table)} RENAME TO {table}")
+        )
+        # Keep sequences alive when the old table is dropped
+        for row in owned_sequences[table]:
+            con.execute(
+                text(
+                    f"ALTER SEQUENCE {schema}.{row.sequence}"
+                    f' OWNED BY {schema}.{table}."{row.column}"'
+                )
+            )
+
+    for table in tables:
+        con.execute(text(f"DROP TABLE {schema}.{table}{OLD_SUFFIX}"))
+
+    # The old tables' names are free now, so give keys and indexes their usual names
+    for table in tables:
+        primary_key = metadata.tables[f"{schema}.{table}"].primary_key.name
+        con.execute(
+            text(
+                f"ALTER TABLE {schema}.{table} RENAME CONSTRAINT"
+                f' "{primary_key}{STAGING_SUFFIX}" TO "{primary_key}"'
+            )
+        )
+        for index in indexes[table]:
+            con.execute(
+                text(
+                    f'ALTER INDEX {schema}."{index}{STAGING_SUFFIX}"'
+                    f' RENAME TO "{index}"'
+                )
+            )
+        _rename_partitions(table, get_staging_table(table), con=con, schema=schema)
+
+    LOGGER.info("Swapped staging tables in for: %s", ", ".join(tables))
+
+
+def swap_tables(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    run: "PipelineRun",
+    con: Connection,
+) -> None:
+    """
+    Update the bjj tables by loading the data into staging tables and swapping them
+    in for the live tables.
+
+    Should be run in a single transaction, but the live tables are only locked by
+    the swap at the very end, so readers aren't blocked while data is loaded and
+    keys are built. The data can either be a single DataFrame or an iterable of
+    DataFrame chunks.
+    """
+    with run.report.stage("create_staging"):
+        create_staging_tables(run.TABLES_TO_UPDATE, con=con)
+
+    # The live tables' rows are dropped with them, so IDs can start over
+    with run.report.stage("reset_sequence"):
+        for sequence in run.SEQUENCES_TO_RESET.values():
+            reset_sequence(sequence, con=con)
+
+    run.insert_data(data, con=con, staging=True)
+
+    # Build referenced tables' keys before the keys that reference them
+    with run.report.stage("build_staging"):
+        build_staging_tables(
+            list(reversed(run.TABLES_TO_UPDATE)), metadata=run.metadata, con=con
+        )
+
+    with run.report.stage("swap"):
+        swap_staging_tables(run.TABLES_TO_UPDATE, metadata=run.metadata, con=con)
+
+    # The live tables are replaced wholesale, so rows of any date may have changed
+    for table in run.TABLES_TO_UPDATE:
+        run.changes.record(table)
@@ -0,0 +1,215 @@
+"""bjj_journey.data_pipeline.sync
+
+Compare freshly pulled BJJ data with the data currently stored in the database, and
+apply only the changes between them (the delta load mode).
+"""
+from dataclasses import dataclass, field
+import logging
+from typing import TYPE_CHECKING, Dict, List
+
+import pandas as pd
+from sqlalchemy import Connection, MetaData, select
+
+from bjj_journey.data_pipeline.partitions import get_years
+from bjj_journey.database_utils import (
+    BJJ_SCHEMA_NAME,
+    CLASS_ATTD_TABLE,
+    delete_data_by_keys,
+    query_database,
+    update_data_by_keys,
+)
+
+if TYPE_CHECKING:
+    from bjj_journey.data_pipeline.run import PipelineRun
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+KEY_COLS = ["date", "class_id", "athlete_id"]
+
+
+@dataclass
+class TableDiff:
+    """The changes needed to bring a database table in line with new data.
+
+    Attributes:
+        inserts: rows to insert into the table.
+        updates: rows whose non-key columns should be updated in place.
+        deletes: keys (date, class_id, athlete_id) of rows to delete from the table.
+    """
+
+    inserts: pd.DataFrame
+    updates: pd.DataFrame = field(default_factory=pd.DataFrame)
+    deletes: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    @property
+    def num_changed_keys(self) -> int:
+        """Return the number of (date, class_id, athlete_id) keys touched by this
+        diff."""
+        keys = [
+            frame[KEY_COLS]
+            for frame in (self.inserts, self.updates, self.deletes)
+            if not frame.empty
+        ]
+        if not keys:
+            return 0
+        return pd.concat(keys).drop_duplicates().shape[0]
+
+
+def normalize_dates(data: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the data with the date column as a datetime64 column.
+
+    Dates pulled from the spreadsheet are strings while dates pulled from the
+    database are datetime.date objects, so both are normalized before comparing.
+    """
+    data = data.copy()
+    data["date"] = pd.to_datetime(data["date"])
+    return data
+
+
+def diff_class_attendance(new: pd.DataFrame, current: pd.DataFrame) -> TableDiff:
+    """Diff new class attendance data against the current database state.
+
+    Args:
+        new: class attendance data pulled from the spreadsheet, with the columns
+            date, class_id, athlete_id, and notes.
+        current: class attendance data currently stored in the database, with the
+            same columns.
+
+    Returns:
+        a TableDiff where inserts are new classes, updates are classes whose notes
+            changed, and deletes are classes that are no longer in the spreadsheet.
+    """
+    merged = normalize_dates(new).merge(
+        normalize_dates(current),
+        on=KEY_COLS,
+        how="outer",
+        suffixes=("", "_current"),
+        indicator=True,
+    )
+
+    inserts = merged.loc[merged["_merge"] == "left_only", KEY_COLS + ["notes"]]
+    deletes = merged.loc[merged["_merge"] == "right_only", KEY_COLS]
+
+    both = merged[merged["_merge"] == "both"]
+    notes_changed = both["notes"].ne(both["notes_current"]) & ~(
+        both["notes"].isna() & both["notes_current"].isna()
+    )
+    updates = both.loc[notes_changed, KEY_COLS + ["notes"]]
+
+    return TableDiff(inserts=inserts, updates=updates, deletes=deletes)
+
+
+def diff_practiced(new: pd.DataFrame, current: pd.DataFrame, id_col: str) -> TableDiff:
+    """Diff new practiced data (positions or moves) against the database state.
+
+    Rows in the practiced tables have no natural key beyond (date, class_id,
+    athlete_id), so an athlete's class is considered changed when the multiset of
+    IDs practiced in it differs.
+    Changed classes are replaced wholesale: their current rows are deleted and the
+    new rows are inserted.
+
+    Args:
+        new: practiced data prepped from the spreadsheet, with the columns date,
+            class_id, athlete_id, and the given ID column.
+        current: practiced data currently stored in the database, with the same
+            columns.
+        id_col: the name of the ID column, e.g. position_id or move_id.
+
+    Returns:
+        a TableDiff with the keys to delete and the rows to insert.
+    """
+    new = normalize_dates(new)
+    current = normalize_dates(current)
+
+    count_cols: List[str] = KEY_COLS + [id_col]
+    new_counts = new.groupby(count_cols).size().rename("count")
+    current_counts = current.groupby(count_cols).size().rename("count_current")
+    counts = pd.concat([new_counts, current_counts], axis="columns").fillna(0)
+
+    changed_keys = (
+        counts[counts["count"] != counts["count_current"]]
+        .reset_index()[KEY_COLS]
+        .drop_duplicates()
+    )
+
+    inserts = new.merge(changed_keys, on=KEY_COLS, how="inner")[count_cols]
+    deletes = current[KEY_COLS].drop_duplicates().merge(changed_keys, on=KEY_COLS)
+
+    return TableDiff(inserts=inserts, deletes=deletes)
+
+
+def get_current_data(
+    table: str, columns: List[str], metadata: MetaData, con: Connection
+) -> pd.DataFrame:
+    """Get the given columns of a bjj table as currently stored in the database."""
+    table_obj = metadata.tables[f"{BJJ_SCHEMA_NAME}.{table}"]
+    stmt = select(*[table_obj.c[col] for col in columns])
+    current_data = query_database(stmt, con=con)
+
+    assert isinstance(current_data, pd.DataFrame)  # make mypy happy
+    return current_data
+
+
+def sync_tables(data: pd.DataFrame, run: "PipelineRun", con: Connection) -> int:
+    """
+    Update the bjj tables by diffing the data against the data currently in the
+    database and only applying the inserts, updates, and deletes needed to bring
+    the tables in line with it.
+
+    Returns:
+        the number of rows changed across all bjj tables.
+    """
+    run.create_partitions(get_years(data), con=con)
+    new_data = run.prep_tables(data)
+    table_cols = {table: list(new.columns) for table, new in new_data.items()}
+
+    diffs: Dict[str, TableDiff] = {}
+    for table in run.TABLES_TO_UPDATE:
+        with run.report.stage("diff", table=table) as stage:
+            current_data = get_current_data(
+                table, table_cols[table], metadata=run.metadata, con=con
+            )
+            if table == CLASS_ATTD_TABLE:
+                diffs[table] = diff_class_attendance(new_data[table], current_data)
+            else:
+                diffs[table] = diff_practiced(
+                    new_data[table], current_data, id_col=table_cols[table][-1]
+                )
+            stage.rows = current_data.shape[0]
+        LOGGER.info(
+            "Found %s changed classes in %s",
+            diffs[table].num_changed_keys,
+            f"{BJJ_SCHEMA_NAME}.{table}",
+        )
+
+    # Because of foreign key constraints, delete data from positions_practiced and
+    # moves_practiced before deleting data from class_attendance, and insert into
+    # class_attendance before inserting into the other tables.
+    num_rows_changed = 0
+    for table in run.TABLES_TO_UPDATE:
+        with run.report.stage("delete", table=table) as stage:
+            stage.rows = delete_data_by_keys(
+                diffs[table].deletes, table=table, metadata=run.metadata, con=con
+            )
+        num_rows_changed += stage.rows
+        if stage.rows:
+            run.changes.record(table, diffs[table].deletes["date"])
+
+    with run.report.stage("update", table=CLASS_ATTD_TABLE) as stage:
+        stage.rows = update_data_by_keys(
+            diffs[CLASS_ATTD_TABLE].updates.set_index(KEY_COLS),
+            table=CLASS_ATTD_TABLE,
+            metadata=run.metadata,
+            con=con,
+        )
+    num_rows_changed += stage.rows
+    if stage.rows:
+        run.changes.record(CLASS_ATTD_TABLE, diffs[CLASS_ATTD_TABLE].updates["date"])
+
+    for table in reversed(run.TABLES_TO_UPDATE):
+        num_rows_changed += run.insert_table(diffs[table].inserts, table=table, con=con)
+
+    LOGGER.info("Delta sync changed %s rows", num_rows_changed)
+    return num_rows_changed
@@ -1,26 +1,55 @@
 """bjj_journey.database_utils - Utilities for interacting with the bjj database.
 
 """
-from datetime import datetime
+import asyncio
+from datetime import date, datetime
+import hashlib
 import logging
 import os
+from pathlib import Path
+import pickle
+import tempfile
+import threading
 import urllib.parse
 
-from typing import Tuple, Union
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 import pandas as pd
 
 from sqlalchemy import (
+    CompoundSelect,
     Connection,
     CursorResult,
     Delete,
     Engine,
+    Insert,
     MetaData,
     Select,
     TextClause,
+    Update,
+    and_,
+    bindparam,
     create_engine,
     delete,
+    func,
+    pool,
     text,
+    tuple_,
+    update,
 )
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from bjj_journey.utils import get_cache_dir
 
 LOGGER = logging.getLogger(__name__)
 
@@ -29,10 +58,34 @@ USER_ENV_VAR = "BJJ_DB_USER"
 PASSWORD_ENV_VAR = "BJJ_DB_PWD"
 DATABASE_ENV_VAR = "BJJ_DB_DATABASE"
 PORT_ENV_VAR = "BJJ_DB_PORT"
+POOL_SIZE_ENV_VAR = "BJJ_DB_POOL_SIZE"
+MAX_OVERFLOW_ENV_VAR = "BJJ_DB_MAX_OVERFLOW"
+POOL_RECYCLE_ENV_VAR = "BJJ_DB_POOL_RECYCLE"
+POOL_PRE_PING_ENV_VAR = "BJJ_DB_POOL_PRE_PING"
+PGBOUNCER_ENV_VAR = "BJJ_DB_PGBOUNCER"
+DBT_PROJECT_DIR_ENV_VAR = "BJJ_DBT_PROJECT_DIR"
 
 DEFAULT_DATABASE_PORT = 5432
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+# Connections older than this (in seconds) are replaced on checkout, before any
+# server-side idle timeout closes them
+DEFAULT_POOL_RECYCLE = 1800
+# Connections are pinged on checkout, so ones dropped by a database restart are
+# replaced instead of failing the query. Set BJJ_DB_POOL_PRE_PING=false to opt out
+DEFAULT_POOL_PRE_PING = True
+DEFAULT_ENGINE_ROLE = "default"
+# Driver used by the asyncio engines; the sync engines use psycopg2
+ASYNC_DRIVER_NAME = "postgresql+asyncpg"
+
+# dbt project whose models define the schema of the mart tables, at the repo root
+# unless BJJ_DBT_PROJECT_DIR is set
+DEFAULT_DBT_PROJECT_DIR = Path(__file__).resolve().parents[2] / "dbt"
+DBT_MANIFEST_PATH = Path("target") / "manifest.json"
+DBT_MODEL_FILE_PATTERNS = ["models/**/*.sql", "models/**/*.yml"]
 BJJ_SCHEMA_NAME = "bjj"
 
+ATHLETE_TABLE = "athlete"
 POSITION_TABLE = "position"
 MOVE_TABLE = "move"
 CLASS_TABLE = "class"
@@ -42,6 +95,15 @@ MOVES_PRACTICED_TABLE = "moves_practiced"
 CLASS_ATTD_METRICS_TABLE = "class_attendance_metrics"
 POSITION_METRICS_TABLE = "position_metrics"
 MOVE_METRICS_TABLE = "move_metrics"
+PIPELINE_FINGERPRINT_TABLE = "pipeline_fingerprint"
+
+# Methods update_table can use to insert data. "copy" streams the data through
+# Postgres' COPY FROM STDIN; "to_sql" falls back to multi-row INSERT statements.
+LOADER_METHODS = ["copy", "to_sql"]
+DEFAULT_LOADER_METHOD = "copy"
+# Data is buffered in memory for COPY until it reaches this size (in bytes), after
+# which it spills over to a temporary file on disk.
+COPY_BUFFER_MAX_SIZE = 32 * 1024 * 1024
 
 
 def get_database_host() -> str:
@@ -130,54 +192,364 @@ def get_database_url(redacted: bool = False) -> str:
     return f"postgresql://{user}:{pwd}@{host}:{port}/{name}"
 
 
-def create_database_engine() -> Engine:
+def _get_int_env_var(env_var: str, default: int) -> int:
+    """Return the integer value of an environment variable, or a default."""
+    if env_var not in os.environ:
+        return default
+
+    try:
+        return int(os.environ[env_var])
+    except ValueError as err:
+        raise ValueError(
+            f"The environment variable {env_var} must be an integer. Got"
+            f" {os.environ[env_var]!r} instead."
+        ) from err
+
+
+def _get_bool_env_var(env_var: str, default: bool) -> bool:
+    """Return the boolean value of an environment variable, or a default."""
+    if env_var not in os.environ:
+        return default
+
+    value = os.environ[env_var].lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise ValueError(
+        f"The environment variable {env_var} must be one of true/false, yes/no or"
+        f" 1/0. Got {os.environ[env_var]!r} instead."
+    )
+
+
+def get_engine_options() -> Dict[str, Any]:
+    """Return the connection pool options for the bjj database engine.
+
+    Pool size, overflow, recycle time and pre-ping are read from the environment,
+    falling back to defaults. In PgBouncer mode, pooling is left to PgBouncer: each
+    checkout opens a fresh connection to PgBouncer and closes it on checkin, so no
+    client-side connection ever outlives a PgBouncer transaction.
+    """
+    if _get_bool_env_var(PGBOUNCER_ENV_VAR, default=False):
+        LOGGER.debug("Using PgBouncer mode, disabling client-side pooling")
+        return {"poolclass": pool.NullPool}
+
+    options = {
+        "pool_size": _get_int_env_var(POOL_SIZE_ENV_VAR, DEFAULT_POOL_SIZE),
+        "max_overflow": _get_int_env_var(MAX_OVERFLOW_ENV_VAR, DEFAULT_MAX_OVERFLOW),
+        "pool_recycle": _get_int_env_var(POOL_RECYCLE_ENV_VAR, DEFAULT_POOL_RECYCLE),
+        "pool_pre_ping": _get_bool_env_var(
+            POOL_PRE_PING_ENV_VAR, DEFAULT_POOL_PRE_PING
+        ),
+    }
+    LOGGER.debug("Using database pool options: %s", options)
+    return options
+
+
+_ENGINES: Dict[Tuple[str, str], Engine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def create_database_engine(role: str = DEFAULT_ENGINE_ROLE) -> Engine:
+    """
+    Return a sqlalchemy.Engine object connected to the appropriate bjj database.
+
+    Engines are created once per process for each database URL and role, and
+    repeated calls return the same engine, so callers in one process share its
+    connection pool. Use a different role (e.g. "pipeline" or "dashboard") to give
+    a workload its own pool.
+    """
+    url = get_database_url()
+    with _ENGINES_LOCK:
+        if (url, role) not in _ENGINES:
+            LOGGER.debug("Creating database engine for role %r", role)
+            _ENGINES[(url, role)] = create_engine(url, **get_engine_options())
+        return _ENGINES[(url, role)]
+
+
+def get_async_engine_options() -> Dict[str, Any]:
+    """Return the options for an asyncio bjj database engine.
+
+    These are the same pool options as get_engine_options. In PgBouncer mode,
+    asyncpg's prepared statement caches are also turned off, since a cached
+    statement may have been prepared on a different server connection than the one
+    PgBouncer hands out for the next transaction, which fails with "prepared
+    statement already exists".
+    """
+    options = get_engine_options()
+    if _get_bool_env_var(PGBOUNCER_ENV_VAR, default=False):
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+        }
+    return options
+
+
+_ASYNC_ENGINES: Dict[Tuple[str, str], AsyncEngine] = {}
+_ASYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+T = TypeVar("T")
+
+
+def create_async_database_engine(role: str = DEFAULT_ENGINE_ROLE) -> AsyncEngine:
+    """
+    Return a sqlalchemy AsyncEngine object connected to the appropriate bjj
+    database.
+
+    Like create_database_engine, engines are shared per database URL and role and
+    use the same pool settings (see get_async_engine_options). Connections of an
+    async engine belong to the event loop they were opened on, so use the engine
+    from a single event loop; from sync code, run coroutines with run_async.
+    """
+    url = get_database_url().replace("postgresql://", f"{ASYNC_DRIVER_NAME}://", 1)
+    with _ENGINES_LOCK:
+        if (url, role) not in _ASYNC_ENGINES:
+            LOGGER.debug("Creating async database engine for role %r", role)
+            _ASYNC_ENGINES[(url, role)] = create_async_engine(
+                url, **get_async_engine_options()
+            )
+        return _ASYNC_ENGINES[(url, role)]
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop that run_async runs coroutines on, starting it in a
+    background thread if needed."""
+    global _ASYNC_LOOP  # pylint: disable=global-statement
+    with _ENGINES_LOCK:
+        if _ASYNC_LOOP is None:
+            _ASYNC_LOOP = asyncio.new_event_loop()
+            threading.Thread(
+                target=_ASYNC_LOOP.run_forever, name="bjj_async_db", daemon=True
+            ).start()
+        return _ASYNC_LOOP
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine from sync code and return its result.
+
+    Every coroutine runs on the same long-lived event loop, so async engines keep
+    their pooled connections between calls. Safe to call from multiple threads.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_async_loop()).result()
+
+
+def dispose_database_engines() -> None:
+    """Close the connections of, and forget, every engine created so far."""
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        async_engines = list(_ASYNC_ENGINES.values())
+        _ASYNC_ENGINES.clear()
+
+    for async_engine in async_engines:
+        run_async(async_engine.dispose())
+
+
+def get_dbt_project_dir() -> Path:
+    """Return the directory of the dbt project, which is the dbt directory at the
+    root of the repo unless overridden with BJJ_DBT_PROJECT_DIR."""
+    if DBT_PROJECT_DIR_ENV_VAR in os.environ:
+        return Path(os.environ[DBT_PROJECT_DIR_ENV_VAR])
+    return DEFAULT_DBT_PROJECT_DIR
+
+
+def get_dbt_manifest_hash() -> str:
+    """Return a hash of the dbt manifest.
+
+    Falls back to hashing the dbt model files when the project hasn't been compiled
+    (e.g. in images that don't run dbt), since those define the same schema.
     """
-    Return an updated sqlalchemy.Engine object connected to
-    the appropriate bjj database.
+    project_dir = get_dbt_project_dir()
+    manifest_path = project_dir / DBT_MANIFEST_PATH
+    digest = hashlib.sha256()
+    if manifest_path.exists():
+        digest.update(manifest_path.read_bytes())
+    else:
+        for pattern in DBT_MODEL_FILE_PATTERNS:
+            for path in sorted(project_dir.glob(pattern)):
+                # Relative to the project, so the hash doesn't depend on where the
+                # repo is checked out
+                digest.update(str(path.relative_to(project_dir)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def get_metadata_cache_path(
+    engine: Engine, schema: str, tables: Optional[Sequence[str]]
+) -> Optional[Path]:
+    """Return the on-disk path of the reflection cache for a given database, schema
+    and set of tables, or None if there's no cache directory to keep it in.
+
+    The path is keyed by the current alembic revision and dbt manifest hash, so a
+    migration or a change to the dbt models points at a new cache file.
     """
-    engine = create_engine(get_database_url(), pool_pre_ping=True)
-    return engine
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+
+    with engine.connect() as conn:
+        revisions = conn.execute(text("SELECT version_num FROM alembic_version"))
+        revision = ",".join(sorted(revisions.scalars()))
+
+    key = "|".join(
+        [
+            engine.url.render_as_string(hide_password=True),
+            schema,
+            ",".join(sorted(tables)) if tables else "*",
+            revision,
+            get_dbt_manifest_hash(),
+        ]
+    )
+    key_hash = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return cache_dir / f"metadata_{schema}_{key_hash}.pickle"
 
 
-def get_metadata(engine: Engine, schema: str = BJJ_SCHEMA_NAME) -> MetaData:
-    """Return metadata reflected from a given engine"""
+def get_metadata(
+    engine: Engine,
+    schema: str = BJJ_SCHEMA_NAME,
+    tables: Optional[Sequence[str]] = None,
+    use_cache: bool = True,
+) -> MetaData:
+    """Return metadata reflected from a given engine.
+
+    Reflected metadata is cached on disk, keyed by the alembic revision and the dbt
+    manifest hash, and loaded from there on later calls instead of querying the
+    database catalog.
+
+    Args:
+        engine: a SQLAlchemy Engine connected to the database.
+        schema: the schema to reflect.
+        tables: only reflect these tables (and any tables they reference). Defaults
+            to every table and view in the schema.
+        use_cache: whether to read and write the on-disk cache.
+
+    Returns:
+        a SQLAlchemy MetaData object.
+    """
+    cache_path = get_metadata_cache_path(engine, schema, tables) if use_cache else None
+    if cache_path is not None and cache_path.exists():
+        try:
+            metadata = pickle.loads(cache_path.read_bytes())
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+            LOGGER.warning("Could not load cached metadata from %s", cache_path)
+        else:
+            LOGGER.debug("Using cached metadata from %s", cache_path)
+            return metadata
+
     metadata = MetaData(schema=schema)
-    metadata.reflect(engine, views=True)
+    metadata.reflect(engine, views=True, only=tables)
+
+    if cache_path is not None:
+        # Write to a temporary file and rename it so that concurrent processes
+        # never read a partially written cache
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_bytes(pickle.dumps(metadata))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            LOGGER.warning("Could not write metadata cache to %s", cache_path)
     return metadata
 
 
 def resolve_sql_execution(
-    stmt: Union[Select, Delete, TextClause], con: Union[Connection, Engine]
+    stmt: Union[Select, CompoundSelect, Insert, Delete, Update, TextClause],
+    con: Union[Connection, Engine],
+    params: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
 ) -> CursorResult:
     """
     Resolve the execution of a sql statement based on the type of
     connection and return the result.
+
+    Passing a list of dicts as params runs the statement once per dict
+    (executemany).
     """
     if isinstance(con, Connection):
-        result = con.execute(stmt)
+        result = con.execute(stmt, params)
     else:
         with con.begin() as conn:
-            result = conn.execute(stmt)
+            result = conn.execute(stmt, params)
     return result
 
 
 def query_database(
-    stmt: Select, con: Union[Connection, Engine], scalar: bool = False
+    stmt: Union[Select, CompoundSelect],
+    con: Union[Connection, Engine],
+    scalar: bool = False,
+    columnar: bool = False,
 ) -> Union[int, str, bool, datetime, pd.DataFrame]:
     """Query a database table and return the results as a pandas DataFrame.
 
     Args:
-        stmt: a SQLAlchemy Select construct used to select data from a database.
+        stmt: a SQLAlchemy Select construct, or a compound select (e.g. a UNION
+            ALL of selects), used to select data from a database.
         con: a SQLAlchemy connection to a database. Can either be a
             SQLAlchemy Engine object or a Connection object.
         scalar: indicates if the return output should be a scalar value or not.
+        columnar: fetch the results with copy_data_from_query, which parses them
+            straight into typed columns instead of going through a Python object
+            per row. Worth it for large results. Cannot be combined with scalar.
 
     Returns:
         a pandas DataFrame containing the result of the select statement,
             or a scalar value.
     """
+    if columnar:
+        if scalar:
+            raise ValueError("Columnar fetches cannot return a scalar value.")
+        return copy_data_from_query(stmt, con)
+
     result = resolve_sql_execution(stmt, con)
+    return _resolve_query_result(result, scalar=scalar)
+
+
+def query_database_iter(
+    stmt: Union[Select, CompoundSelect],
+    con: Union[Connection, Engine],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    """Query a database table and yield the results as pandas DataFrames of at most
+    chunk_size rows.
+
+    Rows are streamed through a server-side cursor, so only one chunk is held in
+    memory at a time. Like resolve_sql_execution, passing a Connection runs the
+    query within whatever transaction it's in; passing an Engine opens a connection
+    that stays open until the iterator is exhausted or closed.
+
+    Args:
+        stmt: a SQLAlchemy Select construct, or a compound select (e.g. a UNION
+            ALL of selects), used to select data from a database.
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+        chunk_size: the maximum number of rows per DataFrame.
+
+    Yields:
+        pandas DataFrames containing consecutive chunks of the result of the select
+            statement.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer. Got {chunk_size}.")
 
+    if not isinstance(con, Connection):
+        with con.begin() as conn:
+            yield from query_database_iter(stmt, con=conn, chunk_size=chunk_size)
+        return
+
+    result = con.execute(
+        stmt, execution_options={"stream_results": True, "yield_per": chunk_size}
+    )
+    columns = list(result.keys())
+    try:
+        for rows in result.partitions():
+            yield pd.DataFrame(data=rows, columns=columns)
+    finally:
+        result.close()
+
+
+def _resolve_query_result(
+    result: CursorResult, scalar: bool
+) -> Union[int, str, bool, datetime, pd.DataFrame]:
+    """Return the result of a query as a scalar value or a pandas DataFrame."""
     if scalar:
         value = result.scalar()
 
@@ -188,12 +560,96 @@ def query_database(
     return pd.DataFrame(data=result.fetchall(), columns=columns)
 
 
+async def async_resolve_sql_execution(
+    stmt: Union[Select, CompoundSelect, Insert, Delete, Update, TextClause],
+    con: Union[AsyncConnection, AsyncEngine],
+    params: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+) -> CursorResult:
+    """
+    Resolve the execution of a sql statement based on the type of async
+    connection and return the result.
+
+    The returned result is fully buffered, so it can be read after the connection
+    is released.
+    """
+    if isinstance(con, AsyncConnection):
+        result = await con.execute(stmt, params)
+    else:
+        async with con.begin() as conn:
+            result = await conn.execute(stmt, params)
+    return result
+
+
+async def async_query_database(
+    stmt: Union[Select, CompoundSelect],
+    con: Union[AsyncConnection, AsyncEngine],
+    scalar: bool = False,
+) -> Union[int, str, bool, datetime, pd.DataFrame]:
+    """Query a database table asynchronously and return the results as a pandas
+    DataFrame.
+
+    Passing an AsyncEngine checks out a connection per query, so independent queries
+    can be run at once with asyncio.gather, e.g.:
+
+        await asyncio.gather(*(async_query_database(stmt, engine) for stmt in stmts))
+
+    Args:
+        stmt: a SQLAlchemy Select construct used to select data from a database.
+        con: a SQLAlchemy async connection to a database. Can either be a
+            SQLAlchemy AsyncEngine object or an AsyncConnection object.
+        scalar: indicates if the return output should be a scalar value or not.
+
+    Returns:
+        a pandas DataFrame containing the result of the select statement,
+            or a scalar value.
+    """
+    result = await async_resolve_sql_execution(stmt, con)
+    return _resolve_query_result(result, scalar=scalar)
+
+
+async def async_query_database_scalar(
+    stmt: Select, con: Union[AsyncConnection, AsyncEngine]
+) -> Union[int, str, bool, datetime]:
+    """Query a database table asynchronously and return a scalar value."""
+    value = await async_query_database(stmt, con, scalar=True)
+
+    assert not isinstance(value, pd.DataFrame)  # make mypy happy
+    return value
+
+
+def query_database_concurrently(
+    stmts: Sequence[Union[Select, CompoundSelect]],
+    con: AsyncEngine,
+    scalar: bool = False,
+) -> List[Union[int, str, bool, datetime, pd.DataFrame]]:
+    """Run independent queries at once over an async engine's pool and return their
+    results in the same order, from sync code.
+
+    Args:
+        stmts: SQLAlchemy Select constructs used to select data from a database.
+        con: a SQLAlchemy AsyncEngine connected to a database.
+        scalar: indicates if each output should be a scalar value or not.
+
+    Returns:
+        a list of pandas DataFrames or scalar values, one per statement.
+    """
+
+    async def gather() -> List[Union[int, str, bool, datetime, pd.DataFrame]]:
+        return list(
+            await asyncio.gather(
+                *(async_query_database(stmt, con, scalar=scalar) for stmt in stmts)
+            )
+        )
+
+    return run_async(gather())
+
+
 def delete_data_from_table(
     table: str,
     metadata: MetaData,
     con: Union[Connection, Engine],
     schema: str = BJJ_SCHEMA_NAME,
-) -> None:
+) -> int:
     """Delete data from a given database table.
 
     Args:
@@ -202,12 +658,107 @@ def delete_data_from_table(
         con: a SQLAlchemy connection to a database. Can either be a
             SQLAlchemy Engine object or a Connection object.
         schema: the schema of the database table. Defaults to "bjj".
+
+    Returns:
+        the number of rows deleted.
     """
     schema_and_table = f"{schema}.{table}"
     table_to_delete_from = metadata.tables[schema_and_table]
     stmt = delete(table_to_delete_from)
     result = resolve_sql_execution(stmt, con)
     LOGGER.info("Deleted %s rows from table %s", result.rowcount, schema_and_table)
+    return result.rowcount
+
+
+def delete_data_by_keys(
+    keys: pd.DataFrame,
+    table: str,
+    metadata: MetaData,
+    con: Union[Connection, Engine],
+    schema: str = BJJ_SCHEMA_NAME,
+) -> int:
+    """Delete the rows of a given database table that match the given keys.
+
+    Args:
+        keys: a pandas DataFrame whose columns are the key columns of the table and
+            whose rows are the key values to delete.
+        table: the database table to delete from.
+        metadata: a SQLAlchemy metadata object used to access the relevant Table object.
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+        schema: the schema of the database table. Defaults to "bjj".
+
+    Returns:
+        the number of rows deleted.
+    """
+    schema_and_table = f"{schema}.{table}"
+    if keys.empty:
+        LOGGER.info("Deleted 0 rows from table %s", schema_and_table)
+        return 0
+
+    table_to_delete_from = metadata.tables[schema_and_table]
+    key_cols = tuple_(*[table_to_delete_from.c[col] for col in keys.columns])
+    key_values = list(keys.itertuples(index=False, name=None))
+    stmt = delete(table_to_delete_from).where(key_cols.in_(key_values))
+    result = resolve_sql_execution(stmt, con)
+    LOGGER.info("Deleted %s rows from table %s", result.rowcount, schema_and_table)
+    return result.rowcount
+
+
+def update_data_by_keys(
+    data: pd.DataFrame,
+    table: str,
+    metadata: MetaData,
+    con: Union[Connection, Engine],
+    schema: str = BJJ_SCHEMA_NAME,
+) -> int:
+    """Update rows of a given database table in place, matching rows on key columns.
+
+    Every column in the data is written to the table and updated_at is set to the
+    current time.
+
+    Args:
+        data: a pandas DataFrame containing the columns to update, indexed by the key
+            columns used to match rows in the data to rows in the table.
+        table: the database table to update.
+        metadata: a SQLAlchemy metadata object used to access the relevant Table object.
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+        schema: the schema of the database table. Defaults to "bjj".
+
+    Returns:
+        the number of rows updated.
+    """
+    schema_and_table = f"{schema}.{table}"
+    if data.empty:
+        LOGGER.info("Updated 0 rows in %s", schema_and_table)
+        return 0
+
+    table_to_update = metadata.tables[schema_and_table]
+    key_cols = list(data.index.names)
+    value_cols = list(data.columns)
+    data = data.reset_index()
+
+    # Bind parameter names can't clash with column names in an UPDATE statement
+    stmt = (
+        update(table_to_update)
+        .where(
+            and_(*[table_to_update.c[col] == bindparam(f"b_{col}") for col in key_cols])
+        )
+        .values(
+            {
+                **{col: bindparam(f"b_{col}") for col in value_cols},
+                "updated_at": func.now(),  # pylint: disable=not-callable
+            }
+        )
+    )
+    records = [
+        {f"b_{col}": value for col, value in record.items()}
+        for record in data.astype(object).where(data.notna(), None).to_dict("records")
+    ]
+    resolve_sql_execution(stmt, con, params=records)
+    LOGGER.info("Updated %s rows in %s", len(records), schema_and_table)
+    return len(records)
 
 
 def reset_sequence(
@@ -228,12 +779,182 @@ def reset_sequence(
     LOGGER.info("Reset the sequence: %s", sequence)
 
 
-def update_table(
+def restart_sequence_after_max_id(
+    sequence: str,
+    table: str,
+    con: Union[Connection, Engine],
+    schema: str = BJJ_SCHEMA_NAME,
+) -> int:
+    """Restart a given sequence right after the highest ID in a table, or at 1 if
+    the table is empty
+
+    Used after deleting some of the data from a table with a sequence, so that the
+    IDs of deleted rows past the highest remaining ID are handed out again
+
+    Args:
+        sequence: the name of the sequence to restart
+        table: the table whose id column the sequence fills in
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+        schema: the schema of the sequence and the table. Defaults to "bjj".
+
+    Returns:
+        the next ID the sequence will hand out
+    """
+    stmt = text(
+        f"SELECT setval('{schema}.{sequence}', coalesce(max(id), 0) + 1, false)"
+        f" FROM {schema}.{table}"
+    )
+    next_id = resolve_sql_execution(stmt, con).scalar_one()
+    LOGGER.info("Restarted the sequence %s at %s", sequence, next_id)
+    return next_id
+
+
+def validate_loader_method(method: str) -> None:
+    """Validate that the passed-in loader method is one of the supported methods."""
+    if method not in LOADER_METHODS:
+        raise ValueError(
+            f"The loader method must be one of the following values: {LOADER_METHODS}."
+            f" Got {method} instead."
+        )
+
+
+def copy_data_into_table(
     data: pd.DataFrame,
     table: str,
     con: Union[Connection, Engine],
     schema: str = BJJ_SCHEMA_NAME,
 ) -> None:
+    """Insert data into a given database table via COPY FROM STDIN.
+
+    The data is written as CSV to a spooled buffer and streamed to Postgres through
+    the psycopg2 cursor underlying the connection, so it runs as part of any
+    transaction the connection is already in.
+
+    Args:
+        data: a pandas DataFrame containing the data to insert.
+        table: the database table to insert into.
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+        schema: the schema of the database table. Defaults to "bjj".
+    """
+    if not isinstance(con, Connection):
+        with con.begin() as conn:
+            copy_data_into_table(data, table, con=conn, schema=schema)
+        return
+
+    columns = ", ".join(f'"{col}"' for col in data.columns)
+    copy_stmt = f"COPY {schema}.{table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    with tempfile.SpooledTemporaryFile(
+        max_size=COPY_BUFFER_MAX_SIZE, mode="w+", newline=""
+    ) as buffer:
+        # Missing values are written as unquoted empty fields, which COPY reads as NULL
+        data.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cursor = con.connection.cursor()
+        try:
+            cursor.copy_expert(copy_stmt, buffer)
+        finally:
+            cursor.close()
+
+
+def _get_copy_dtypes(
+    stmt: Union[Select, CompoundSelect]
+) -> Tuple[Dict[str, Any], List[str], Dict[str, bool]]:
+    """Map the selected columns of a statement to how COPY output is parsed.
+
+    Returns:
+        the dtypes to parse columns as, the boolean columns (parsed as text and
+            converted afterwards), and the date/timestamp columns mapped to whether
+            they're timezone-aware.
+    """
+    dtypes: Dict[str, Any] = {}
+    bool_cols = []
+    date_cols = {}
+    for column in stmt.selected_columns:
+        name = column.key
+        if name is None:
+            continue
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+        if issubclass(python_type, bool):
+            dtypes[name] = str
+            bool_cols.append(name)
+        elif issubclass(python_type, int):
+            dtypes[name] = "Int64"
+        elif issubclass(python_type, str):
+            dtypes[name] = str
+        elif issubclass(python_type, (datetime, date)):
+            date_cols[name] = getattr(column.type, "timezone", False)
+
+    return dtypes, bool_cols, date_cols
+
+
+def copy_data_from_query(
+    stmt: Union[Select, CompoundSelect], con: Union[Connection, Engine]
+) -> pd.DataFrame:
+    """Run a query via COPY TO STDOUT and return the results as a pandas DataFrame.
+
+    The results are streamed as CSV into a spooled buffer through the psycopg2
+    cursor underlying the connection and parsed by pandas' C parser, so no Python
+    object is created per row or cell. Columns are typed from the statement's
+    selected columns rather than guessed from the text: integers land as nullable
+    Int64, booleans as nullable boolean, strings as str (even when they look like
+    numbers or booleans) and date/timestamp columns as datetime64. Other columns
+    (e.g. floats) are left to pandas' inference.
+
+    Args:
+        stmt: a SQLAlchemy Select construct, or a compound select (e.g. a UNION
+            ALL of selects), used to select data from a database.
+        con: a SQLAlchemy connection to a database. Can either be a
+            SQLAlchemy Engine object or a Connection object.
+
+    Returns:
+        a pandas DataFrame containing the result of the select statement.
+    """
+    if not isinstance(con, Connection):
+        with con.connect() as conn:
+            return copy_data_from_query(stmt, con=conn)
+
+    dtypes, bool_cols, date_cols = _get_copy_dtypes(stmt)
+    compiled = stmt.compile(dialect=con.dialect)
+    cursor = con.connection.cursor()
+    try:
+        query = cursor.mogrify(str(compiled), compiled.params).decode()
+        # NULLs are written as \N so that they can be told apart from empty strings
+        copy_stmt = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER, NULL '\\N')"
+
+        with tempfile.SpooledTemporaryFile(
+            max_size=COPY_BUFFER_MAX_SIZE, mode="w+b"
+        ) as buffer:
+            cursor.copy_expert(copy_stmt, buffer)
+            buffer.seek(0)
+            data = pd.read_csv(
+                buffer, dtype=dtypes, keep_default_na=False, na_values=["\\N"]
+            )
+    finally:
+        cursor.close()
+
+    # Parsed after the fact since read_csv's parse_dates falls back to a slow path
+    # for the UTC offsets Postgres writes (e.g. +00)
+    for name, timezone in date_cols.items():
+        data[name] = pd.to_datetime(data[name], utc=timezone)
+    for name in bool_cols:
+        data[name] = data[name].map({"t": True, "f": False}).astype("boolean")
+    return data
+
+
+def update_table(
+    data: pd.DataFrame,
+    table: str,
+    con: Union[Connection, Engine],
+    schema: str = BJJ_SCHEMA_NAME,
+    method: str = DEFAULT_LOADER_METHOD,
+) -> int:
     """
     Update a given database table by inserting the passed-in data.
 
@@ -243,14 +964,25 @@ def update_table(
         con: a SQLAlchemy connection to a database. Can either be a
             SQLAlchemy Engine object or a Connection object.
         schema: the schema of the database table. Defaults to "bjj".
+        method: how to insert the data, either "copy" (COPY FROM STDIN) or
+            "to_sql" (multi-row INSERT statements). Defaults to "copy".
+
+    Returns:
+        the number of rows inserted.
     """
+    validate_loader_method(method)
+
     schema_and_table = f"{schema}.{table}"
-    data.to_sql(
-        table,
-        con=con,
-        schema=schema,
-        index=False,
-        if_exists="append",
-        method="multi",
-    )
+    if method == "copy":
+        copy_data_into_table(data, table, con=con, schema=schema)
+    else:
+        data.to_sql(
+            table,
+            con=con,
+            schema=schema,
+            index=False,
+            if_exists="append",
+            method="multi",
+        )
     LOGGER.info("Inserted %s rows into %s", data.shape[0], schema_and_table)
+    return data.shape[0]
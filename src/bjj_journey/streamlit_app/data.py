@@ -1,29 +1,82 @@
 """bjj_journey.streamlit_app.data - Retrieve data for the BJJ dashboard app.
 
 """
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Tuple
 import pandas as pd
-from sqlalchemy import Engine, func, select
+from sqlalchemy import (
+    CompoundSelect,
+    Engine,
+    MetaData,
+    Select,
+    String,
+    func,
+    literal,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
 import streamlit as st
 
 from bjj_journey.database_utils import (
+    ATHLETE_TABLE,
     BJJ_SCHEMA_NAME,
     CLASS_ATTD_METRICS_TABLE,
     CLASS_ATTD_TABLE,
     MOVE_METRICS_TABLE,
     POSITION_METRICS_TABLE,
+    create_async_database_engine,
     create_database_engine,
     get_metadata,
     query_database,
+    query_database_concurrently,
 )
-from bjj_journey.streamlit_app.utils import validate_skill_type
+from bjj_journey.streamlit_app.utils import validate_skill_type, validate_window_days
 
 
 # number of seconds to cache data for streamlit
 TIME_TO_LIVE = 3600 * 24
 
 
+@dataclass(frozen=True)
+class MetricBundle:
+    """Every metric of an athlete for a dashboard view.
+
+    Attributes:
+        dashboard_view: the dashboard view the metrics are for.
+        athlete: the athlete the metrics are for.
+        class_attendance: a mapping of metric name to value, from
+            class_attendance_metrics.
+        skills: a mapping of skill type (position or move) to a pandas DataFrame
+            with the columns <skill type>, metric_name, aggregation_value and
+            metric_value, from the skill type's metrics table.
+    """
+
+    dashboard_view: str
+    athlete: str
+    class_attendance: Dict[str, int]
+    skills: Dict[str, pd.DataFrame]
+
+    def get_class_attendance_metric(self, metric_name: str) -> int:
+        """Get the value of a class attendance metric."""
+        return self.class_attendance[metric_name]
+
+    def get_skill_metric(self, skill_type: str, metric_name: str) -> pd.DataFrame:
+        """
+        Get the values of a skill metric, with the columns <skill type>,
+        aggregation_value and metric_value.
+        """
+        validate_skill_type(skill_type)
+
+        data = self.skills[skill_type]
+        data = data[data["metric_name"] == metric_name]
+        return data[[skill_type, "aggregation_value", "metric_value"]].reset_index(
+            drop=True
+        )
+
+
 # pylint: disable=no-self-argument
 class BJJDataFetcher:
     """Fetch data for BJJ dashboard.
@@ -37,14 +90,35 @@ class BJJDataFetcher:
     NUM_CLASS_MIN_METRIC = "num_class_minutes"
     NUM_TIMES_PRACTICED_METRIC = "num_times_practiced"
 
+    # Tables the dashboard reads from
+    TABLES = [
+        ATHLETE_TABLE,
+        CLASS_ATTD_TABLE,
+        CLASS_ATTD_METRICS_TABLE,
+        MOVE_METRICS_TABLE,
+        POSITION_METRICS_TABLE,
+    ]
+
+    # Skill type to the metrics table for the skill type
+    SKILL_METRICS_TABLES = {
+        "position": POSITION_METRICS_TABLE,
+        "move": MOVE_METRICS_TABLE,
+    }
+
     def __init__(self):
         self._db_engine = self._get_database()
-        self._metadata = get_metadata(self._db_engine)
+        self._async_db_engine = self._get_async_database()
+        self._metadata = get_metadata(self._db_engine, tables=self.TABLES)
 
     @st.cache_resource(ttl=TIME_TO_LIVE)
     def _get_database(_self) -> Engine:
         """Wrapper for existing function to make use of Streamlit caching"""
-        return create_database_engine()
+        return create_database_engine(role="dashboard")
+
+    @st.cache_resource(ttl=TIME_TO_LIVE)
+    def _get_async_database(_self) -> AsyncEngine:
+        """Wrapper for existing function to make use of Streamlit caching"""
+        return create_async_database_engine(role="dashboard")
 
     @staticmethod
     def _resolve_agg_category(dashboard_view: str) -> str:
@@ -55,22 +129,165 @@ class BJJDataFetcher:
         except ValueError:
             return "overall"
 
-    def _get_metric_value(
-        _self, table: str, metric_name: str, agg_category: str, agg_value: str
-    ) -> int:
-        """Get the metric value based on the inputs"""
-        metric_table = _self._metadata.tables[f"{BJJ_SCHEMA_NAME}.{table}"]
-        agg_category = _self._resolve_agg_category(agg_category)
+    @classmethod
+    def build_metric_bundle_query(
+        cls, metadata: MetaData, dashboard_view: str, athlete: str
+    ) -> CompoundSelect:
+        """Build the query for every metric of an athlete for the dashboard view.
+
+        Rows from class_attendance_metrics, position_metrics and move_metrics are
+        combined with UNION ALL, tagged with the table they came from.
+        """
+        agg_category = cls._resolve_agg_category(dashboard_view)
+        agg_value = dashboard_view.lower()
+
+        class_attd_table = metadata.tables[
+            f"{BJJ_SCHEMA_NAME}.{CLASS_ATTD_METRICS_TABLE}"
+        ]
+        selects = [
+            select(
+                literal(CLASS_ATTD_METRICS_TABLE).label("metric_table"),
+                null().cast(String).label("skill"),
+                class_attd_table.c.metric_name,
+                class_attd_table.c.aggregation_value,
+                class_attd_table.c.metric_value,
+            )
+            .where(class_attd_table.c.athlete == athlete)
+            .where(class_attd_table.c.aggregation_category == agg_category)
+            .where(class_attd_table.c.aggregation_value == agg_value)
+        ]
+        for skill_type, table_name in cls.SKILL_METRICS_TABLES.items():
+            table = metadata.tables[f"{BJJ_SCHEMA_NAME}.{table_name}"]
+            selects.append(
+                select(
+                    literal(table_name).label("metric_table"),
+                    table.c[skill_type].label("skill"),
+                    table.c.metric_name,
+                    table.c.aggregation_value,
+                    table.c.metric_value,
+                )
+                .where(table.c.athlete == athlete)
+                .where(table.c.aggregation_category == agg_category)
+                .where(table.c.aggregation_value == agg_value)
+            )
+
+        return union_all(*selects)
+
+    @classmethod
+    def build_num_classes_per_month_query(
+        cls, metadata: MetaData, athlete: str
+    ) -> Select:
+        """Build the query for the number of classes an athlete attended per
+        month."""
+        table = metadata.tables[f"{BJJ_SCHEMA_NAME}.{CLASS_ATTD_METRICS_TABLE}"]
+        return (
+            select(table)
+            .where(table.c.athlete == athlete)
+            .where(table.c.metric_name == cls.NUM_CLASSES_ATTENDED_METRIC)
+            .where(table.c.aggregation_category == "month")
+        )
+
+    @classmethod
+    def build_skill_metric_per_month_query(
+        cls,
+        metadata: MetaData,
+        dashboard_view: str,
+        athlete: str,
+        skill_type: str,
+        metric_name: str,
+    ) -> Select:
+        """Build the query for an athlete's skill metric per month, for the months
+        of the dashboard view's year, or for every month overall."""
+        validate_skill_type(skill_type)
+
+        table = metadata.tables[
+            f"{BJJ_SCHEMA_NAME}.{cls.SKILL_METRICS_TABLES[skill_type]}"
+        ]
         stmt = (
-            select(metric_table.c.metric_value)
-            .where(metric_table.c.metric_name == metric_name)
-            .where(metric_table.c.aggregation_category == agg_category)
-            .where(metric_table.c.aggregation_value == agg_value)
+            select(table.c[skill_type], table.c.aggregation_value, table.c.metric_value)
+            .where(table.c.athlete == athlete)
+            .where(table.c.metric_name == metric_name)
+            .where(table.c.aggregation_category == "month")
         )
-        metric_value = query_database(stmt, con=_self._db_engine, scalar=True)
+        if cls._resolve_agg_category(dashboard_view) == "year":
+            # Months are YYYY-MM, so a year's months sort between its first and last
+            stmt = stmt.where(
+                table.c.aggregation_value.between(
+                    f"{dashboard_view}-01", f"{dashboard_view}-12"
+                )
+            )
+        return stmt
 
-        assert isinstance(metric_value, int)  # make mypy happy
-        return metric_value
+    @classmethod
+    def get_rolling_metric_name(cls, window_days: int) -> str:
+        """Get the name of the metric for the number of times a skill was practiced
+        in a rolling window of the given number of days."""
+        validate_window_days(window_days)
+        return f"{cls.NUM_TIMES_PRACTICED_METRIC}_last_{window_days}_days"
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def _query_dashboard_view(
+        _self, dashboard_view: str, athlete: str
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run the reads behind the dashboard view of an athlete, which are
+        independent of each other, at once over the async engine's pool.
+
+        Returns:
+            the data of the metric bundle and of the number of classes per month.
+        """
+        metric_bundle, num_classes_per_month = query_database_concurrently(
+            [
+                _self.build_metric_bundle_query(
+                    _self._metadata, dashboard_view, athlete
+                ),
+                _self.build_num_classes_per_month_query(_self._metadata, athlete),
+            ],
+            con=_self._async_db_engine,
+        )
+        assert isinstance(metric_bundle, pd.DataFrame)  # make mypy happy
+        assert isinstance(num_classes_per_month, pd.DataFrame)  # make mypy happy
+        return metric_bundle, num_classes_per_month
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_metric_bundle(_self, dashboard_view: str, athlete: str) -> MetricBundle:
+        """Get every metric of an athlete for the dashboard view in a single
+        query."""
+        data, _ = _self._query_dashboard_view(dashboard_view, athlete)
+
+        class_attd_data = data[data["metric_table"] == CLASS_ATTD_METRICS_TABLE]
+        skills = {
+            skill_type: (
+                data[data["metric_table"] == table_name]
+                .rename(columns={"skill": skill_type})
+                .drop(columns="metric_table")
+                .reset_index(drop=True)
+            )
+            for skill_type, table_name in _self.SKILL_METRICS_TABLES.items()
+        }
+        return MetricBundle(
+            dashboard_view=dashboard_view,
+            athlete=athlete,
+            # A metric with no rows behind it (e.g. minutes of a class with no
+            # duration) is NULL, which counts as 0
+            class_attendance={
+                metric_name: 0 if pd.isna(metric_value) else int(metric_value)
+                for metric_name, metric_value in zip(
+                    class_attd_data["metric_name"], class_attd_data["metric_value"]
+                )
+            },
+            skills=skills,
+        )
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_athletes(_self) -> List[str]:
+        """Get the names of the athletes, in the order they were added."""
+        athlete_table = _self._metadata.tables[f"{BJJ_SCHEMA_NAME}.{ATHLETE_TABLE}"]
+        stmt = select(athlete_table.c.name).order_by(athlete_table.c.id)
+        data = query_database(stmt, con=_self._db_engine)
+
+        assert isinstance(data, pd.DataFrame)  # make mypy happy
+        return data["name"].tolist()
 
     @st.cache_data(ttl=TIME_TO_LIVE)
     def get_most_recent_update_date(_self) -> str:
@@ -89,70 +306,45 @@ class BJJDataFetcher:
         return date.strftime("%Y-%m-%d %H:%M:%S %Z")
 
     @st.cache_data(ttl=TIME_TO_LIVE)
-    def get_time_spent_training(_self, dashboard_view: str) -> str:
-        """Get total time spent training based on the dashboard view."""
-        months_trained = _self._get_metric_value(
-            table=CLASS_ATTD_METRICS_TABLE,
-            metric_name=_self.NUM_MONTHS_TRAINED_METRIC,
-            agg_category=dashboard_view,
-            agg_value=dashboard_view.lower(),
-        )
+    def get_time_spent_training(_self, dashboard_view: str, athlete: str) -> str:
+        """Get an athlete's total time spent training based on the dashboard view."""
+        months_trained = _self.get_metric_bundle(
+            dashboard_view, athlete
+        ).get_class_attendance_metric(_self.NUM_MONTHS_TRAINED_METRIC)
         return f"{months_trained} months"
 
     @st.cache_data(ttl=TIME_TO_LIVE)
-    def get_number_of_classes_attended(_self, dashboard_view: str) -> int:
-        """Get the total number of classes attended based on the dashboard view."""
-        return _self._get_metric_value(
-            table=CLASS_ATTD_METRICS_TABLE,
-            metric_name=_self.NUM_CLASSES_ATTENDED_METRIC,
-            agg_category=dashboard_view,
-            agg_value=dashboard_view.lower(),
-        )
+    def get_number_of_classes_attended(_self, dashboard_view: str, athlete: str) -> int:
+        """
+        Get the total number of classes an athlete attended based on the dashboard
+        view.
+        """
+        return _self.get_metric_bundle(
+            dashboard_view, athlete
+        ).get_class_attendance_metric(_self.NUM_CLASSES_ATTENDED_METRIC)
 
     @st.cache_data(ttl=TIME_TO_LIVE)
-    def get_total_class_hours(_self, dashboard_view: str) -> float:
-        """Get total class hours based on the dashboard view."""
-        total_class_min = _self._get_metric_value(
-            table=CLASS_ATTD_METRICS_TABLE,
-            metric_name=_self.NUM_CLASS_MIN_METRIC,
-            agg_category=dashboard_view,
-            agg_value=dashboard_view.lower(),
-        )
+    def get_total_class_hours(_self, dashboard_view: str, athlete: str) -> float:
+        """Get an athlete's total class hours based on the dashboard view."""
+        total_class_min = _self.get_metric_bundle(
+            dashboard_view, athlete
+        ).get_class_attendance_metric(_self.NUM_CLASS_MIN_METRIC)
         return total_class_min / 60
 
     @st.cache_data(ttl=TIME_TO_LIVE)
     def get_num_times_practiced_skill(
-        _self, dashboard_view: str, skill_type: str
+        _self, dashboard_view: str, athlete: str, skill_type: str
     ) -> pd.DataFrame:
         """
-        Get the number of times a skill was practiced based on the dashboard view
-        and the skill type.
+        Get the number of times an athlete practiced a skill based on the dashboard
+        view and the skill type.
 
         Valid skill types include "move" and "position".
         """
-        validate_skill_type(skill_type)
-
-        if skill_type == "position":
-            table = _self._metadata.tables[
-                f"{BJJ_SCHEMA_NAME}.{POSITION_METRICS_TABLE}"
-            ]
-            stmt = select(
-                table.c.position, table.c.aggregation_value, table.c.metric_value
-            )
-        else:
-            table = _self._metadata.tables[f"{BJJ_SCHEMA_NAME}.{MOVE_METRICS_TABLE}"]
-            stmt = select(table.c.move, table.c.aggregation_value, table.c.metric_value)
-
-        agg_category = _self._resolve_agg_category(dashboard_view)
-        stmt = (
-            stmt.where(table.c.metric_name == _self.NUM_TIMES_PRACTICED_METRIC)
-            .where(table.c.aggregation_category == agg_category)
-            .where(table.c.aggregation_value == dashboard_view.lower())
+        data = _self.get_metric_bundle(dashboard_view, athlete).get_skill_metric(
+            skill_type, metric_name=_self.NUM_TIMES_PRACTICED_METRIC
         )
 
-        data = query_database(stmt, con=_self._db_engine)
-        assert isinstance(data, pd.DataFrame)  # make mypy happy
-
         data = data.rename(
             columns={
                 "metric_value": "num_times_practiced",
@@ -177,17 +369,14 @@ class BJJDataFetcher:
         return list(most_practiced)
 
     @st.cache_data(ttl=TIME_TO_LIVE)
-    def get_num_classes_per_month(_self, dashboard_view: str) -> pd.DataFrame:
-        """Get the number of classes attended per month based on the dashboard view."""
-        table = _self._metadata.tables[f"{BJJ_SCHEMA_NAME}.{CLASS_ATTD_METRICS_TABLE}"]
-        stmt = (
-            select(table)
-            .where(table.c.metric_name == _self.NUM_CLASSES_ATTENDED_METRIC)
-            .where(table.c.aggregation_category == "month")
-        )
-
-        data = query_database(stmt, con=_self._db_engine)
-        assert isinstance(data, pd.DataFrame)  # make mypy happy
+    def get_num_classes_per_month(
+        _self, dashboard_view: str, athlete: str
+    ) -> pd.DataFrame:
+        """
+        Get the number of classes an athlete attended per month based on the
+        dashboard view.
+        """
+        _, data = _self._query_dashboard_view(dashboard_view, athlete)
 
         data = data.rename(
             columns={"metric_value": "num_classes", "aggregation_value": "month"}
@@ -201,3 +390,87 @@ class BJJDataFetcher:
             data = data[data["year"] == dashboard_view]
 
         return data
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_skill_metric_per_month(
+        _self, dashboard_view: str, athlete: str, skill_type: str, metric_name: str
+    ) -> pd.DataFrame:
+        """
+        Get the values of an athlete's skill metric per month based on the dashboard
+        view, with the columns <skill type>, aggregation_value, metric_value, year
+        and month.
+        """
+        stmt = _self.build_skill_metric_per_month_query(
+            _self._metadata, dashboard_view, athlete, skill_type, metric_name
+        )
+        data = query_database(stmt, con=_self._db_engine)
+        assert isinstance(data, pd.DataFrame)  # make mypy happy
+
+        months = pd.to_datetime(data["aggregation_value"])
+        data["year"] = months.dt.strftime("%Y")
+        data["month"] = months.dt.strftime("%m")
+        return data
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_num_times_practiced_skill_per_month(
+        _self, dashboard_view: str, athlete: str, skill_type: str
+    ) -> pd.DataFrame:
+        """
+        Get the number of times an athlete practiced each skill per month based on
+        the dashboard view and the skill type.
+
+        Valid skill types include "move" and "position".
+        """
+        data = _self.get_skill_metric_per_month(
+            dashboard_view, athlete, skill_type, _self.NUM_TIMES_PRACTICED_METRIC
+        )
+        return data.rename(columns={"metric_value": "num_times_practiced"})
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_rolling_times_practiced_skill_per_month(
+        _self, dashboard_view: str, athlete: str, skill_type: str, window_days: int
+    ) -> pd.DataFrame:
+        """
+        Get the number of times an athlete practiced each skill in the rolling
+        window of the given number of days ending at each month's end, based on the
+        dashboard view and the skill type. Skills that weren't practiced in a window
+        are left out for it.
+
+        Valid skill types include "move" and "position", and valid windows are 30,
+        90 and 365 days.
+        """
+        data = _self.get_skill_metric_per_month(
+            dashboard_view,
+            athlete,
+            skill_type,
+            _self.get_rolling_metric_name(window_days),
+        )
+        return data.rename(columns={"metric_value": "num_times_practiced"})
+
+    @st.cache_data(ttl=TIME_TO_LIVE)
+    def get_rolling_times_practiced_skill(
+        _self, dashboard_view: str, athlete: str, skill_type: str, window_days: int
+    ) -> pd.DataFrame:
+        """
+        Get the number of times an athlete practiced each skill in the most recent
+        rolling window of the given number of days based on the dashboard view and
+        the skill type, i.e. the window ending at the athlete's latest practice date
+        overall, or at the end of the year's last month with practice for a year.
+
+        Returns the same columns as get_num_times_practiced_skill. Skills that
+        weren't practiced in the window are left out.
+        """
+        metric_name = _self.get_rolling_metric_name(window_days)
+        if _self._resolve_agg_category(dashboard_view) == "overall":
+            data = _self.get_metric_bundle(dashboard_view, athlete).get_skill_metric(
+                skill_type, metric_name=metric_name
+            )
+        else:
+            data = _self.get_skill_metric_per_month(
+                dashboard_view, athlete, skill_type, metric_name
+            )
+            data = data[data["aggregation_value"] == data["aggregation_value"].max()][
+                [skill_type, "aggregation_value", "metric_value"]
+            ].reset_index(drop=True)
+
+        return data.rename(columns={"metric_value": "num_times_practiced"})
@@ -6,6 +6,8 @@ import streamlit as st
 
 
 VALID_SKILL_TYPES = {"position", "move"}
+# Rolling windows, in days, that skill metrics are precomputed for
+VALID_WINDOW_DAYS = {30, 90, 365}
 
 
 def add_vertical_space(num_breaks: int):
@@ -26,6 +28,15 @@ def validate_skill_type(skill_type: str) -> None:
     ), f"Expected one of {VALID_SKILL_TYPES}, got {skill_type} instead"
 
 
+def validate_window_days(window_days: int) -> None:
+    """
+    Validate that the passed-in rolling window is one of the following: 30, 90, 365.
+    """
+    assert (
+        window_days in VALID_WINDOW_DAYS
+    ), f"Expected one of {VALID_WINDOW_DAYS}, got {window_days} instead"
+
+
 def resolve_most_practiced_headline(
     dashboard_view: str, skills: List[str], skill_type: str
 ) -> str:
@@ -3,12 +3,20 @@
 """
 import logging
 import os
+from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
 
 
+LOGGER = logging.getLogger(__name__)
+
 LEVELS = [logging.WARNING, logging.INFO, logging.DEBUG]
 
+CACHE_DIR_ENV_VAR = "BJJ_CACHE_DIR"
+# Relative to the home directory
+DEFAULT_CACHE_DIR = Path(".cache") / "bjj_journey"
+
 
 def set_up_logging(verbosity: int) -> None:
     """
@@ -37,3 +45,23 @@ def load_dotenv_file():
     """Load a .env file based on tier."""
     tier = os.environ.get("TIER", "dev")
     load_dotenv(f"secrets.{tier}.env")
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Return the directory used for on-disk caches, creating it if needed.
+
+    Returns None if the directory can't be created (e.g. the home directory is
+    missing or read-only), in which case callers should run without a cache.
+    """
+    try:
+        cache_dir = (
+            Path(os.environ[CACHE_DIR_ENV_VAR])
+            if CACHE_DIR_ENV_VAR in os.environ
+            else Path.home() / DEFAULT_CACHE_DIR
+        )
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except (OSError, RuntimeError) as err:
+        # Path.home raises RuntimeError when the home directory can't be determined
+        LOGGER.warning("Could not create cache directory, running without it: %s", err)
+        return None
+    return cache_dir
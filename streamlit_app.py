@@ -32,6 +32,7 @@ with st.sidebar:
     dashboard_view = st.selectbox(
         label="Dashboard View:", options=DASHBOARD_VIEW_OPTIONS
     )
+    athlete = st.selectbox(label="Athlete:", options=DATA_FETCHER.get_athletes())
     st.write(f"Data last updated at {DATA_FETCHER.get_most_recent_update_date()}")
     st.title("About")
     st.info("""
@@ -47,6 +48,7 @@ with st.sidebar:
 
 
 assert dashboard_view  # make mypy happy
+assert athlete  # make mypy happy
 
 # Title the app
 st.title(f"{APP_TITLE} ({dashboard_view})")
@@ -57,20 +59,20 @@ col1, col2, col3 = st.columns(3)
 # Metrics
 col1.metric(
     label="Total Time Spent Training",
-    value=DATA_FETCHER.get_time_spent_training(dashboard_view),
+    value=DATA_FETCHER.get_time_spent_training(dashboard_view, athlete),
 )
 col2.metric(
     label="Total Number of Classes Attended",
-    value=DATA_FETCHER.get_number_of_classes_attended(dashboard_view),
+    value=DATA_FETCHER.get_number_of_classes_attended(dashboard_view, athlete),
 )
 col3.metric(
     label="Total Class Hours",
-    value=DATA_FETCHER.get_total_class_hours(dashboard_view),
+    value=DATA_FETCHER.get_total_class_hours(dashboard_view, athlete),
 )
 
 # Positions Practiced
 positions_data = DATA_FETCHER.get_num_times_practiced_skill(
-    dashboard_view, skill_type="position"
+    dashboard_view, athlete, skill_type="position"
 )
 most_practiced_position = DATA_FETCHER.determine_most_practiced_skill(
     positions_data, skill_type="position"
@@ -92,7 +94,7 @@ with st.container():
 
 # Moves Practiced
 moves_data = DATA_FETCHER.get_num_times_practiced_skill(
-    dashboard_view, skill_type="move"
+    dashboard_view, athlete, skill_type="move"
 )
 most_practiced_move = DATA_FETCHER.determine_most_practiced_skill(
     moves_data, skill_type="move"
@@ -127,7 +129,7 @@ with tab2:
 with st.container():
     st.header("Number of Classes by Month")
 
-    line_chart_data = DATA_FETCHER.get_num_classes_per_month(dashboard_view)
+    line_chart_data = DATA_FETCHER.get_num_classes_per_month(dashboard_view, athlete)
 
     st.altair_chart(
         altair_chart=create_num_classes_by_month_line_chart(